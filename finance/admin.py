@@ -1,15 +1,34 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
-from .models import Income, Expense, SavingsGoal
+from . import search
+from .changelists import ScalableChangeListMixin
+from .models import Income, Expense, SavingsGoal, SavingsContribution, Budget, RecurringRule
 
 User = get_user_model()
 
+
+class FullTextSearchMixin:
+    """Serve the changelist search box from the description full-text index.
+
+    Replaces the default ``ILIKE '%term%'`` over every row; categories are
+    filtered with ``list_filter`` instead.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
+
 @admin.register(Income)
-class IncomeAdmin(admin.ModelAdmin):
+class IncomeAdmin(FullTextSearchMixin, ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'income_type', 'amount', 'date_received')
-    list_filter = ('income_type', 'date_received')
-    search_fields = ('description', 'income_type')
+    list_filter = ('income_type',)
+    list_select_related = ('user',)
+    date_hierarchy = 'date_received'
+    search_fields = ('description',)
     raw_id_fields = ('user',)  # Better for performance with many users
+    export_fields = ('id', 'user__username', 'income_type', 'amount', 'date_received', 'description')
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -18,11 +37,14 @@ class IncomeAdmin(admin.ModelAdmin):
         return qs.filter(user=request.user)
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(FullTextSearchMixin, ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'expense_type', 'amount', 'date_incurred', 'source')
-    list_filter = ('expense_type', 'source', 'date_incurred')
-    search_fields = ('description', 'expense_type')
+    list_filter = ('expense_type', 'source')
+    list_select_related = ('user',)
+    date_hierarchy = 'date_incurred'
+    search_fields = ('description',)
     raw_id_fields = ('user',)
+    export_fields = ('id', 'user__username', 'expense_type', 'amount', 'date_incurred', 'source', 'description')
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -31,11 +53,15 @@ class ExpenseAdmin(admin.ModelAdmin):
         return qs.filter(user=request.user)
 
 @admin.register(SavingsGoal)
-class SavingsGoalAdmin(admin.ModelAdmin):
+class SavingsGoalAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'goal_name', 'current_amount', 'target_amount', 'target_date', 'progress_display')
-    list_filter = ('target_date',)
+    list_select_related = ('user',)
+    date_hierarchy = 'target_date'
+    # Ties in id order too, so the page reads finance_goal_target_idx without a sort.
+    ordering = ('target_date', 'id')
     search_fields = ('goal_name', 'description')
     raw_id_fields = ('user',)
+    export_fields = ('id', 'user__username', 'goal_name', 'current_amount', 'target_amount', 'target_date')
     
     @admin.display(description='Progress')
     def progress_display(self, obj):
@@ -45,4 +71,42 @@ class SavingsGoalAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        return qs.filter(user=request.user)
\ No newline at end of file
+        return qs.filter(user=request.user)
+
+@admin.register(SavingsContribution)
+class SavingsContributionAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ('user', 'goal', 'amount', 'date_contributed')
+    list_select_related = ('user', 'goal')
+    date_hierarchy = 'date_contributed'
+    raw_id_fields = ('user', 'goal')
+    export_fields = ('id', 'user__username', 'goal__goal_name', 'amount', 'date_contributed')
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(user=request.user)
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'amount', 'warn_at')
+    list_filter = ('category',)
+    raw_id_fields = ('user',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(user=request.user)
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'category', 'amount', 'frequency', 'next_run', 'active')
+    list_filter = ('kind', 'frequency', 'active')
+    raw_id_fields = ('user',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(user=request.user)
@@ -0,0 +1,41 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+
+
+def parallel_queries():
+    """Whether async views run independent queries on separate connections.
+
+    Controlled by ``FINANCE_ASYNC_PARALLEL_QUERIES``; defaults to on for
+    everything but SQLite, where the extra connections buy nothing.
+    """
+    return getattr(settings, 'FINANCE_ASYNC_PARALLEL_QUERIES', connection.vendor != 'sqlite')
+
+
+def _on_own_connection(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # Closed outright, whatever CONN_MAX_AGE says: worker threads come
+            # and go, and a persistent connection would outlive its thread's use.
+            connections.close_all()
+    return run
+
+
+async def run_queries(*funcs):
+    """Run independent blocking ORM callables concurrently and return their results in order.
+
+    Django's async ORM (``aaggregate``, ``async for``) hands every query to
+    one shared sync thread, so gathered queries still execute one after
+    another. In parallel mode each callable instead runs in its own worker
+    thread, which opens (and afterwards releases) its own connection, so the
+    database really serves them at the same time.
+    """
+    if parallel_queries():
+        calls = [sync_to_async(_on_own_connection(func), thread_sensitive=False) for func in funcs]
+    else:
+        calls = [sync_to_async(func) for func in funcs]
+    return await asyncio.gather(*(call() for call in calls))
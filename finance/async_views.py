@@ -0,0 +1,77 @@
+import json
+import logging
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .aio import run_queries
+from .cache import VersionedCache
+from .services import FinanceSummary, chart_series, CHART_KINDS, CHART_PERIODS
+
+logger = logging.getLogger(__name__)
+
+# Async twins of views.dashboard and views.chart_data. finance.urls routes to
+# them when FINANCE_ASYNC_VIEWS is set, typically under an ASGI server.
+
+
+@login_required
+async def dashboard(request):
+    user = await request.auser()
+    try:
+        user_cache = VersionedCache(user)
+        await user_cache.aload()
+        summary = FinanceSummary(user, cache=user_cache)
+        await summary.aload()
+        income_months, income_totals = summary.monthly('income')
+        expense_months, expense_totals = summary.monthly('expense')
+
+        context = {
+            'total_income': summary.total_income,
+            'total_expense': summary.total_expense,
+            'total_savings': summary.total_savings,
+            'net_balance': summary.net_balance,
+            'recent_incomes': summary.recent_incomes,
+            'recent_expenses': summary.recent_expenses,
+            'savings_goals': summary.savings_goals,
+            'budgets': summary.budgets,
+            'income_months': json.dumps(income_months),
+            'income_totals': json.dumps(income_totals),
+            'expense_months': json.dumps(expense_months),
+            'expense_totals': json.dumps(expense_totals),
+        }
+        return await sync_to_async(render)(request, 'finance/dashboard.html', context)
+    except Exception as e:
+        logger.error(f"Dashboard error: {str(e)}", exc_info=True)
+        messages.error(request, "Could not load dashboard data.")
+        return await sync_to_async(render)(request, 'finance/dashboard.html')
+
+
+@login_required
+async def chart_data(request, kind):
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': "Method not allowed."}, status=405)
+    user = await request.auser()
+    period = request.GET.get('period', 'all')
+    user_cache = VersionedCache(user)
+    await user_cache.aload()
+
+    etag = f'"{user.pk}-{user_cache.version}-{kind}-{period}-{date.today()}"'
+    last_modified = user_cache.updated_at.timestamp() if user_cache.updated_at else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if kind not in CHART_KINDS or period not in CHART_PERIODS:
+            return JsonResponse({'error': "Unknown chart or period."}, status=400)
+        (series,) = await run_queries(lambda: chart_series(user, kind, period, cache=user_cache))
+        response = JsonResponse({'kind': kind, 'period': period, **series})
+
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
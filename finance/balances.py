@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Sum
+
+from .fields import money
+from .models import Income, Expense, SavingsGoal, UserBalance
+
+# model -> {balance field: source amount field}
+SOURCES = {
+    Income: {'total_income': 'amount'},
+    Expense: {'total_expense': 'amount'},
+    SavingsGoal: {'total_saved': 'current_amount', 'total_target': 'target_amount'},
+}
+BALANCE_FIELDS = ('total_income', 'total_expense', 'total_saved', 'total_target')
+ZERO = Decimal('0.00')
+
+
+def contributions(instance):
+    """Return ``{balance field: amount}`` that one row adds to its owner's balance."""
+    return {field: getattr(instance, source) for field, source in SOURCES[type(instance)].items()}
+
+
+def apply_delta(user_id, deltas):
+    """Add ``{balance field: amount}`` to a user's balance, creating the row if needed.
+
+    Must be called inside the transaction that wrote the source row.
+    """
+    deltas = {field: amount for field, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    balances = UserBalance.objects.filter(user_id=user_id)
+    changes = {field: F(field) + money(amount) for field, amount in deltas.items()}
+    if balances.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            UserBalance.objects.create(user_id=user_id, **deltas)
+    except IntegrityError:
+        # A concurrent writer created the row first; add to theirs.
+        balances.update(**changes)
+
+
+def apply_created(instances):
+    """Add freshly bulk-created rows to their owners' balances, one update per user."""
+    deltas = {}
+    for instance in instances:
+        user_deltas = deltas.setdefault(instance.user_id, {})
+        for field, amount in contributions(instance).items():
+            user_deltas[field] = user_deltas.get(field, 0) + amount
+    for user_id, user_deltas in deltas.items():
+        apply_delta(user_id, user_deltas)
+
+
+def actual_totals(user_ids):
+    """Sum the raw tables for ``user_ids``; returns ``{user_id: {field: total}}``."""
+    totals = {user_id: dict.fromkeys(BALANCE_FIELDS, ZERO) for user_id in user_ids}
+    for model, fields in SOURCES.items():
+        rows = (
+            model.objects.filter(user_id__in=user_ids).order_by()
+            .values('user_id')
+            .annotate(**{field: Sum(source) for field, source in fields.items()})
+        )
+        for row in rows:
+            for field in fields:
+                totals[row['user_id']][field] = row[field] or ZERO
+    return totals
+
+
+def reconcile_batch(user_ids, repair=True):
+    """Compare stored balances for ``user_ids`` with the raw tables.
+
+    Returns ``[(user_id, stored, actual)]`` for every user that drifted; with
+    ``repair`` the stored rows are corrected. The balance rows stay locked
+    while the raw tables are summed, so writers that commit meanwhile apply
+    their deltas on top of the repaired figures instead of being lost.
+    """
+    with transaction.atomic():
+        stored = {
+            row['user_id']: row
+            for row in UserBalance.objects.select_for_update()
+            .filter(user_id__in=user_ids).values('user_id', *BALANCE_FIELDS)
+        }
+        drifted = []
+        for user_id, actual in actual_totals(user_ids).items():
+            current = stored.get(user_id)
+            if current is None:
+                if not any(actual.values()):
+                    continue
+                current = {'user_id': user_id, **dict.fromkeys(BALANCE_FIELDS, 0)}
+            elif all(current[field] == actual[field] for field in BALANCE_FIELDS):
+                continue
+            drifted.append((user_id, {field: current[field] for field in BALANCE_FIELDS}, actual))
+            if repair:
+                UserBalance.objects.update_or_create(user_id=user_id, defaults=actual)
+    return drifted
+
+
+def reconcile(user_ids, batch_size=500, workers=1, repair=True):
+    """Run ``reconcile_batch`` over ``user_ids`` in batches, ``workers`` at a time.
+
+    Each worker thread uses its own database connection. Returns every
+    drifted ``(user_id, stored, actual)``.
+    """
+    user_ids = list(user_ids)
+    batches = [user_ids[start:start + batch_size] for start in range(0, len(user_ids), batch_size)]
+    if workers <= 1:
+        return [entry for batch in batches for entry in reconcile_batch(batch, repair)]
+
+    def run(batch):
+        try:
+            return reconcile_batch(batch, repair)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [entry for result in pool.map(run, batches) for entry in result]
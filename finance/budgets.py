@@ -0,0 +1,53 @@
+"""Budget checks served from the monthly expense rollup.
+
+Every Expense create, update and delete already adjusts the matching
+``(user, EXPENSE, category, month)`` row of ``MonthlyCategoryTotal``, so a
+month's spend per category is a counter lookup on the rollup's unique index.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .fields import MoneyField, money
+from .models import Budget, MonthlyCategoryTotal
+from .rollups import month_start
+
+ZERO = Decimal('0')
+SPENT_FIELD = MoneyField(max_digits=14)
+
+
+def budget_status(user, month=None, categories=None):
+    """Return ``user``'s budgets with ``spent`` set to the month's spend, in one query.
+
+    ``month`` is any date in the month (default today); ``categories``
+    restricts the result to those expense types.
+    """
+    month = month_start(month or date.today())
+    spent = (
+        MonthlyCategoryTotal.objects
+        .filter(user=OuterRef('user'), kind=MonthlyCategoryTotal.KIND_EXPENSE,
+                category=OuterRef('category'), month=month)
+        .values('total')[:1]
+    )
+    budgets = Budget.objects.filter(user=user)
+    if categories is not None:
+        budgets = budgets.filter(category__in=categories)
+    return list(budgets.annotate(spent=Coalesce(Subquery(spent), money(ZERO), output_field=SPENT_FIELD)))
+
+
+def alerts(expense):
+    """Budgets at or over their warning threshold in ``expense``'s category and month."""
+    return [
+        budget for budget in budget_status(expense.user, expense.date_incurred, [expense.expense_type])
+        if budget.state != Budget.STATE_OK
+    ]
+
+
+def describe(budget, month):
+    """One-line warning for a budget in the ``alerts`` result."""
+    label = f"{budget.get_category_display()} budget for {month:%b %Y}"
+    if budget.state == Budget.STATE_OVER:
+        return f"{label} exceeded: ₹{budget.spent:.2f} spent of ₹{budget.amount:.2f}."
+    return f"{label} is {budget.used_percentage:.0f}% used (₹{budget.spent:.2f} of ₹{budget.amount:.2f})."
@@ -0,0 +1,133 @@
+"""Bulk delete and re-categorize for Income and Expense rows.
+
+Each batch is one ``UPDATE`` or ``DELETE`` over a set of primary keys. The
+derived tables move by one grouped delta per ``(user, category, month)``
+bucket, rather than once per row through the signal handlers:
+``MonthlyCategoryTotal``, ``UserBalance`` and the data version. The bumped
+version also makes the cached prefix-sum index rebuild on its next read.
+A whole operation is one transaction, so it applies completely or not at
+all. Batches of ``FINANCE_BULK_BATCH_SIZE`` rows bound the size of each
+statement and of the rows held in memory.
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from . import balances, rollups
+from .cache import bump_data_version
+from .search import filter_queryset
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def batch_size():
+    return getattr(settings, 'FINANCE_BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def fields(model):
+    """``(rollup kind, category field, date field)`` for Income or Expense."""
+    kind = rollups.kind_for_model(model)
+    _, category_field, date_field = rollups.SOURCES[kind]
+    return kind, category_field, date_field
+
+
+def select(user, model, ids=None, category=None, start=None, end=None, text=None):
+    """``user``'s rows of ``model``: the given ``ids``, or every row matching the filters.
+
+    ``category`` is a type code, ``start`` and ``end`` are inclusive dates and
+    ``text`` matches descriptions as in ``finance.search``.
+    """
+    _, category_field, date_field = fields(model)
+    rows = model.objects.filter(user=user)
+    if ids is not None:
+        return rows.filter(pk__in=ids)
+    if category:
+        rows = rows.filter(**{category_field: category})
+    if start:
+        rows = rows.filter(**{f'{date_field}__gte': start})
+    if end:
+        rows = rows.filter(**{f'{date_field}__lte': end})
+    return filter_queryset(rows, text)
+
+
+def _buckets(rows, category_field, date_field):
+    """Total and count per ``(user, category, month)`` of ``rows``."""
+    return list(
+        rows.order_by().annotate(month=TruncMonth(date_field))
+        .values('user_id', category_field, 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+
+
+def _in_batches(queryset, apply, size=None):
+    """Call ``apply(rows)`` on ``queryset`` in primary-key order, in one transaction.
+
+    ``apply`` gets a queryset over at most ``size`` locked rows and returns
+    how many it changed; the sum is returned. An exception in any batch
+    rolls back every batch.
+    """
+    size = size or batch_size()
+    model = queryset.model
+    done = 0
+    last = 0
+    with transaction.atomic(using=router.db_for_write(model)):
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last).order_by('pk').select_for_update()
+                .values_list('pk', flat=True)[:size]
+            )
+            if not pks:
+                break
+            done += apply(model.objects.filter(pk__in=pks))
+            if len(pks) < size:
+                break
+            last = pks[-1]
+    return done
+
+
+def delete(queryset, size=None):
+    """Delete every row of an Income/Expense ``queryset``; returns the number deleted."""
+    model = queryset.model
+    kind, category_field, date_field = fields(model)
+
+    def apply(rows):
+        buckets = _buckets(rows, category_field, date_field)
+        removed = {}
+        for bucket in buckets:
+            user_id = bucket['user_id']
+            rollups.apply_delta(user_id, kind, bucket[category_field], bucket['month'],
+                                -bucket['total'], -bucket['count'])
+            removed[user_id] = removed.get(user_id, 0) + bucket['total']
+        for user_id, total in sorted(removed.items()):
+            balances.apply_delta(user_id, {field: -total for field in balances.SOURCES[model]})
+            bump_data_version(user_id)
+        # The per-row post_delete handlers skip this delete (see
+        # signals.applied_in_bulk); the deltas above already cover it.
+        rows.derived_applied = True
+        return rows.delete()[1].get(model._meta.label, 0)
+
+    return _in_batches(queryset, apply, size)
+
+
+def recategorize(queryset, category, size=None):
+    """Move every row of an Income/Expense ``queryset`` to ``category``; returns the number moved.
+
+    Rows already in ``category`` are left alone. Balances do not change; the
+    rollup totals move from each old category to the new one.
+    """
+    model = queryset.model
+    kind, category_field, date_field = fields(model)
+
+    def apply(rows):
+        rows = rows.exclude(**{category_field: category})
+        buckets = _buckets(rows, category_field, date_field)
+        for bucket in buckets:
+            user_id, month = bucket['user_id'], bucket['month']
+            rollups.apply_delta(user_id, kind, bucket[category_field], month, -bucket['total'], -bucket['count'])
+            rollups.apply_delta(user_id, kind, category, month, bucket['total'], bucket['count'])
+        for user_id in sorted({bucket['user_id'] for bucket in buckets}):
+            bump_data_version(user_id)
+        return rows.update(**{category_field: category})
+
+    return _in_batches(queryset, apply, size)
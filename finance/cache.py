@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import UserDataVersion
+
+_MISSING = object()
+
+
+def bump_data_version(user_id):
+    """Invalidate everything cached for ``user_id``.
+
+    Call inside the transaction that wrote the user's data so the new version
+    becomes visible together with the rows it describes.
+    """
+    now = timezone.now()
+    versions = UserDataVersion.objects.filter(user_id=user_id)
+    if versions.update(version=F('version') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            UserDataVersion.objects.create(user_id=user_id, version=1, updated_at=now)
+    except IntegrityError:
+        versions.update(version=F('version') + 1, updated_at=now)
+
+
+def data_version(user):
+    """Return ``(version, updated_at)`` for ``user``; ``(0, None)`` before the first write."""
+    row = UserDataVersion.objects.filter(user=user).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+async def adata_version(user):
+    """Async variant of ``data_version``."""
+    row = await UserDataVersion.objects.filter(user=user).values_list('version', 'updated_at').afirst()
+    return row or (0, None)
+
+
+class VersionedCache:
+    """Per-user view over Django's cache framework.
+
+    Keys embed the user's data version, so entries never need deleting: a
+    write bumps the version and later reads simply miss. Values are pickled by
+    the backend, so anything stored must be picklable (locmem, file and Redis
+    backends all behave the same). The backend and timeout come from
+    ``FINANCE_CACHE_ALIAS`` and ``FINANCE_CACHE_TIMEOUT``.
+    """
+
+    def __init__(self, user, alias=None, timeout=None):
+        self.user = user
+        self.cache = caches[alias or getattr(settings, 'FINANCE_CACHE_ALIAS', 'default')]
+        self.timeout = timeout if timeout is not None else getattr(settings, 'FINANCE_CACHE_TIMEOUT', 60 * 60)
+
+    @cached_property
+    def _version_row(self):
+        return data_version(self.user)
+
+    @property
+    def version(self):
+        return self._version_row[0]
+
+    @property
+    def updated_at(self):
+        return self._version_row[1]
+
+    async def aload(self):
+        """Read the data version without blocking the event loop (async views call this first)."""
+        if '_version_row' not in self.__dict__:
+            self.__dict__['_version_row'] = await adata_version(self.user)
+
+    def key(self, name):
+        return f'finance:{self.user.pk}:v{self.version}:{name}'
+
+    def get_or_set(self, name, compute):
+        key = self.key(name)
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.cache.set(key, value, self.timeout)
+        return value
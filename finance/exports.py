@@ -0,0 +1,118 @@
+import csv
+import heapq
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .fields import format_minor, from_minor, minor
+from .models import Income, Expense, SavingsGoal
+from .services import LedgerRow
+
+DEFAULT_CHUNK_SIZE = 2000
+
+INCOME_LABELS = dict(Income.INCOME_TYPE_CHOICES)
+EXPENSE_LABELS = dict(Expense.EXPENSE_TYPE_CHOICES)
+SOURCE_LABELS = dict(Expense.SOURCE_CHOICES)
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def chunk_size():
+    return getattr(settings, 'FINANCE_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def stream_csv(filename, header, rows):
+    """Stream ``rows`` as a CSV attachment, one line at a time."""
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def expense_rows(user):
+    rows = (
+        Expense.objects.filter(user=user)
+        .values_list('expense_type', minor('amount'), 'date_incurred', 'source', 'description')
+        .iterator(chunk_size=chunk_size())
+    )
+    for expense_type, amount, date_incurred, source, description in rows:
+        yield (
+            EXPENSE_LABELS.get(expense_type, expense_type),
+            format_minor(amount),
+            date_incurred.strftime('%Y-%m-%d'),
+            SOURCE_LABELS.get(source, source),
+            description or '',
+        )
+
+
+def income_rows(user):
+    rows = (
+        Income.objects.filter(user=user).order_by('-date_received')
+        .values_list('income_type', minor('amount'), 'date_received', 'description')
+        .iterator(chunk_size=chunk_size())
+    )
+    for income_type, amount, date_received, description in rows:
+        yield INCOME_LABELS.get(income_type, income_type), format_minor(amount), date_received, description
+
+
+def savings_rows(user):
+    rows = (
+        SavingsGoal.objects.filter(user=user)
+        .values_list('goal_name', minor('target_amount'), minor('current_amount'), 'created_at', 'target_date')
+        .iterator(chunk_size=chunk_size())
+    )
+    for goal_name, target_amount, current_amount, created_at, target_date in rows:
+        yield (
+            goal_name,
+            format_minor(target_amount),
+            format_minor(current_amount),
+            created_at.strftime('%Y-%m-%d'),
+            target_date.strftime('%Y-%m-%d'),
+        )
+
+
+def transaction_rows(user):
+    """``LedgerRow``s of every stream, each already newest first, merged by ``(date, kind, id)``.
+
+    ``heapq.merge`` only holds one pending row per stream, so memory does not
+    grow with history. Key tuples only compare past the kind rank within one
+    stream, so savings can order by creation time inside a day.
+    """
+    size = chunk_size()
+    savings = (
+        ((day, 3, created_at, pk), LedgerRow.build('savings', from_minor(amount), goal_name, 'Savings', day))
+        for pk, created_at, amount, goal_name in SavingsGoal.objects.filter(user=user)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at', minor('current_amount'), 'goal_name')
+        .iterator(chunk_size=size)
+        for day in (timezone.localdate(created_at),)
+    )
+    incomes = (
+        ((date_received, 2, pk), LedgerRow.build('income', from_minor(amount), income_type, 'Income', date_received))
+        for pk, date_received, amount, income_type in Income.objects.filter(user=user)
+        .order_by('-date_received', '-id')
+        .values_list('id', 'date_received', minor('amount'), 'income_type')
+        .iterator(chunk_size=size)
+    )
+    expenses = (
+        ((date_incurred, 1, pk),
+         LedgerRow.build('expense', from_minor(-amount), description, expense_type, date_incurred))
+        for pk, date_incurred, amount, description, expense_type in Expense.objects.filter(user=user)
+        .order_by('-date_incurred', '-id')
+        .values_list('id', 'date_incurred', minor('amount'), 'description', 'expense_type')
+        .iterator(chunk_size=size)
+    )
+    for _, row in heapq.merge(savings, incomes, expenses, key=lambda entry: entry[0], reverse=True):
+        yield row
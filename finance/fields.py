@@ -0,0 +1,104 @@
+"""Money stored as whole paise.
+
+``MoneyField`` keeps amounts in a ``BIGINT`` column, so sums are exact
+integer arithmetic in every database, while model instances, forms and ORM
+results still see ``Decimal`` rupees. Code that only formats amounts can skip
+the ``Decimal`` round trip: select ``minor('amount')`` and pass the integer to
+``format_minor``.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.core.validators import DecimalValidator
+from django.db import models
+from django.db.models import ExpressionWrapper, F, Value
+from django.utils.functional import cached_property
+
+MINOR_PER_UNIT = 100
+# Below this many paise a double is within a tenth of a paisa of the exact
+# amount, so '%.2f' of it rounds to the right string.
+FLOAT_EXACT_MINOR = 10 ** 15
+
+
+def to_minor(value):
+    """Paise for a rupee amount (``Decimal``, ``int``, ``float`` or string)."""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * MINOR_PER_UNIT).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_minor(value):
+    """Exact ``Decimal`` rupees for an integer paise amount; ``None`` stays ``None``."""
+    if value is None:
+        return None
+    return Decimal(int(value)).scaleb(-2)
+
+
+def format_minor(value):
+    """``'1234.50'`` for 123450 paise, without going through ``Decimal``."""
+    if -FLOAT_EXACT_MINOR < value < FLOAT_EXACT_MINOR:
+        return '%.2f' % (value / MINOR_PER_UNIT)
+    units, paise = divmod(abs(value), MINOR_PER_UNIT)
+    return f"{'-' if value < 0 else ''}{units}.{paise:02d}"
+
+
+def minor(name):
+    """Select the raw paise of a money column (``values_list(minor('amount'))``)."""
+    return ExpressionWrapper(F(name), output_field=models.BigIntegerField())
+
+
+def money(value):
+    """A rupee amount as a query parameter for money columns, e.g. ``F('total') + money(delta)``."""
+    return Value(value, output_field=MoneyField())
+
+
+class MoneyField(models.BigIntegerField):
+    """Rupee amount with two decimal places, stored as an integer number of paise.
+
+    ``max_digits`` bounds the amount like ``DecimalField``'s does and sizes the
+    form field; it does not change the column.
+    """
+    description = "Money amount stored in minor units"
+
+    def __init__(self, *args, max_digits=12, **kwargs):
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits != 12:
+            kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        return [*self._validators, DecimalValidator(self.max_digits, 2)]
+
+    def from_db_value(self, value, expression, connection):
+        return from_minor(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return to_minor(self.to_python(value))
+
+    def formfield(self, **kwargs):
+        # Field.formfield, not IntegerField's: no integer bounds on a rupee field.
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            **kwargs,
+        })
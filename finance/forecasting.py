@@ -0,0 +1,222 @@
+"""Savings and cash-flow projections computed with NumPy.
+
+``forecast`` reads a user's goals, recent contributions and monthly income
+and expense rollups into arrays and projects every goal at once, so the cost
+per goal is a handful of vector operations rather than Python code. Results
+are plain lists and floats, ready for ``JsonResponse`` and the cache.
+
+The history window is ``FINANCE_FORECAST_HISTORY_MONTHS`` calendar months
+including the current one (default 12); the balance curve runs
+``FINANCE_FORECAST_HORIZON_MONTHS`` months ahead (default 12).
+"""
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+
+from .fields import minor
+from .models import MonthlyCategoryTotal, SavingsContribution, SavingsGoal
+from .rollups import months_back
+from .services import FinanceSummary
+
+DAYS_PER_MONTH = 365.2425 / 12
+# Projections further out than this are reported as stalled rather than dated.
+MAX_PROJECTION_DAYS = 100 * 365
+
+STATUS_REACHED = 'reached'
+STATUS_ON_TRACK = 'on_track'
+STATUS_BEHIND = 'behind'
+STATUS_STALLED = 'stalled'
+
+
+def history_months():
+    return getattr(settings, 'FINANCE_FORECAST_HISTORY_MONTHS', 12)
+
+
+def horizon_months():
+    return getattr(settings, 'FINANCE_FORECAST_HORIZON_MONTHS', 12)
+
+
+def month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def month_date(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_label(index):
+    return month_date(index).strftime('%b %Y')
+
+
+def monthly_history(user, start, months):
+    """Return ``(income, expense)`` arrays of the ``months`` monthly totals from ``start``, oldest first.
+
+    Rows dated after the window (future-dated entries) are left out.
+    """
+    last = month_date(month_index(start) + months - 1)
+    rows = list(
+        MonthlyCategoryTotal.objects.filter(user=user, month__gte=start, month__lte=last).order_by()
+        .values('kind', 'month')
+        .annotate(amount=Sum(minor('total')))
+        .values_list('kind', 'month', 'amount')
+    )
+    income = np.zeros(months)
+    expense = np.zeros(months)
+    if rows:
+        kinds, month_starts, amounts = zip(*rows)
+        offsets = np.fromiter(map(month_index, month_starts), dtype=np.int64, count=len(rows)) - month_index(start)
+        amounts = np.array(amounts, dtype=float) / 100
+        is_income = np.array(kinds) == MonthlyCategoryTotal.KIND_INCOME
+        np.add.at(income, offsets[is_income], amounts[is_income])
+        np.add.at(expense, offsets[~is_income], amounts[~is_income])
+    return income, expense
+
+
+def goal_arrays(user, start):
+    """Return the user's goals, ordered by id, as a dict of arrays.
+
+    ``contributed`` is the goal's net deposits since ``start``; it is filled in
+    with ``searchsorted`` so goals without contributions simply stay at zero.
+    """
+    rows = list(
+        SavingsGoal.objects.filter(user=user).order_by('id')
+        .values_list('id', 'goal_name', minor('target_amount'), minor('current_amount'), 'target_date')
+    )
+    ids, names, targets, current, target_dates = zip(*rows) if rows else ((),) * 5
+    goals = {
+        'id': np.array(ids, dtype=np.int64),
+        'name': list(names),
+        'target': np.array(targets, dtype=float) / 100,
+        'current': np.array(current, dtype=float) / 100,
+        'target_date': np.array(target_dates, dtype='datetime64[D]'),
+        'contributed': np.zeros(len(rows)),
+    }
+    contributions = list(
+        SavingsContribution.objects.filter(user=user, date_contributed__gte=start).order_by('goal_id')
+        .values('goal_id')
+        .annotate(total=Sum(minor('amount')))
+        .values_list('goal_id', 'total')
+    )
+    if contributions:
+        goal_ids, totals = zip(*contributions)
+        goals['contributed'][np.searchsorted(goals['id'], goal_ids)] = np.array(totals, dtype=float) / 100
+    return goals
+
+
+def project_goals(goals, today, months):
+    """Vectorized per-goal projections; every value is an array aligned with ``goals['id']``."""
+    today = np.datetime64(today, 'D')
+    target, current = goals['target'], goals['current']
+    remaining = np.maximum(target - current, 0)
+    rate = goals['contributed'] / months
+
+    days_left = (goals['target_date'] - today).astype(np.int64)
+    months_left = days_left / DAYS_PER_MONTH
+    # Whatever is still missing on an overdue (or this month's) goal is due now.
+    required = np.where(remaining > 0, remaining / np.maximum(months_left, 1), 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_needed = np.where(rate > 0, np.ceil(remaining / rate * DAYS_PER_MONTH), np.inf)
+    days_needed[remaining == 0] = 0
+    dated = days_needed <= MAX_PROJECTION_DAYS
+    completion = today + np.where(dated, days_needed, 0).astype('timedelta64[D]')
+
+    status = np.select(
+        [remaining == 0, ~dated, completion <= goals['target_date']],
+        [STATUS_REACHED, STATUS_STALLED, STATUS_ON_TRACK],
+        STATUS_BEHIND,
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(target > 0, current / target * 100, 0)
+    return {
+        'progress': progress,
+        'remaining': remaining,
+        'monthly_rate': rate,
+        'required_monthly': required,
+        'months_left': months_left,
+        'projected_completion': np.where(dated, np.datetime_as_string(completion), None),
+        'status': status,
+    }
+
+
+def balance_curve(net_balance, cash_flow, saving_rate, required, months_left, horizon):
+    """Project the net balance ``horizon`` months ahead.
+
+    ``run_rate`` keeps income, expenses and savings deposits at their recent
+    monthly averages; ``with_goals`` instead sets aside each unfinished goal's
+    required monthly contribution until its target date.
+    """
+    steps = np.arange(horizon + 1)
+    run_rate = net_balance + steps * (cash_flow - saving_rate)
+    # A goal needs its contribution in months 1..ceil(months_left): count how
+    # many goals end at each month, then sum from the far end to get the
+    # commitment still active in every month.
+    last_month = np.clip(np.ceil(months_left), 1, horizon).astype(np.int64)
+    ending = np.bincount(last_month, weights=required, minlength=horizon + 1)
+    active = np.cumsum(ending[::-1])[::-1]
+    active[0] = 0
+    return run_rate, net_balance + steps * cash_flow - np.cumsum(active)
+
+
+def forecast(user, cache=None, today=None):
+    """Return the savings and cash-flow forecast for ``user`` as JSON-ready data.
+
+    Cached per data version and day when a ``finance.cache.VersionedCache`` is
+    given.
+    """
+    today = today or date.today()
+    months, horizon = history_months(), horizon_months()
+
+    def compute():
+        return _forecast(user, cache, today, months, horizon)
+
+    if cache is None:
+        return compute()
+    return cache.get_or_set(f'forecast:{today}:{months}:{horizon}', compute)
+
+
+def _forecast(user, cache, today, months, horizon):
+    start = months_back(today, months)
+    income, expense = monthly_history(user, start, months)
+    goals = goal_arrays(user, start)
+    projected = project_goals(goals, today, months)
+    net_balance = float(FinanceSummary(user, cache=cache).net_balance)
+
+    cash_flow = float(income.mean() - expense.mean())
+    saving_rate = float(projected['monthly_rate'].sum())
+    run_rate, with_goals = balance_curve(
+        net_balance, cash_flow, saving_rate, projected['required_monthly'], projected['months_left'], horizon
+    )
+    first = month_index(start)
+    current = month_index(today)
+    return {
+        'as_of': today.isoformat(),
+        'history': {
+            'labels': [month_label(index) for index in range(first, first + months)],
+            'income': np.round(income, 2).tolist(),
+            'expense': np.round(expense, 2).tolist(),
+        },
+        'run_rate': {
+            'income': round(float(income.mean()), 2),
+            'expense': round(float(expense.mean()), 2),
+            'savings': round(saving_rate, 2),
+            'net': round(cash_flow - saving_rate, 2),
+        },
+        'balance_curve': {
+            'labels': [month_label(index) for index in range(current, current + horizon + 1)],
+            'run_rate': np.round(run_rate, 2).tolist(),
+            'with_goals': np.round(with_goals, 2).tolist(),
+        },
+        'goals': {
+            'ids': goals['id'].tolist(),
+            'names': goals['name'],
+            'progress': np.round(projected['progress'], 1).tolist(),
+            'remaining': np.round(projected['remaining'], 2).tolist(),
+            'monthly_rate': np.round(projected['monthly_rate'], 2).tolist(),
+            'required_monthly': np.round(projected['required_monthly'], 2).tolist(),
+            'projected_completion': projected['projected_completion'].tolist(),
+            'status': projected['status'].tolist(),
+        },
+    }
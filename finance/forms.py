@@ -1,9 +1,16 @@
 from django import forms
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from .models import Income, Expense, SavingsGoal
+from .models import Income, Expense, SavingsGoal, Budget, RecurringRule
+
+REPEAT_CHOICES = [('', 'Does not repeat'), *RecurringRule.FREQUENCY_CHOICES]
+
 
 class IncomeForm(forms.ModelForm):
+    # Not a model field: the view turns it into a RecurringRule (new rows only).
+    repeat = forms.ChoiceField(choices=REPEAT_CHOICES, required=False,
+                               widget=forms.Select(attrs={'class': 'form-select'}))
+
     class Meta:
         model = Income
         fields = ['income_type', 'amount', 'date_received', 'description']
@@ -39,6 +46,9 @@ class IncomeForm(forms.ModelForm):
         return amount
 
 class ExpenseForm(forms.ModelForm):
+    repeat = forms.ChoiceField(choices=REPEAT_CHOICES, required=False,
+                               widget=forms.Select(attrs={'class': 'form-select'}))
+
     class Meta:
         model = Expense
         fields = ['expense_type', 'amount', 'date_incurred', 'source', 'description']
@@ -161,6 +171,9 @@ class AddOrUpdateSavingsForm(forms.ModelForm): # NOTE: Changed to ModelForm
     def __init__(self, *args, **kwargs):
         # Pop the custom 'user' kwarg before calling the parent's __init__
         user = kwargs.pop('user', None)
+        # Goals the view has already fetched; used to render the dropdown
+        # without querying again.
+        goals = kwargs.pop('goals', None)
         
         # The parent ModelForm's __init__ will correctly handle the 'instance' kwarg
         super().__init__(*args, **kwargs)
@@ -168,6 +181,9 @@ class AddOrUpdateSavingsForm(forms.ModelForm): # NOTE: Changed to ModelForm
         # Populate the queryset for the 'existing_goal' dropdown
         if user:
             self.fields['existing_goal'].queryset = SavingsGoal.objects.filter(user=user)
+        if goals is not None:
+            field = self.fields['existing_goal']
+            field.choices = [('', field.empty_label)] + [(goal.pk, str(goal)) for goal in goals]
 
         # Make model fields not required by default.
         # Validation is now contextual in the clean() method.
@@ -211,3 +227,117 @@ class AddOrUpdateSavingsForm(forms.ModelForm): # NOTE: Changed to ModelForm
         if amount is not None and amount <= 0:
             raise ValidationError("Amount to add must be a positive number.")
         return amount
+
+class ImportForm(forms.Form):
+    KIND_CHOICES = [
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+    ]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, widget=forms.HiddenInput)
+    file = forms.FileField(
+        label="CSV file",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control form-control-sm', 'accept': '.csv'})
+    )
+
+
+class IdListField(forms.Field):
+    """Primary keys posted as repeated values (one checkbox per row)."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return sorted({int(item) for item in value})
+        except (TypeError, ValueError):
+            raise ValidationError("Invalid selection.", code='invalid')
+
+
+class BulkActionForm(forms.Form):
+    """Delete or re-categorize the checked Income/Expense rows, or every row matching the filters."""
+    ACTION_DELETE = 'delete'
+    ACTION_RECATEGORIZE = 'recategorize'
+    ACTION_CHOICES = [
+        (ACTION_DELETE, 'Delete'),
+        (ACTION_RECATEGORIZE, 'Change category'),
+    ]
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    category = forms.ChoiceField(required=False, label="New category",
+                                 widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    ids = IdListField(required=False)
+    # "All matching": ignore ``ids`` and act on every row the filters below select.
+    all_matching = forms.BooleanField(required=False, label="All rows matching the filter",
+                                      widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+    filter_category = forms.ChoiceField(required=False, label="Category",
+                                        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    start = forms.DateField(required=False, label="From",
+                            widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    end = forms.DateField(required=False, label="To",
+                          widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    q = forms.CharField(required=False, max_length=200, label="Description contains",
+                        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm'}))
+
+    def __init__(self, *args, model=Income, **kwargs):
+        # Rendered beside the add/edit form; keep the element ids apart.
+        kwargs.setdefault('auto_id', 'bulk_%s')
+        super().__init__(*args, **kwargs)
+        category_field = 'income_type' if model is Income else 'expense_type'
+        choices = list(model._meta.get_field(category_field).choices)
+        self.fields['category'].choices = [('', '---------')] + choices
+        self.fields['filter_category'].choices = [('', 'Any')] + choices
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == self.ACTION_RECATEGORIZE and not cleaned_data.get('category'):
+            self.add_error('category', "Choose the new category.")
+        if not cleaned_data.get('all_matching') and not cleaned_data.get('ids'):
+            raise ValidationError("Select at least one row.")
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            self.add_error('end', "End date must be on or after the start date.")
+        return cleaned_data
+
+
+class BudgetForm(forms.ModelForm):
+    class Meta:
+        model = Budget
+        fields = ['category', 'amount', 'warn_at']
+        widgets = {
+            'amount': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': 0.01,
+                'step': '0.01'
+            }),
+            'warn_at': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': 1,
+                'max': 100
+            }),
+        }
+        labels = {
+            'category': 'Expense Category',
+            'amount': 'Monthly Budget',
+            'warn_at': 'Warn At (%)'
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].widget.attrs.update({'class': 'form-select'})
+
+    def validate_unique(self):
+        # Saving a category that already has a budget replaces it (see views.budgets).
+        pass
+
+    def clean_amount(self):
+        amount = self.cleaned_data.get('amount')
+        if amount <= 0:
+            raise ValidationError("Amount must be greater than zero")
+        return amount
+
+    def clean_warn_at(self):
+        warn_at = self.cleaned_data.get('warn_at')
+        if not 1 <= warn_at <= 100:
+            raise ValidationError("Warning threshold must be between 1 and 100 percent")
+        return warn_at
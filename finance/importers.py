@@ -0,0 +1,187 @@
+import csv
+import hashlib
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from . import balances, rollups
+from .cache import bump_data_version
+from .forms import IncomeForm, ExpenseForm
+from .models import Income, Expense
+
+DEFAULT_BATCH_SIZE = 500
+
+# kind -> (form, CSV column -> form field, choice fields that accept labels)
+LAYOUTS = {
+    'income': (
+        IncomeForm,
+        {'Type': 'income_type', 'Amount': 'amount', 'Date': 'date_received', 'Description': 'description'},
+        {'income_type': Income.INCOME_TYPE_CHOICES},
+    ),
+    'expense': (
+        ExpenseForm,
+        {'Category': 'expense_type', 'Amount': 'amount', 'Date': 'date_incurred',
+         'Source': 'source', 'Description': 'description'},
+        {'expense_type': Expense.EXPENSE_TYPE_CHOICES, 'source': Expense.SOURCE_CHOICES},
+    ),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.errors = []  # (line number, message)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows: {self.created} created, {self.duplicates} duplicates, "
+                f"{len(self.errors)} errors ({self.rows_per_second:.0f} rows/s)")
+
+
+# kind -> fields that, with the owner, make two rows the same entry
+HASH_FIELDS = {
+    'income': ('income_type', 'date_received', 'amount', 'description'),
+    'expense': ('expense_type', 'date_incurred', 'source', 'amount', 'description'),
+}
+
+
+def _fingerprint(kind, user_id, values):
+    *fields, amount, description = values
+    parts = [kind, *(value.isoformat() if isinstance(value, date) else value for value in fields)]
+    parts += [str(user_id), str(Decimal(amount).quantize(Decimal('0.01'))), (description or '').strip()]
+    return hashlib.sha1('\x1f'.join(parts).encode()).hexdigest()
+
+
+def content_hash(instance):
+    """Fingerprint of the fields that make two Income/Expense rows the same entry."""
+    kind = 'income' if isinstance(instance, Income) else 'expense'
+    return _fingerprint(kind, instance.user_id, [getattr(instance, field) for field in HASH_FIELDS[kind]])
+
+
+def _choice_lookup(choices):
+    lookup = {}
+    for code, label in choices:
+        lookup[code.lower()] = code
+        lookup[label.lower()] = code
+    return lookup
+
+
+def _form_data(row, columns, lookups):
+    data = {}
+    for column, field in columns.items():
+        value = (row.get(column) or '').strip()
+        if field in lookups:
+            value = lookups[field].get(value.lower(), value)
+        data[field] = value
+    return data
+
+
+def _errors(form):
+    return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+
+
+def _stored_counts(kind, model, user, date_field, instances, digests):
+    """How many stored rows match each of ``digests``, reading only the dates ``instances`` carry."""
+    dates = {getattr(obj, date_field) for obj in instances}
+    rows = model.objects.filter(user=user, **{f'{date_field}__in': dates}).values_list(*HASH_FIELDS[kind])
+    counts = Counter()
+    for values in rows.iterator():
+        digest = _fingerprint(kind, user.pk, values)
+        if digest in digests:
+            counts[digest] += 1
+    return counts
+
+
+# Raised while reading a file that is not UTF-8 text or not CSV; the import
+# transaction is rolled back, so nothing from the file is kept.
+READ_ERRORS = (UnicodeDecodeError, csv.Error)
+
+
+def read_error_message(error):
+    """User-facing text for one of ``READ_ERRORS``."""
+    if isinstance(error, UnicodeDecodeError):
+        return "The file is not UTF-8 text. Save it as CSV (UTF-8) and import it again."
+    return f"The file is not a readable CSV ({error})."
+
+
+def import_csv(user, kind, lines, batch_size=None, dry_run=False):
+    """Import Income or Expense rows from CSV ``lines`` in the export layout.
+
+    Rows are validated with the same forms the UI uses and written with
+    ``bulk_create`` in ``batch_size`` chunks inside a single transaction that
+    also updates the rollup and data version. ``dry_run`` validates only.
+
+    Rows already stored are counted as duplicates and skipped, matched by
+    ``content_hash``: each stored copy of an entry accounts for one row of
+    the file. Re-importing an export therefore adds nothing, while a file
+    with two identical purchases on one day imports both.
+    """
+    form_class, columns, choices = LAYOUTS[kind]
+    model = form_class._meta.model
+    date_field = columns['Date']
+    lookups = {field: _choice_lookup(options) for field, options in choices.items()}
+    batch_size = batch_size or getattr(settings, 'FINANCE_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    result = ImportResult()
+    # digest -> stored copies not yet matched by a row of the file. Counted
+    # when a digest first appears, so rows this import wrote are never counted.
+    unmatched = {}
+    started = time.perf_counter()
+
+    def flush(batch):
+        if not batch:
+            return
+        new = {digest for _, digest in batch if digest not in unmatched}
+        if new:
+            counts = _stored_counts(kind, model, user, date_field,
+                                    [obj for obj, digest in batch if digest in new], new)
+            unmatched.update((digest, counts[digest]) for digest in new)
+        fresh = []
+        for obj, digest in batch:
+            if unmatched[digest]:
+                unmatched[digest] -= 1
+                result.duplicates += 1
+                continue
+            fresh.append(obj)
+        if not dry_run:
+            model.objects.bulk_create(fresh, batch_size=batch_size)
+            rollups.apply_created(fresh)
+            balances.apply_created(fresh)
+        result.created += len(fresh)
+
+    with transaction.atomic():
+        reader = csv.DictReader(lines)
+        missing = set(columns) - set(reader.fieldnames or [])
+        if missing:
+            result.errors.append((1, f"missing columns: {', '.join(sorted(missing))}"))
+            return result
+
+        batch = []
+        for line_no, row in enumerate(reader, start=2):
+            result.rows += 1
+            form = form_class(data=_form_data(row, columns, lookups))
+            if not form.is_valid():
+                result.errors.append((line_no, _errors(form)))
+                continue
+            obj = form.save(commit=False)
+            obj.user = user
+            batch.append((obj, content_hash(obj)))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+        if result.created and not dry_run:
+            bump_data_version(user.pk)
+
+    result.elapsed = time.perf_counter() - started
+    return result
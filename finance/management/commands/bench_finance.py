@@ -0,0 +1,158 @@
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+VIEWS = (
+    'finance:dashboard',
+    'finance:income',
+    'finance:expense',
+    'finance:savings',
+    'finance:transactions',
+    'finance:download_expenses',
+    'finance:download_income',
+    'finance:download_savings',
+    'finance:download_transactions',
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'baseline.json'
+DEFAULT_MARGIN = 0.25
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def fetch(client, url):
+    """GET ``url`` and consume the whole body, streamed or not."""
+    response = client.get(url)
+    if response.status_code != 200:
+        raise CommandError(f"{url} returned {response.status_code}")
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_view(client, url, repeat, warmup):
+    for _ in range(warmup):
+        fetch(client, url)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fetch(client, url)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Query count and peak memory come from one extra run so that neither
+    # tracemalloc nor query logging inflates the timings above.
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            fetch(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def regressions(results, baseline, margin):
+    """Return ``(view, metric, current, allowed)`` for every metric over its baseline."""
+    found = []
+    for view, metrics in baseline.get('views', {}).items():
+        current = results['views'].get(view)
+        if current is None:
+            continue
+        for metric, expected in metrics.items():
+            # Query counts are deterministic, so any increase is a regression.
+            allowed = expected if metric == 'queries' else expected * (1 + margin)
+            if current.get(metric, 0) > allowed:
+                found.append((view, metric, current[metric], allowed))
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the finance views for one (seeded) user and report p50/p95 latency, query "
+        "counts and peak memory as JSON. Fails when a baseline is exceeded by the margin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench0', help="Username to log in as (see seed_finance).")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per view.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per view first.")
+        parser.add_argument('--view', action='append', dest='views', choices=VIEWS,
+                            help="Only benchmark this URL name (may be given more than once).")
+        parser.add_argument('--baseline', type=Path,
+                            default=getattr(settings, 'FINANCE_BENCH_BASELINE', DEFAULT_BASELINE),
+                            help="Baseline JSON to compare against.")
+        parser.add_argument('--margin', type=float,
+                            default=getattr(settings, 'FINANCE_BENCH_MARGIN', DEFAULT_MARGIN),
+                            help="Allowed relative slowdown over the baseline (0.25 = 25%%).")
+        parser.add_argument('--output', type=Path, help="Also write the results to this file.")
+        parser.add_argument('--write-baseline', action='store_true',
+                            help="Store the results as the new baseline instead of comparing.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}; create one with seed_finance.")
+
+        client = Client()
+        client.force_login(user)
+        results = {
+            'user': user.username,
+            'rows': {
+                'income': user.income_set.count(),
+                'expense': user.expense_set.count(),
+                'savings': user.savingsgoal_set.count(),
+            },
+            'repeat': options['repeat'],
+            'views': {},
+        }
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name in options['views'] or VIEWS:
+                results['views'][name] = measure_view(client, reverse(name), options['repeat'], options['warmup'])
+
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if options['output']:
+            options['output'].write_text(report + '\n')
+
+        baseline_path = options['baseline']
+        if options['write_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(report + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote baseline {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stderr.write(self.style.WARNING(f"No baseline at {baseline_path}; nothing to compare."))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('rows') != results['rows']:
+            self.stderr.write(self.style.WARNING(
+                f"Baseline was recorded with {baseline.get('rows')} rows, this run has {results['rows']}."
+            ))
+        failed = regressions(results, baseline, options['margin'])
+        for view, metric, current, allowed in failed:
+            self.stderr.write(f"{view} {metric}: {current} > {allowed:g}")
+        if failed:
+            raise CommandError(f"{len(failed)} metrics exceeded the baseline by more than {options['margin']:.0%}.")
+        self.stderr.write(self.style.SUCCESS("Within baseline."))
@@ -0,0 +1,41 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.importers import LAYOUTS, READ_ERRORS, import_csv, read_error_message
+
+
+class Command(BaseCommand):
+    help = "Import Income or Expense rows for a user from a CSV in the export layout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import.")
+        parser.add_argument('--user', required=True, help="Username or id of the owner.")
+        parser.add_argument('--kind', required=True, choices=sorted(LAYOUTS))
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per validation/insert batch (default FINANCE_IMPORT_BATCH_SIZE).")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and deduplicate without writing.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'username': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user matching {options['user']!r}")
+
+        try:
+            with io.open(options['path'], newline='', encoding='utf-8-sig') as handle:
+                result = import_csv(user, options['kind'], handle,
+                                    batch_size=options['batch_size'], dry_run=options['dry_run'])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except READ_ERRORS as exc:
+            raise CommandError(f"{options['path']}: {read_error_message(exc)}")
+
+        for line_no, message in result.errors:
+            self.stderr.write(f"line {line_no}: {message}")
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(style(f"{prefix}{result}"))
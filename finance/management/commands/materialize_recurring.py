@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finance import recurring
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the Income/Expense rows for every recurring rule due by --until (default today). "
+        "Safe to run from cron as often as you like: occurrences are never written twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=date.fromisoformat, default=None,
+                            help="Materialize occurrences up to this date, YYYY-MM-DD (default today).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help=f"Rules per transaction (default {recurring.DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Split the work by user id range over this many processes.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            raise CommandError("--workers needs a database that allows concurrent writers; SQLite does not.")
+        result = recurring.materialize(options['until'], batch_size=options['batch_size'], workers=workers)
+        self.stdout.write(self.style.SUCCESS(f"Materialized {result}."))
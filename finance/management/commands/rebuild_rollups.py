@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finance import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly per-category rollup table from Income and Expense rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only rebuild this user id (may be given more than once).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rollups.rebuild(options['user_ids'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} rollup buckets in {elapsed:.2f}s."
+        ))
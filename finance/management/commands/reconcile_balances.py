@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finance import balances
+
+
+class Command(BaseCommand):
+    help = "Check stored per-user balances against the Income/Expense/SavingsGoal tables and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only reconcile this user id (may be given more than once).",
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help="Users checked per transaction.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Batches checked in parallel (default 4, or 1 on SQLite).")
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift; exit with an error instead of repairing it.")
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if user_ids is None:
+            user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        workers = options['workers'] or (1 if connection.vendor == 'sqlite' else 4)
+        repair = not options['check']
+
+        started = time.perf_counter()
+        drifted = balances.reconcile(user_ids, batch_size=options['batch_size'], workers=workers, repair=repair)
+        elapsed = time.perf_counter() - started
+
+        for user_id, stored, actual in sorted(drifted, key=lambda entry: entry[0]):
+            changes = ", ".join(
+                f"{field} {stored[field]} -> {actual[field]}"
+                for field in balances.BALANCE_FIELDS if stored[field] != actual[field]
+            )
+            self.stdout.write(f"user {user_id}: {changes}")
+        if drifted and not repair:
+            raise CommandError(f"{len(drifted)} balances drifted.")
+        verb = "Repaired" if drifted else "Checked"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} balances in {elapsed:.2f}s; {len(drifted)} drifted."
+        ))
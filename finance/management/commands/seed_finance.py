@@ -0,0 +1,123 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from finance import balances, rollups
+from finance.cache import bump_data_version
+from finance.models import Income, Expense, SavingsGoal, SavingsContribution
+
+MAX_ROWS = 1_000_000
+
+
+def row_count(value):
+    rows = int(value)
+    if not 0 <= rows <= MAX_ROWS:
+        raise ValueError(value)
+    return rows
+
+
+def cents(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def incomes(user, rng, rows, end, days):
+    types = [code for code, _ in Income.INCOME_TYPE_CHOICES]
+    for i in range(rows):
+        yield Income(user=user, income_type=rng.choice(types), amount=cents(rng, 100, 8000),
+                     date_received=end - timedelta(days=rng.randrange(days)),
+                     description=f"Seeded income {i}")
+
+
+def expenses(user, rng, rows, end, days):
+    types = [code for code, _ in Expense.EXPENSE_TYPE_CHOICES]
+    sources = [code for code, _ in Expense.SOURCE_CHOICES]
+    for i in range(rows):
+        yield Expense(user=user, expense_type=rng.choice(types), source=rng.choice(sources),
+                      amount=cents(rng, 1, 1500), date_incurred=end - timedelta(days=rng.randrange(days)),
+                      description=f"Seeded expense {i}")
+
+
+def goals(user, rng, rows, end, days):
+    for i in range(rows):
+        target = cents(rng, 1000, 50000)
+        yield SavingsGoal(user=user, goal_name=f"Goal {i}", target_amount=target,
+                          current_amount=(target * Decimal(rng.random())).quantize(Decimal('0.01')),
+                          target_date=end + timedelta(days=rng.randrange(1, days)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Create deterministic synthetic users with Income, Expense and SavingsGoal rows "
+        "for benchmarking. The same --seed and --end always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help="Number of users to create.")
+        parser.add_argument('--prefix', default='bench', help="Username prefix; users are <prefix>0, <prefix>1, ...")
+        parser.add_argument('--rows', type=row_count, default=1000,
+                            help=f"Rows per model per user (0-{MAX_ROWS}) unless overridden below.")
+        parser.add_argument('--incomes', type=row_count, help="Income rows per user.")
+        parser.add_argument('--expenses', type=row_count, help="Expense rows per user.")
+        parser.add_argument('--goals', type=row_count, help="SavingsGoal rows per user.")
+        parser.add_argument('--days', type=int, default=3650, help="Spread dates over this many days.")
+        parser.add_argument('--end', type=date.fromisoformat, default=None,
+                            help="Latest transaction date, YYYY-MM-DD (default today).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete existing users with the same usernames first.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        names = [f"{options['prefix']}{n}" for n in range(options['users'])]
+        existing = User.objects.filter(username__in=names)
+        if existing.exists():
+            if not options['replace']:
+                raise CommandError(f"Users {', '.join(existing.values_list('username', flat=True))} "
+                                   f"already exist; pass --replace to recreate them.")
+            existing.delete()
+
+        volumes = {
+            Income: (incomes, options['incomes'] if options['incomes'] is not None else options['rows']),
+            Expense: (expenses, options['expenses'] if options['expenses'] is not None else options['rows']),
+            SavingsGoal: (goals, options['goals'] if options['goals'] is not None else options['rows']),
+        }
+        end = options['end'] or date.today()
+        started = time.perf_counter()
+        for n, name in enumerate(names):
+            rng = random.Random(f"{options['seed']}:{n}")
+            user = User.objects.create_user(username=name, email=f"{name}@example.com", password=name)
+            for model, (factory, rows) in volumes.items():
+                self.bulk_insert(model, factory(user, rng, rows, end, options['days']), options['batch_size'])
+            with transaction.atomic():
+                rollups.rebuild([user.pk])
+                balances.reconcile_batch([user.pk])
+                bump_data_version(user.pk)
+            self.stdout.write(f"{name}: " + ", ".join(
+                f"{rows} {model.__name__}" for model, (_, rows) in volumes.items()
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(names)} users in {time.perf_counter() - started:.2f}s."
+        ))
+
+    @staticmethod
+    def bulk_insert(model, objects, batch_size):
+        # bulk_create() materialises its input, so feed it one batch at a time
+        # to keep memory flat at a million rows.
+        while batch := list(islice(objects, batch_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if model is SavingsGoal:
+                    SavingsContribution.objects.bulk_create(
+                        SavingsContribution(user_id=goal.user_id, goal=goal, amount=goal.current_amount,
+                                            date_contributed=timezone.localdate(goal.created_at))
+                        for goal in batch if goal.current_amount
+                    )
@@ -0,0 +1,238 @@
+"""Per-view request, SQL and template timings in Prometheus text format.
+
+Enable by adding ``finance.metrics.MetricsMiddleware`` to ``MIDDLEWARE``
+(after the authentication middleware). The middleware then serves the
+numbers to staff users at ``/metrics`` (``FINANCE_METRICS_PATH``), outside
+the app's URL prefix where scrapers expect it, and times template renders;
+without it nothing is patched or served. Figures are kept in process memory,
+so every worker reports its own and the scraper sums them.
+
+Setting ``FINANCE_QUERY_BUDGET`` (typically only in development settings)
+logs a warning for every request that runs more queries than the budget.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('finance_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            running += count
+            yield bound, running
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.stream_seconds = 0.0
+
+
+class Registry:
+    """Thread-safe in-process store of ``ViewMetrics`` keyed by view name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, stats, seconds, stream_seconds=0.0):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            metrics.sql_seconds += stats.sql_seconds
+            metrics.template_seconds += stats.template_seconds
+            metrics.stream_seconds += stream_seconds
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Return all series in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+            for name, kind, help_text, value in (
+                ('finance_request_duration_seconds', 'histogram', 'Request latency per view.', 'latency'),
+                ('finance_request_queries', 'histogram', 'SQL queries per request.', 'queries'),
+                ('finance_sql_duration_seconds_total', 'counter', 'Time spent executing SQL.', 'sql_seconds'),
+                ('finance_template_render_seconds_total', 'counter', 'Time spent rendering templates.',
+                 'template_seconds'),
+                ('finance_stream_duration_seconds_total', 'counter', 'Time spent writing streamed bodies.',
+                 'stream_seconds'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for view, metrics in views:
+                    label = f'view="{_escape(view)}"'
+                    series = getattr(metrics, value)
+                    if kind == 'histogram':
+                        for bound, count in series.cumulative():
+                            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                        lines.append(f'{name}_sum{{{label}}} {series.sum:g}')
+                        lines.append(f'{name}_count{{{label}}} {series.count}')
+                    else:
+                        lines.append(f'{name}{{{label}}} {series:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def record_sql(execute, sql, params, many, context):
+    """``execute_wrapper`` that charges each query to the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+
+def instrument_templates():
+    """Time top-level template renders (``render()``, ``render_to_string``).
+
+    Wraps the Django template backend once; included templates are part of
+    their parent's render and are not counted twice.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'finance_instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return original(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+    render.finance_instrumented = True
+    Template.render = render
+
+
+def query_budget():
+    return getattr(settings, 'FINANCE_QUERY_BUDGET', None)
+
+
+def metrics_path():
+    return getattr(settings, 'FINANCE_METRICS_PATH', '/metrics')
+
+
+@staff_member_required
+@require_GET
+def serve(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and template time for every request, labelled by view name.
+
+    Streaming responses (CSV exports) are recorded when the body has been
+    written, so their queries and write time are included. Scrapes of
+    ``metrics_path()`` are answered here and not recorded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        if request.path == metrics_path():
+            return serve(request)
+        stats = RequestStats()
+        started = time.perf_counter()
+        with self._collect(stats):
+            response = self.get_response(request)
+        if isinstance(response, StreamingHttpResponse) and not response.is_async:
+            response.streaming_content = self._stream(request, response.streaming_content, stats, started)
+        else:
+            self._finish(request, stats, started)
+        return response
+
+    def _collect(self, stats):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record_sql))
+        token = _current.set(stats)
+        stack.callback(_current.reset, token)
+        return stack
+
+    def _stream(self, request, content, stats, started):
+        body_started = time.perf_counter()
+        try:
+            with self._collect(stats):
+                yield from content
+        finally:
+            self._finish(request, stats, started, time.perf_counter() - body_started)
+
+    def _finish(self, request, stats, started, stream_seconds=0.0):
+        view = view_name(request)
+        registry.record(view, stats, time.perf_counter() - started, stream_seconds)
+        budget = query_budget()
+        if budget is not None and stats.queries > budget:
+            logger.warning(
+                "%s ran %d queries (budget %d) in %.1f ms of SQL",
+                view, stats.queries, budget, stats.sql_seconds * 1000,
+            )
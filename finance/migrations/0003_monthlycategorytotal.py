@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    MonthlyCategoryTotal = apps.get_model('finance', 'MonthlyCategoryTotal')
+    sources = [
+        ('INCOME', apps.get_model('finance', 'Income'), 'income_type', 'date_received'),
+        ('EXPENSE', apps.get_model('finance', 'Expense'), 'expense_type', 'date_incurred'),
+    ]
+    for kind, model, category_field, date_field in sources:
+        grouped = (
+            model.objects.order_by()
+            .annotate(month=TruncMonth(date_field))
+            .values('user_id', category_field, 'month')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        MonthlyCategoryTotal.objects.bulk_create(
+            [
+                MonthlyCategoryTotal(
+                    user_id=row['user_id'], kind=kind, category=row[category_field],
+                    month=row['month'], total=row['total'], count=row['count'],
+                )
+                for row in grouped.iterator()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense')], max_length=10)),
+                ('category', models.CharField(max_length=20)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'finance_monthlycategorytotal',
+                'ordering': ['month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'category', 'month'), name='finance_rollup_user_kind_category_month')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_monthlycategorytotal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'finance_userdataversion',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_userdataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date_incurred', 'id'], name='finance_expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date_received', 'id'], name='finance_income_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlycategorytotal',
+            index=models.Index(fields=['user', 'kind', 'month'], name='finance_rollup_user_kind_month'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgoal',
+            index=models.Index(fields=['user', 'target_date', 'id'], name='finance_goal_user_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgoal',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='finance_goal_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_balances(apps, schema_editor):
+    UserBalance = apps.get_model('finance', 'UserBalance')
+    sources = [
+        (apps.get_model('finance', 'Income'), {'total_income': 'amount'}),
+        (apps.get_model('finance', 'Expense'), {'total_expense': 'amount'}),
+        (apps.get_model('finance', 'SavingsGoal'), {'total_saved': 'current_amount', 'total_target': 'target_amount'}),
+    ]
+    totals = {}
+    for model, fields in sources:
+        rows = (
+            model.objects.order_by()
+            .values('user_id')
+            .annotate(**{field: Sum(source) for field, source in fields.items()})
+        )
+        for row in rows.iterator():
+            user_totals = totals.setdefault(row.pop('user_id'), {})
+            user_totals.update({field: value or 0 for field, value in row.items()})
+    UserBalance.objects.bulk_create(
+        [UserBalance(user_id=user_id, **fields) for user_id, fields in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_composite_user_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBalance',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_saved', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_target', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'finance_userbalance',
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:19
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_contributions(apps, schema_editor):
+    # Until now only the current amount was stored; record it as one opening
+    # contribution on the day each goal was created.
+    SavingsGoal = apps.get_model('finance', 'SavingsGoal')
+    SavingsContribution = apps.get_model('finance', 'SavingsContribution')
+    goals = SavingsGoal.objects.exclude(current_amount=0).values_list('id', 'user_id', 'current_amount', 'created_at')
+    SavingsContribution.objects.bulk_create(
+        (
+            SavingsContribution(goal_id=goal_id, user_id=user_id, amount=amount,
+                                date_contributed=timezone.localdate(created_at))
+            for goal_id, user_id, amount, created_at in goals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_userbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date_contributed', models.DateField(default=datetime.date.today)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('goal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='finance.savingsgoal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'finance_savingscontribution',
+                'ordering': ['-date_contributed', '-id'],
+                'indexes': [models.Index(fields=['user', 'goal', 'date_contributed'], name='finance_contrib_user_goal_date')],
+            },
+        ),
+        migrations.RunPython(backfill_contributions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_savingscontribution'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('FOOD', 'Food'), ('TRANSPORT', 'Transport'), ('HOUSING', 'Housing'), ('UTILITIES', 'Utilities'), ('HEALTHCARE', 'Healthcare'), ('ENTERTAINMENT', 'Entertainment'), ('EDUCATION', 'Education'), ('SHOPPING', 'Shopping'), ('OTHER', 'Other')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('warn_at', models.PositiveSmallIntegerField(default=80, help_text='Warn once this percentage of the budget has been spent.')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'finance_budget',
+                'ordering': ['category'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='finance_budget_user_category')],
+            },
+        ),
+    ]
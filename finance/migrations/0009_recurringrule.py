@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense')], max_length=10)),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly'), ('YEARLY', 'Yearly')], default='MONTHLY', max_length=10)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_run', models.DateField()),
+                ('active', models.BooleanField(default=True)),
+                ('category', models.CharField(max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('source', models.CharField(blank=True, choices=[('CASH', 'Cash'), ('BANK', 'Bank Account'), ('CREDIT_CARD', 'Credit Card'), ('DIGITAL_WALLET', 'Digital Wallet'), ('OTHER', 'Other')], max_length=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'finance_recurringrule',
+                'ordering': ['next_run'],
+            },
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='recurring_rule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='finance.recurringrule'),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='recurring_rule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='finance.recurringrule'),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring_rule__isnull', False)), fields=('recurring_rule', 'date_incurred'), name='finance_expense_rule_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='income',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring_rule__isnull', False)), fields=('recurring_rule', 'date_received'), name='finance_income_rule_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringrule',
+            index=models.Index(condition=models.Q(('active', True)), fields=['next_run', 'user'], name='finance_recurring_due'),
+        ),
+    ]
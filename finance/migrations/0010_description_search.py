@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from finance.search import install_index, remove_index
+
+# Full-text indexes over Income/Expense descriptions; see finance.search.
+TABLES = ('finance_income', 'finance_expense')
+
+
+def create_search_indexes(apps, schema_editor):
+    for table in TABLES:
+        install_index(schema_editor, table)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for table in TABLES:
+        remove_index(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_recurringrule'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
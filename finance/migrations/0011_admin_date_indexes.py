@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_description_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['date_incurred', 'id'], name='finance_expense_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['date_received', 'id'], name='finance_income_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingscontribution',
+            index=models.Index(fields=['date_contributed', 'id'], name='finance_contrib_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgoal',
+            index=models.Index(fields=['target_date', 'id'], name='finance_goal_target_idx'),
+        ),
+    ]
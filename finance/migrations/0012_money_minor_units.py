@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+import finance.fields
+from finance.search import install_index
+
+# (model, field, max_digits, default) for every amount column; see finance.fields.
+MONEY_FIELDS = (
+    ('income', 'amount', 12, None),
+    ('expense', 'amount', 12, None),
+    ('recurringrule', 'amount', 12, None),
+    ('savingsgoal', 'target_amount', 12, None),
+    ('savingsgoal', 'current_amount', 12, 0),
+    ('savingscontribution', 'amount', 12, None),
+    ('budget', 'amount', 12, None),
+    ('monthlycategorytotal', 'total', 14, 0),
+    ('userbalance', 'total_income', 14, 0),
+    ('userbalance', 'total_expense', 14, 0),
+    ('userbalance', 'total_saved', 14, 0),
+    ('userbalance', 'total_target', 14, 0),
+)
+SEARCH_TABLES = ('finance_income', 'finance_expense')
+
+
+def copy_amounts(model_name, name, to_minor):
+    def run(apps, schema_editor):
+        quote = schema_editor.quote_name
+        table = quote(apps.get_model('finance', model_name)._meta.db_table)
+        rupees, paise = quote(name), quote(f'{name}_minor')
+        if to_minor:
+            schema_editor.execute(f'UPDATE {table} SET {paise} = CAST(ROUND({rupees} * 100) AS BIGINT)')
+        else:
+            schema_editor.execute(f'UPDATE {table} SET {rupees} = {paise} / 100.0')
+    return run
+
+
+def convert(model_name, name, max_digits, default):
+    """Replace a DecimalField with a MoneyField of the same name, keeping its values."""
+    extra = {} if default is None else {'default': default}
+    money_kwargs = {} if max_digits == 12 else {'max_digits': max_digits}
+    return [
+        migrations.AddField(model_name, f'{name}_minor', models.BigIntegerField(null=True)),
+        migrations.AlterField(model_name, name,
+                              models.DecimalField(max_digits=max_digits, decimal_places=2, null=True, **extra)),
+        migrations.RunPython(copy_amounts(model_name, name, True), copy_amounts(model_name, name, False)),
+        migrations.RemoveField(model_name, name),
+        migrations.RenameField(model_name, f'{name}_minor', name),
+        migrations.AlterField(model_name, name, finance.fields.MoneyField(**money_kwargs, **extra)),
+    ]
+
+
+def reinstall_search_indexes(apps, schema_editor):
+    # Rebuilding the SQLite tables above dropped the full-text triggers.
+    for table in SEARCH_TABLES:
+        install_index(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_indexes),
+        *(operation for spec in MONEY_FIELDS for operation in convert(*spec)),
+        migrations.RunPython(reinstall_search_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0012_money_minor_units'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'expense_type', 'date_incurred', 'id'], name='finance_expense_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'income_type', 'date_received', 'id'], name='finance_income_user_type_idx'),
+        ),
+    ]
@@ -1,11 +1,36 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
+from django.utils.functional import cached_property
 from datetime import date
+from decimal import Decimal
 import logging
 
+from .fields import MoneyField
+
 logger = logging.getLogger(__name__)
 
-class Income(models.Model):
+class AtomicWriteModel(models.Model):
+    """Run save()/delete() and their signal handlers in one transaction.
+
+    The handlers in ``finance.signals`` keep derived tables (rollups, counters)
+    in step with each write; wrapping the write makes both succeed or fail
+    together.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
+
+class Income(AtomicWriteModel):
     INCOME_TYPE_CHOICES = [
         ('SALARY', 'Salary'),
         ('BUSINESS', 'Business'),
@@ -20,18 +45,40 @@ class Income(models.Model):
         on_delete=models.CASCADE
     )
     income_type = models.CharField(max_length=20, choices=INCOME_TYPE_CHOICES)
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField()
     date_received = models.DateField()
     description = models.TextField(blank=True, null=True)
+    recurring_rule = models.ForeignKey(
+        'RecurringRule',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL
+    )
 
     class Meta:
         db_table = 'finance_income'
         ordering = ['-date_received']
+        indexes = [
+            models.Index(fields=['user', 'date_received', 'id'], name='finance_income_user_date_idx'),
+            # One category's rows in date order, for category filters.
+            models.Index(fields=['user', 'income_type', 'date_received', 'id'], name='finance_income_user_type_idx'),
+            # Admin changelists across all users sort and navigate by date alone.
+            models.Index(fields=['date_received', 'id'], name='finance_income_date_idx'),
+        ]
+        constraints = [
+            # One row per rule and occurrence date, so re-running the materializer is harmless.
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'date_received'],
+                condition=models.Q(recurring_rule__isnull=False),
+                name='finance_income_rule_occurrence',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_income_type_display()} - ₹{self.amount}"
 
-class Expense(models.Model):
+class Expense(AtomicWriteModel):
     EXPENSE_TYPE_CHOICES = [
         ('FOOD', 'Food'),
         ('TRANSPORT', 'Transport'),
@@ -61,26 +108,102 @@ class Expense(models.Model):
         choices=EXPENSE_TYPE_CHOICES,
         default='OTHER'
     )
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField()
     date_incurred = models.DateField()
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
     description = models.TextField(blank=True, null=True)
+    recurring_rule = models.ForeignKey(
+        'RecurringRule',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL
+    )
 
     class Meta:
         db_table = 'finance_expense'
         ordering = ['-date_incurred']
+        indexes = [
+            models.Index(fields=['user', 'date_incurred', 'id'], name='finance_expense_user_date_idx'),
+            models.Index(fields=['user', 'expense_type', 'date_incurred', 'id'], name='finance_expense_user_type_idx'),
+            models.Index(fields=['date_incurred', 'id'], name='finance_expense_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'date_incurred'],
+                condition=models.Q(recurring_rule__isnull=False),
+                name='finance_expense_rule_occurrence',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_expense_type_display()} - ₹{self.amount}"
 
-class SavingsGoal(models.Model):
+
+class RecurringRule(models.Model):
+    """Template for an Income or Expense that repeats, e.g. salary or rent.
+
+    ``next_run`` is the first occurrence not yet written;
+    ``manage.py materialize_recurring`` creates every occurrence up to today
+    and moves it forward. Occurrences fall on the same day as ``start_date``
+    (clamped to the end of shorter months).
+    """
+    KIND_INCOME = 'INCOME'
+    KIND_EXPENSE = 'EXPENSE'
+    KIND_CHOICES = [
+        (KIND_INCOME, 'Income'),
+        (KIND_EXPENSE, 'Expense'),
+    ]
+
+    DAILY = 'DAILY'
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    YEARLY = 'YEARLY'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    next_run = models.DateField()
+    active = models.BooleanField(default=True)
+
+    # Copied onto every occurrence. ``category`` is an income or expense
+    # type code; ``source`` only applies to expenses.
+    category = models.CharField(max_length=20)
+    amount = MoneyField()
+    source = models.CharField(max_length=20, choices=Expense.SOURCE_CHOICES, blank=True)
+    description = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'finance_recurringrule'
+        ordering = ['next_run']
+        indexes = [
+            # The materializer's "every due rule" scan, optionally by user range.
+            models.Index(fields=['next_run', 'user'], condition=models.Q(active=True),
+                         name='finance_recurring_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} {self.get_kind_display()} {self.category} - ₹{self.amount}"
+
+class SavingsGoal(AtomicWriteModel):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
     goal_name = models.CharField(max_length=100)
-    target_amount = models.DecimalField(max_digits=12, decimal_places=2)
-    current_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    target_amount = MoneyField()
+    current_amount = MoneyField(default=0)
     target_date = models.DateField()
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -88,6 +211,11 @@ class SavingsGoal(models.Model):
     class Meta:
         db_table = 'finance_savingsgoal'
         ordering = ['target_date']
+        indexes = [
+            models.Index(fields=['user', 'target_date', 'id'], name='finance_goal_user_target_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='finance_goal_user_created_idx'),
+            models.Index(fields=['target_date', 'id'], name='finance_goal_target_idx'),
+        ]
 
     @property
     def progress_percentage(self):
@@ -102,5 +230,194 @@ class SavingsGoal(models.Model):
     def days_remaining(self):
         return (self.target_date - date.today()).days
 
+    def contribute(self, amount, when=None):
+        """Record a deposit (a withdrawal when negative) and refresh ``current_amount``."""
+        contribution = SavingsContribution.objects.create(
+            user_id=self.user_id, goal=self, amount=amount, date_contributed=when or date.today()
+        )
+        self.refresh_from_db(fields=['current_amount'])
+        return contribution
+
     def __str__(self):
         return f"{self.goal_name} - ₹{self.current_amount}/₹{self.target_amount}"
+
+
+class SavingsContribution(AtomicWriteModel):
+    """One deposit into, or withdrawal from, a savings goal.
+
+    ``SavingsGoal.current_amount`` is the running sum of its goal's
+    contributions: ``finance.signals`` adds each new contribution to it, and
+    records a contribution for any direct change to ``current_amount``.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    goal = models.ForeignKey(SavingsGoal, on_delete=models.CASCADE, related_name='contributions')
+    amount = MoneyField()
+    date_contributed = models.DateField(default=date.today)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'finance_savingscontribution'
+        ordering = ['-date_contributed', '-id']
+        indexes = [
+            models.Index(fields=['user', 'goal', 'date_contributed'], name='finance_contrib_user_goal_date'),
+            models.Index(fields=['date_contributed', 'id'], name='finance_contrib_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.goal_id} {self.date_contributed} - ₹{self.amount}"
+
+class Budget(AtomicWriteModel):
+    """Monthly spending limit for one expense category.
+
+    Spend is read from the expense side of ``MonthlyCategoryTotal``, which
+    ``finance.signals`` keeps current on every Expense write, so checking a
+    budget is one indexed lookup rather than a scan of the month's expenses
+    (see ``finance.budgets``).
+    """
+    STATE_OK = 'ok'
+    STATE_WARNING = 'warning'
+    STATE_OVER = 'over'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    category = models.CharField(max_length=20, choices=Expense.EXPENSE_TYPE_CHOICES)
+    amount = MoneyField()
+    warn_at = models.PositiveSmallIntegerField(
+        default=80,
+        help_text="Warn once this percentage of the budget has been spent."
+    )
+
+    class Meta:
+        db_table = 'finance_budget'
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='finance_budget_user_category'),
+        ]
+
+    @cached_property
+    def spent(self):
+        """This month's spend in the category.
+
+        ``finance.budgets.budget_status`` annotates it for a whole list in one
+        query; a budget fetched on its own reads the rollup row here.
+        """
+        total = MonthlyCategoryTotal.objects.filter(
+            user_id=self.user_id, kind=MonthlyCategoryTotal.KIND_EXPENSE,
+            category=self.category, month=date.today().replace(day=1),
+        ).values_list('total', flat=True).first()
+        return Decimal('0') if total is None else total
+
+    @property
+    def used_percentage(self):
+        if not self.amount:
+            return 0
+        return self.spent / self.amount * 100
+
+    @property
+    def remaining(self):
+        return self.amount - self.spent
+
+    @property
+    def state(self):
+        if self.spent > self.amount:
+            return self.STATE_OVER
+        if self.used_percentage >= self.warn_at:
+            return self.STATE_WARNING
+        return self.STATE_OK
+
+    def __str__(self):
+        return f"{self.get_category_display()} - ₹{self.amount}/month"
+
+
+class MonthlyCategoryTotal(models.Model):
+    """Per-user monthly totals for each income/expense category.
+
+    Maintained incrementally by ``finance.signals`` so chart views never have
+    to scan raw transactions; ``manage.py rebuild_rollups`` recomputes it.
+    """
+    KIND_INCOME = 'INCOME'
+    KIND_EXPENSE = 'EXPENSE'
+    KIND_CHOICES = [
+        (KIND_INCOME, 'Income'),
+        (KIND_EXPENSE, 'Expense'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    category = models.CharField(max_length=20)
+    month = models.DateField()
+    total = MoneyField(max_digits=14, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'finance_monthlycategorytotal'
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'kind', 'category', 'month'],
+                name='finance_rollup_user_kind_category_month',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'kind', 'month'], name='finance_rollup_user_kind_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.category} {self.month:%b %Y} - ₹{self.total}"
+
+
+class UserDataVersion(models.Model):
+    """Counter bumped on every Income/Expense/SavingsGoal write for a user.
+
+    ``finance.cache`` folds it into cache keys, so cached figures are reused
+    until the user's data changes.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'finance_userdataversion'
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class UserBalance(models.Model):
+    """Running per-user totals, kept in step with every write by ``finance.signals``.
+
+    Reading a balance is a primary-key lookup instead of summing every row;
+    ``manage.py reconcile_balances`` checks the stored figures against the
+    raw tables and repairs any drift.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    total_income = MoneyField(max_digits=14, default=0)
+    total_expense = MoneyField(max_digits=14, default=0)
+    total_saved = MoneyField(max_digits=14, default=0)
+    total_target = MoneyField(max_digits=14, default=0)
+
+    class Meta:
+        db_table = 'finance_userbalance'
+
+    @property
+    def net_balance(self):
+        return self.total_income - self.total_expense - self.total_saved
+
+    def __str__(self):
+        return f"{self.user_id} - ₹{self.net_balance}"
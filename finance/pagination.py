@@ -0,0 +1,214 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q, Value
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def page_size_from(request):
+    """Page size from ``?page_size=``, defaulting to ``FINANCE_PAGE_SIZE`` and capped at ``FINANCE_MAX_PAGE_SIZE``."""
+    default = getattr(settings, 'FINANCE_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    limit = getattr(settings, 'FINANCE_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, limit))
+
+
+def encode_cursor(*parts):
+    return '_'.join(part.isoformat() if isinstance(part, date) else str(part) for part in parts)
+
+
+def decode_cursor(value, kinds=None):
+    """Parse ``YYYY-MM-DD_[kind_]id``; returns ``None`` for anything malformed.
+
+    ``kinds`` lists the allowed middle parts for cursors that carry one.
+    """
+    if not value:
+        return None
+    parts = value.split('_')
+    try:
+        when = date.fromisoformat(parts[0])
+        if kinds is None:
+            (pk,) = parts[1:]
+            return when, int(pk)
+        kind, pk = parts[1:]
+        if kind not in kinds:
+            return None
+        return when, kind, int(pk)
+    except ValueError:
+        return None
+
+
+class KeysetPage:
+    """One page of rows ordered newest first, with cursors for its neighbours.
+
+    ``next_cursor`` points past the last row (older entries) and
+    ``prev_cursor`` before the first one (newer entries); either is ``None``
+    at the corresponding end.
+    """
+
+    def __init__(self, items, has_next, has_previous, cursor_for):
+        self.items = items
+        self.next_cursor = cursor_for(items[-1]) if items and has_next else None
+        self.prev_cursor = cursor_for(items[0]) if items and has_previous else None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def cursor_from(request):
+    """Return ``(direction, raw_cursor)`` from ``?after=`` / ``?before=``."""
+    if request.GET.get('before'):
+        return 'before', request.GET['before']
+    return 'after', request.GET.get('after')
+
+
+def keyset_paginate(queryset, date_field, request):
+    """Page ``queryset`` by ``(date_field, id)`` descending without OFFSET.
+
+    Each page is a single indexed range scan whose cost does not depend on
+    how deep the page is.
+    """
+    size = page_size_from(request)
+    direction, raw = cursor_from(request)
+    cursor = decode_cursor(raw)
+    qs = queryset
+    if cursor is not None:
+        when, pk = cursor
+        if direction == 'after':
+            qs = qs.filter(Q(**{f'{date_field}__lt': when}) | Q(**{date_field: when, 'id__lt': pk}))
+        else:
+            qs = qs.filter(Q(**{f'{date_field}__gt': when}) | Q(**{date_field: when, 'id__gt': pk}))
+
+    if direction == 'before' and cursor is not None:
+        rows = list(qs.order_by(date_field, 'id')[:size + 1])
+        has_more = len(rows) > size
+        items = rows[:size][::-1]
+        has_next, has_previous = True, has_more
+    else:
+        rows = list(qs.order_by(f'-{date_field}', '-id')[:size + 1])
+        has_more = len(rows) > size
+        items = rows[:size]
+        has_next, has_previous = has_more, cursor is not None
+
+    return KeysetPage(items, has_next, has_previous,
+                      lambda obj: encode_cursor(getattr(obj, date_field), obj.pk))
+
+
+def union_all_sql(querysets):
+    """Compile querysets into one ``UNION ALL`` statement.
+
+    Each branch is wrapped in a subselect so it can keep its own ORDER BY and
+    LIMIT, which ``QuerySet.union()`` refuses to do on SQLite.
+    """
+    parts, params = [], []
+    for qs in querysets:
+        sql, branch_params = qs.query.get_compiler(qs.db).as_sql()
+        parts.append(f'SELECT * FROM ({sql}) AS branch_{len(parts)}')
+        params.extend(branch_params)
+    return ' UNION ALL '.join(parts), params
+
+
+def fetch_union(querysets, ordering, limit):
+    """Run ``union_all_sql`` with an outer ORDER BY/LIMIT and return dicts.
+
+    The querysets must be ``values()`` querysets selecting the same columns;
+    values go through the first branch's converters, exactly as the ORM
+    would return them. ``ordering`` takes ``'-name'`` style column names.
+    """
+    first = querysets[0]
+    connection = connections[first.db]
+    sql, params = union_all_sql(querysets)
+    order_by = ', '.join(
+        f'{connection.ops.quote_name(name.lstrip("-"))} {"DESC" if name.startswith("-") else "ASC"}'
+        for name in ordering
+    )
+    compiler = first.query.get_compiler(first.db)
+    compiler.setup_query()
+    converters = compiler.get_converters([col for col, _, _ in compiler.select])
+    names = list(first.query.selected)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY {order_by} LIMIT %s', [*params, limit])
+        rows = cursor.fetchall()
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+    return [dict(zip(names, row)) for row in rows]
+
+
+def branch_ranks(branches):
+    """Tie-break rank per kind: earlier branches sort first within a day (descending)."""
+    return {kind: len(branches) - index for index, (kind, _) in enumerate(branches)}
+
+
+def project_branch(kind, rank, queryset, fields):
+    """Project one branch onto the shared ``kind, rank, id, ledger_date, *fields`` columns."""
+    return (
+        queryset.order_by()
+        .annotate(kind=Value(kind), rank=Value(rank))
+        .values('kind', 'rank', 'id', 'ledger_date', *fields)
+    )
+
+
+def union_keyset_paginate(branches, fields, request):
+    """Keyset-page a UNION ALL of querysets ordered by ``(ledger_date, kind, id)`` descending.
+
+    ``branches`` is a list of ``(kind, queryset)`` pairs whose querysets are
+    annotated with a ``ledger_date`` DateField and every name in ``fields``,
+    and ordered newest first in an order that agrees with ``(ledger_date,
+    id)`` and that an index can serve; within a day, rows of earlier
+    branches come first. The cursor predicate, ordering and LIMIT are applied
+    inside each branch, so every branch is one index range scan and only the
+    few surviving rows are sorted. Returns a ``KeysetPage`` of dicts with
+    ``kind``, ``rank``, ``id``, ``ledger_date`` and ``fields``.
+    """
+    size = page_size_from(request)
+    direction, raw = cursor_from(request)
+    rank = branch_ranks(branches)
+    cursor = decode_cursor(raw, kinds=rank)
+    forward = direction == 'after' or cursor is None
+
+    projected = []
+    for kind, qs in branches:
+        if cursor is not None:
+            when, cursor_kind, pk = cursor
+            before = 'lt' if forward else 'gt'
+            same_day = Q(ledger_date=when)
+            if rank[kind] == rank[cursor_kind]:
+                same_day &= Q(**{f'id__{before}': pk})
+            elif (rank[kind] > rank[cursor_kind]) == forward:
+                # Rows of this kind on the cursor's day are all on the other side.
+                same_day = Q(pk__in=[])
+            qs = qs.filter(Q(**{f'ledger_date__{before}': when}) | same_day)
+        branch = project_branch(kind, rank[kind], qs, fields).order_by(*qs.query.order_by)
+        projected.append((branch if forward else branch.reverse())[:size + 1])
+
+    if not projected:
+        return KeysetPage([], False, False, None)
+    ordering = ('-ledger_date', '-rank', '-id') if forward else ('ledger_date', 'rank', 'id')
+    rows = fetch_union(projected, ordering, size + 1)
+    has_more = len(rows) > size
+    items = rows[:size]
+    if forward:
+        has_next, has_previous = has_more, cursor is not None
+    else:
+        items.reverse()
+        has_next, has_previous = True, has_more
+
+    return KeysetPage(items, has_next, has_previous,
+                      lambda row: encode_cursor(row['ledger_date'], row['kind'], row['id']))
@@ -0,0 +1,278 @@
+"""Per-user daily prefix sums for totals over arbitrary date ranges.
+
+``DailyTotals`` keeps, for every income and expense category, the running
+total in paise up to each day on which the user has rows, as one int64 NumPy
+matrix beside the sorted day ordinals. Any range total is then two binary
+searches and two column lookups, whatever the range. Month-by-month series
+and period-over-period comparisons are only more lookups. The matrix grows
+with the number of distinct days, never with the span between them, so far
+apart dates cost no more than near ones.
+
+The matrix is built lazily from one grouped query: one row per day, with a
+conditional sum per category, so the ``(user, date, id)`` indexes serve the
+grouping. It is cached together with the data version it reflects, which is
+also stored under a key of its own so writers can check it without loading
+the matrix. Saving or deleting a single Income/Expense patches the cached
+matrix after commit (``patch_on_commit``), so ordinary edits do not force a
+rebuild. Bulk writers only bump the version, and the next read rebuilds.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import BigIntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .fields import format_minor, minor
+from .cache import data_version
+from .models import Income, Expense, UserDataVersion
+from .services import EXPENSE_LABELS, INCOME_LABELS
+
+# kind -> (model, category field, date field)
+SOURCES = {
+    'income': (Income, 'income_type', 'date_received'),
+    'expense': (Expense, 'expense_type', 'date_incurred'),
+}
+# One matrix row per (kind, category code); codes outside the choices are not indexed.
+COLUMNS = [('income', code) for code, _ in Income.INCOME_TYPE_CHOICES] + \
+          [('expense', code) for code, _ in Expense.EXPENSE_TYPE_CHOICES]
+POSITION = {column: index for index, column in enumerate(COLUMNS)}
+KIND_ROWS = {kind: np.array([index for index, (name, _) in enumerate(COLUMNS) if name == kind]) for kind in SOURCES}
+LABELS = {'income': INCOME_LABELS, 'expense': EXPENSE_LABELS}
+
+GROUPS = ('kind', 'category', 'month')
+COMPARISONS = ('previous', 'year')
+DEFAULT_MAX_MONTHS = 120
+
+
+def max_months():
+    """Most calendar months a ``group='month'`` report may span."""
+    return getattr(settings, 'FINANCE_TOTALS_MAX_MONTHS', DEFAULT_MAX_MONTHS)
+
+
+class DailyTotals:
+    """Running totals per category over the days that have rows.
+
+    ``days`` holds those days' ordinals in ascending order and
+    ``prefix[c, i]`` is category ``c``'s total over ``days[:i]``, so the total
+    for days ``a..b`` is ``prefix[:, position(b + 1)] - prefix[:, position(a)]``,
+    where ``position(d)`` counts the stored days before ``d``.
+    """
+
+    def __init__(self, days, daily):
+        self.days = days
+        self.prefix = np.zeros((len(COLUMNS), len(days) + 1), dtype=np.int64)
+        np.cumsum(daily, axis=1, out=self.prefix[:, 1:])
+
+    def _position(self, day):
+        return int(np.searchsorted(self.days, day.toordinal()))
+
+    def totals(self, start, end):
+        """Paise per ``COLUMNS`` entry for the inclusive range ``start..end``."""
+        return self.prefix[:, self._position(end + timedelta(days=1))] - self.prefix[:, self._position(start)]
+
+    def between(self, bounds):
+        """Paise per column and period for consecutive ``bounds`` (period starts, then the end + 1 day)."""
+        positions = np.searchsorted(self.days, [day.toordinal() for day in bounds])
+        return np.diff(self.prefix[:, positions], axis=1)
+
+    def add(self, kind, category, day, amount):
+        """Apply one row's ``amount`` (paise, negative to remove) to the running totals."""
+        column = POSITION.get((kind, category))
+        if column is None or not amount:
+            return
+        position = self._position(day)
+        if position == len(self.days) or self.days[position] != day.toordinal():
+            # A new day starts with the running total of the days before it.
+            self.days = np.insert(self.days, position, day.toordinal())
+            self.prefix = np.insert(self.prefix, position + 1, self.prefix[:, position], axis=1)
+        self.prefix[column, position + 1:] += amount
+
+
+def build(user):
+    """Build the user's ``DailyTotals`` from one UNION ALL of per-day conditional sums."""
+    branches = []
+    for kind, (model, category_field, date_field) in SOURCES.items():
+        sums = {
+            f'c{index}': Coalesce(Sum(minor('amount'), filter=Q(**{category_field: code})), 0,
+                                  output_field=BigIntegerField())
+            if column_kind == kind else Value(0, output_field=BigIntegerField())
+            for index, (column_kind, code) in enumerate(COLUMNS)
+        }
+        branches.append(model.objects.filter(user=user).order_by().values_list(date_field).annotate(**sums))
+    rows = list(branches[0].union(*branches[1:], all=True))
+    if not rows:
+        return DailyTotals(np.zeros(0, dtype=np.int64), np.zeros((len(COLUMNS), 0), dtype=np.int64))
+
+    ordinals = np.fromiter((row[0].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+    # Income and expense rows of the same day share one column.
+    days, columns = np.unique(ordinals, return_inverse=True)
+    daily = np.zeros((len(COLUMNS), len(days)), dtype=np.int64)
+    np.add.at(daily.T, columns, np.array([row[1:] for row in rows], dtype=np.int64))
+    return DailyTotals(days, daily)
+
+
+def _backend():
+    return caches[getattr(settings, 'FINANCE_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id):
+    # Not versioned like VersionedCache keys: the entry carries its version,
+    # so a write can move it forward instead of orphaning it.
+    return f'finance:{user_id}:daily_totals'
+
+
+def _version_key(user_id):
+    # The version of the cached entry on its own, cheap for writers to check.
+    return f'finance:{user_id}:daily_totals:version'
+
+
+def _store(backend, user_id, version, index, timeout):
+    backend.set_many({_key(user_id): (version, index), _version_key(user_id): version}, timeout)
+
+
+def daily_totals(user, cache):
+    """The user's ``DailyTotals`` at the data version of ``cache`` (a ``VersionedCache``)."""
+    entry = cache.cache.get(_key(user.pk))
+    if entry is not None and entry[0] == cache.version:
+        return entry[1]
+    index = build(user)
+    # A write committed since the version was read may already be in the
+    # build, and its on-commit patch would then add it a second time.
+    if data_version(user)[0] == cache.version:
+        _store(cache.cache, user.pk, cache.version, index, cache.timeout)
+    return index
+
+
+def patch_on_commit(changes):
+    """Patch cached indexes with ``[(user_id, kind, category, day, paise)]`` once the write commits.
+
+    Call after the write bumped each user's data version exactly once. An
+    index that is not exactly one version behind, because it is missing,
+    stale, or raced by another writer, is left for the next read to rebuild.
+    """
+    backend = _backend()
+    by_user = {}
+    for user_id, *change in changes:
+        by_user.setdefault(user_id, []).append(change)
+    for user_id, user_changes in by_user.items():
+        cached = backend.get(_version_key(user_id))
+        if cached is None:
+            continue
+        version = UserDataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+        if version is None or cached != version - 1:
+            continue
+
+        def apply(user_id=user_id, user_changes=user_changes, version=version):
+            entry = backend.get(_key(user_id))
+            if entry is None or entry[0] != version - 1:
+                return
+            index = entry[1]
+            for change in user_changes:
+                index.add(*change)
+            _store(backend, user_id, version, index, getattr(settings, 'FINANCE_CACHE_TIMEOUT', 60 * 60))
+
+        transaction.on_commit(apply)
+
+
+# ---- report ---------------------------------------------------------------
+
+def shift_year(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year + years, day=28)
+
+
+def comparison_range(start, end, compare):
+    """The range ``start..end`` is compared with: the one just before it, or a year earlier."""
+    if compare == 'year':
+        return shift_year(start, -1), shift_year(end, -1)
+    previous_end = start - timedelta(days=1)
+    return previous_end - (end - start), previous_end
+
+
+def month_bounds(start, end):
+    """Period starts for each calendar month touching ``start..end``, then ``end + 1 day``."""
+    bounds = [start]
+    month = start.replace(day=1)
+    while True:
+        month = (month + timedelta(days=32)).replace(day=1)
+        if month > end:
+            break
+        bounds.append(month)
+    return bounds + [end + timedelta(days=1)]
+
+
+def check_range(start, end, group='kind', compare=None):
+    """Raise ``ValueError`` with a message for a report that cannot be computed.
+
+    Reports need the day after ``end`` and, with ``compare``, an earlier
+    period of the same length, so dates at the ends of the calendar are
+    rejected; ``group='month'`` is limited to ``max_months()`` months.
+    """
+    if start > end:
+        raise ValueError("'from' must not be after 'to'.")
+    if end >= date.max:
+        raise ValueError("'to' is out of range.")
+    if group == 'month':
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        if months > max_months():
+            raise ValueError(f"A monthly report covers at most {max_months()} months.")
+    if compare:
+        try:
+            comparison_range(start, end, compare)
+        except (OverflowError, ValueError):
+            raise ValueError("The comparison period is out of range.") from None
+
+
+def _kind_totals(values):
+    income, expense = (int(values[KIND_ROWS[kind]].sum()) for kind in SOURCES)
+    return {'income': format_minor(income), 'expense': format_minor(expense), 'net': format_minor(income - expense)}
+
+
+def _category_totals(values):
+    return {
+        kind: {LABELS[kind][code]: format_minor(int(values[POSITION[kind, code]]))
+               for column_kind, code in COLUMNS if column_kind == kind}
+        for kind in SOURCES
+    }
+
+
+def _monthly_totals(index, start, end):
+    bounds = month_bounds(start, end)
+    periods = index.between(bounds)
+    income, expense = (periods[KIND_ROWS[kind]].sum(axis=0) for kind in SOURCES)
+    return {
+        'labels': [day.strftime('%b %Y') for day in bounds[:-1]],
+        'income': [format_minor(int(value)) for value in income],
+        'expense': [format_minor(int(value)) for value in expense],
+    }
+
+
+def period_totals(index, start, end, group):
+    if group == 'month':
+        return _monthly_totals(index, start, end)
+    values = index.totals(start, end)
+    return _kind_totals(values) if group == 'kind' else _category_totals(values)
+
+
+def report(index, start, end, group='kind', compare=None):
+    """JSON-ready totals for ``start..end``; amounts are strings in rupees.
+
+    ``group`` is ``'kind'`` (income, expense, net), ``'category'`` or
+    ``'month'``; ``compare`` adds the same figures for the previous period
+    of equal length (``'previous'``) or the same dates a year earlier
+    (``'year'``).
+    """
+    result = {'from': start.isoformat(), 'to': end.isoformat(), 'group': group,
+              'totals': period_totals(index, start, end, group)}
+    if compare:
+        other_start, other_end = comparison_range(start, end, compare)
+        result['comparison'] = {
+            'compare': compare, 'from': other_start.isoformat(), 'to': other_end.isoformat(),
+            'totals': period_totals(index, other_start, other_end, group),
+        }
+    return result
@@ -0,0 +1,231 @@
+"""Turn ``RecurringRule`` templates into Income and Expense rows.
+
+``materialize`` repeatedly takes a batch of due rules (one query on the
+partial ``(next_run, user)`` index), writes every occurrence up to ``until``
+with ``bulk_create`` and moves each rule's ``next_run`` past it, all in one
+transaction per batch. Rules are locked with ``SKIP LOCKED`` where the
+database supports it, so overlapping runs share the work instead of
+repeating it; occurrences that already exist are dropped before the insert,
+and the unique ``(recurring_rule, date)`` constraints reject any that slip
+through. Catching up after downtime is the same code path: a rule simply
+has more due dates.
+"""
+import calendar
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+
+from . import balances, rollups
+from .cache import bump_data_version
+from .models import Income, Expense, RecurringRule
+
+DEFAULT_BATCH_SIZE = 500
+
+# kind -> (model, category field, date field)
+TARGETS = {
+    RecurringRule.KIND_INCOME: (Income, 'income_type', 'date_received'),
+    RecurringRule.KIND_EXPENSE: (Expense, 'expense_type', 'date_incurred'),
+}
+
+
+class MaterializeResult:
+    def __init__(self):
+        self.rules = 0
+        self.created = 0
+        self.existing = 0
+        self.elapsed = 0.0
+
+    def merge(self, other):
+        self.rules += other.rules
+        self.created += other.created
+        self.existing += other.existing
+
+    def __str__(self):
+        return (f"{self.rules} rules: {self.created} rows created, "
+                f"{self.existing} already present ({self.elapsed:.2f}s)")
+
+
+def add_months(day, months, anchor_day):
+    index = day.year * 12 + day.month - 1 + months
+    year, month = index // 12, index % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(rule, n):
+    """The ``n``-th occurrence of ``rule``; 0 is ``start_date``."""
+    start = rule.start_date
+    if rule.frequency == RecurringRule.DAILY:
+        return start + timedelta(days=n)
+    if rule.frequency == RecurringRule.WEEKLY:
+        return start + timedelta(weeks=n)
+    step = 1 if rule.frequency == RecurringRule.MONTHLY else 12
+    return add_months(start, n * step, start.day)
+
+
+def occurrence_index(rule, day):
+    """Index of ``rule``'s first occurrence on or after ``day``."""
+    start = rule.start_date
+    if day <= start:
+        return 0
+    if rule.frequency == RecurringRule.DAILY:
+        return (day - start).days
+    if rule.frequency == RecurringRule.WEEKLY:
+        return -(-(day - start).days // 7)
+    step = 1 if rule.frequency == RecurringRule.MONTHLY else 12
+    n = ((day.year - start.year) * 12 + day.month - start.month) // step
+    while occurrence(rule, n) < day:
+        n += 1
+    return n
+
+
+def due_dates(rule, until):
+    """Return ``(dates, next_run)``: occurrences from ``rule.next_run`` through ``until``.
+
+    ``end_date`` also bounds the dates; ``next_run`` is the first occurrence
+    after them.
+    """
+    last = min(until, rule.end_date) if rule.end_date else until
+    n = occurrence_index(rule, rule.next_run)
+    dates = []
+    day = occurrence(rule, n)
+    while day <= last:
+        dates.append(day)
+        n += 1
+        day = occurrence(rule, n)
+    return dates, day
+
+
+def build(rule, day):
+    """An unsaved Income/Expense for one occurrence of ``rule``."""
+    model, category_field, date_field = TARGETS[rule.kind]
+    fields = {
+        'user_id': rule.user_id,
+        'amount': rule.amount,
+        'description': rule.description,
+        'recurring_rule': rule,
+        category_field: rule.category,
+        date_field: day,
+    }
+    if model is Expense:
+        fields['source'] = rule.source or 'OTHER'
+    return model(**fields)
+
+
+def start_rule(instance, frequency):
+    """Make a just-saved Income/Expense the first occurrence of a new rule."""
+    kind = RecurringRule.KIND_INCOME if isinstance(instance, Income) else RecurringRule.KIND_EXPENSE
+    _, category_field, date_field = TARGETS[kind]
+    start = getattr(instance, date_field)
+    rule = RecurringRule(
+        user_id=instance.user_id, kind=kind, frequency=frequency, start_date=start, next_run=start,
+        category=getattr(instance, category_field), amount=instance.amount,
+        source=getattr(instance, 'source', ''), description=instance.description,
+    )
+    rule.next_run = occurrence(rule, 1)
+    rule.save()
+    # Linking the row changes nothing the signals derive, so skip them.
+    type(instance).objects.filter(pk=instance.pk).update(recurring_rule=rule)
+    instance.recurring_rule = rule
+    return rule
+
+
+def due_rules(until, user_range=None):
+    rules = RecurringRule.objects.filter(active=True, next_run__lte=until)
+    if user_range is not None:
+        rules = rules.filter(user_id__gte=user_range[0], user_id__lte=user_range[1])
+    return rules
+
+
+def _existing_occurrences(model, date_field, instances):
+    """``(rule id, date)`` pairs already stored for a batch (one indexed query)."""
+    dates = [getattr(obj, date_field) for obj in instances]
+    return set(
+        model.objects.filter(
+            recurring_rule__in={obj.recurring_rule_id for obj in instances},
+            **{f'{date_field}__gte': min(dates), f'{date_field}__lte': max(dates)},
+        ).values_list('recurring_rule_id', date_field)
+    )
+
+
+def materialize_batch(until, user_range, batch_size, result):
+    """Materialize one batch of due rules; returns False when none were left."""
+    with transaction.atomic():
+        rules = list(
+            due_rules(until, user_range).order_by('next_run', 'user_id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not rules:
+            return False
+        pending = {kind: [] for kind in TARGETS}
+        for rule in rules:
+            dates, rule.next_run = due_dates(rule, until)
+            rule.active = rule.end_date is None or rule.next_run <= rule.end_date
+            pending[rule.kind].extend(build(rule, day) for day in dates)
+
+        users = set()
+        for kind, instances in pending.items():
+            if not instances:
+                continue
+            model, _, date_field = TARGETS[kind]
+            existing = _existing_occurrences(model, date_field, instances)
+            fresh = [obj for obj in instances
+                     if (obj.recurring_rule_id, getattr(obj, date_field)) not in existing]
+            model.objects.bulk_create(fresh, batch_size=batch_size)
+            rollups.apply_created(fresh)
+            balances.apply_created(fresh)
+            users.update(obj.user_id for obj in fresh)
+            result.created += len(fresh)
+            result.existing += len(instances) - len(fresh)
+
+        RecurringRule.objects.bulk_update(rules, ['next_run', 'active'])
+        for user_id in sorted(users):
+            bump_data_version(user_id)
+        result.rules += len(rules)
+    return True
+
+
+def materialize_range(until, user_range=None, batch_size=None):
+    """Materialize every rule due by ``until`` for users in ``user_range`` (inclusive ids)."""
+    batch_size = batch_size or getattr(settings, 'FINANCE_RECURRING_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    result = MaterializeResult()
+    started = time.perf_counter()
+    while materialize_batch(until, user_range, batch_size, result):
+        pass
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def split_range(low, high, parts):
+    """Split the inclusive id range ``low..high`` into at most ``parts`` contiguous ranges."""
+    size = -(-(high - low + 1) // parts)
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def materialize(until=None, batch_size=None, workers=1):
+    """Materialize every due rule, optionally split by user id range over ``workers`` processes."""
+    until = until or date.today()
+    if workers <= 1:
+        return materialize_range(until, None, batch_size)
+
+    started = time.perf_counter()
+    bounds = due_rules(until).aggregate(low=Min('user_id'), high=Max('user_id'))
+    result = MaterializeResult()
+    if bounds['low'] is not None:
+        ranges = split_range(bounds['low'], bounds['high'], workers)
+        # Children must open their own connections rather than share ours.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=len(ranges), initializer=_init_worker) as pool:
+            for part in pool.map(materialize_range, [until] * len(ranges), ranges, [batch_size] * len(ranges)):
+                result.merge(part)
+    result.elapsed = time.perf_counter() - started
+    return result
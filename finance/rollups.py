@@ -0,0 +1,111 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .fields import money
+from .models import Income, Expense, MonthlyCategoryTotal
+
+# kind -> (model, category field, date field)
+SOURCES = {
+    MonthlyCategoryTotal.KIND_INCOME: (Income, 'income_type', 'date_received'),
+    MonthlyCategoryTotal.KIND_EXPENSE: (Expense, 'expense_type', 'date_incurred'),
+}
+
+
+def kind_for_model(model):
+    for kind, (source, _, _) in SOURCES.items():
+        if source is model:
+            return kind
+    return None
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def rollup_key(instance):
+    """Return the ``(kind, category, month)`` bucket an Income/Expense row counts towards."""
+    kind = kind_for_model(type(instance))
+    _, category_field, date_field = SOURCES[kind]
+    return kind, getattr(instance, category_field), month_start(getattr(instance, date_field))
+
+
+def apply_delta(user_id, kind, category, month, amount, count):
+    """Add ``amount``/``count`` to one rollup bucket, creating or dropping it as needed.
+
+    Must be called inside the transaction that wrote the source row.
+    """
+    buckets = MonthlyCategoryTotal.objects.filter(
+        user_id=user_id, kind=kind, category=category, month=month
+    )
+    updated = buckets.update(total=F('total') + money(amount), count=F('count') + count)
+    if not updated:
+        if count <= 0:
+            # Nothing to subtract from, e.g. the bucket was removed by a
+            # rebuild or a cascading user delete.
+            return
+        try:
+            with transaction.atomic():
+                MonthlyCategoryTotal.objects.create(
+                    user_id=user_id, kind=kind, category=category, month=month,
+                    total=amount, count=count,
+                )
+        except IntegrityError:
+            # A concurrent writer created the bucket first; add to theirs.
+            buckets.update(total=F('total') + money(amount), count=F('count') + count)
+    elif count < 0:
+        buckets.filter(count=0).delete()
+
+
+def rebuild(user_ids=None):
+    """Recompute the rollup table from raw rows, optionally for some users only.
+
+    Returns the number of buckets written.
+    """
+    written = 0
+    with transaction.atomic():
+        existing = MonthlyCategoryTotal.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+
+        for kind, (model, category_field, date_field) in SOURCES.items():
+            rows = model.objects.order_by()
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            grouped = (
+                rows.annotate(month=TruncMonth(date_field))
+                .values('user_id', category_field, 'month')
+                .annotate(total=Sum('amount'), count=Count('id'))
+            )
+            buckets = [
+                MonthlyCategoryTotal(
+                    user_id=row['user_id'], kind=kind, category=row[category_field],
+                    month=row['month'], total=row['total'], count=row['count'],
+                )
+                for row in grouped.iterator()
+            ]
+            MonthlyCategoryTotal.objects.bulk_create(buckets, batch_size=1000)
+            written += len(buckets)
+    return written
+
+
+def months_back(today, months):
+    """First day of the month ``months - 1`` calendar months before ``today``'s month."""
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return today.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def apply_created(instances):
+    """Add freshly bulk-created Income/Expense rows to the rollup, one update per bucket.
+
+    ``bulk_create`` skips the model signals, so bulk writers call this inside
+    the same transaction.
+    """
+    deltas = {}
+    for instance in instances:
+        key = (instance.user_id, *rollup_key(instance))
+        amount, count = deltas.get(key, (0, 0))
+        deltas[key] = (amount + instance.amount, count + 1)
+    for (user_id, kind, category, month), (amount, count) in deltas.items():
+        apply_delta(user_id, kind, category, month, amount, count)
@@ -0,0 +1,201 @@
+"""Full-text search over Income and Expense descriptions.
+
+PostgreSQL uses a GIN index on ``to_tsvector('english', description)`` and
+ranks with ``ts_rank``; SQLite uses an external-content FTS5 table per model
+(``<table>_fts``), kept in step by triggers, and ranks with ``bm25``. Both
+are created by migration ``0010_description_search`` through
+``install_index``. Other databases fall back to ``icontains`` and no
+ranking.
+
+Note that Django rebuilds SQLite tables for many schema changes, which drops
+their triggers: a migration that alters ``finance_income`` or
+``finance_expense`` must call ``install_index`` again afterwards.
+"""
+import re
+from datetime import date
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections, router
+from django.db.models import DateField
+from django.db.models.expressions import RawSQL
+
+from .models import Income, Expense
+from .fields import from_minor, minor
+from .services import EXPENSE_LABELS, INCOME_LABELS
+
+SEARCH_CONFIG = 'english'
+MAX_RESULTS = 100
+
+# kind -> (model, date field, category field, category labels)
+SEARCHABLE = {
+    'income': (Income, 'date_received', 'income_type', INCOME_LABELS),
+    'expense': (Expense, 'date_incurred', 'expense_type', EXPENSE_LABELS),
+}
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5("
+    "description, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+    """CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts (rowid, description) VALUES (new.id, new.description);
+    END""",
+    """CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END""",
+    """CREATE TRIGGER {table}_fts_update AFTER UPDATE OF description ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {table}_fts (rowid, description) VALUES (new.id, new.description);
+    END""",
+    # Index the rows that already exist.
+    "INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP = (
+    "DROP TRIGGER IF EXISTS {table}_fts_update",
+    "DROP TRIGGER IF EXISTS {table}_fts_delete",
+    "DROP TRIGGER IF EXISTS {table}_fts_insert",
+    "DROP TABLE IF EXISTS {table}_fts",
+)
+# Must match the SQL that SearchVector('description', config=SEARCH_CONFIG)
+# compiles to, or PostgreSQL will not use the index.
+POSTGRES_CREATE = (
+    "CREATE INDEX {table}_search ON {table} "
+    "USING gin (to_tsvector('" + SEARCH_CONFIG + "'::regconfig, COALESCE(description, '')))",
+)
+POSTGRES_DROP = ("DROP INDEX IF EXISTS {table}_search",)
+
+
+def _execute(schema_editor, statements, table):
+    for statement in statements:
+        schema_editor.execute(statement.format(table=table))
+
+
+def install_index(schema_editor, table):
+    """Create the full-text index for ``table`` (idempotent on SQLite)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP, table)
+        _execute(schema_editor, SQLITE_CREATE, table)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP + POSTGRES_CREATE, table)
+
+
+def remove_index(schema_editor, table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP, table)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP, table)
+
+
+def terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+def fts_query(text):
+    """FTS5 MATCH expression: every word of ``text``, each as a prefix.
+
+    Quoting each word keeps FTS5 operators and punctuation in user input
+    from being parsed as query syntax.
+    """
+    return ' '.join(f'"{word}"*' for word in terms(text))
+
+
+def _vendor(model):
+    return connections[router.db_for_read(model)].vendor
+
+
+def filter_queryset(queryset, text):
+    """Restrict an Income/Expense queryset to rows whose description matches ``text``."""
+    model = queryset.model
+    if not terms(text):
+        return queryset
+    vendor = _vendor(model)
+    if vendor == 'sqlite':
+        fts = f'{model._meta.db_table}_fts'
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [fts_query(text)]))
+    if vendor == 'postgresql':
+        return queryset.annotate(
+            search_document=SearchVector('description', config=SEARCH_CONFIG)
+        ).filter(search_document=SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch'))
+    for word in terms(text):
+        queryset = queryset.filter(description__icontains=word)
+    return queryset
+
+
+def _filters(user, date_field, category_field, category, start, end):
+    """Return ``[(field, operator, value)]`` for the row filters of one model."""
+    filters = [('user_id', '=', user.pk)]
+    if category:
+        filters.append((category_field, '=', category))
+    if start:
+        filters.append((date_field, '>=', start))
+    if end:
+        filters.append((date_field, '<=', end))
+    return filters
+
+
+def _search_sqlite(model, date_field, category_field, filters, text, limit):
+    """One ranked query: FTS5 finds the rows, primary-key lookups apply the filters."""
+    table = model._meta.db_table
+    fts = f'{table}_fts'
+    connection = connections[router.db_for_read(model)]
+    conditions = ''.join(f' AND t.{field} {operator} %s' for field, operator, _ in filters)
+    sql = (
+        f'SELECT t.id, t.{date_field}, t.amount, t.{category_field}, t.description, -bm25({fts}) AS rank '
+        f'FROM {fts} JOIN {table} t ON t.id = {fts}.rowid '
+        f'WHERE {fts} MATCH %s{conditions} '
+        f'ORDER BY rank DESC, t.{date_field} DESC LIMIT %s'
+    )
+    params = [fts_query(text), *(connection.ops.adapt_datefield_value(value) if isinstance(value, date) else value
+                                 for _, _, value in filters), limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_orm(model, date_field, category_field, filters, text, limit):
+    lookups = {'=': 'exact', '>=': 'gte', '<=': 'lte'}
+    queryset = model.objects.filter(**{f'{field}__{lookups[operator]}': value for field, operator, value in filters})
+    queryset = filter_queryset(queryset, text)
+    if _vendor(model) == 'postgresql':
+        rank = SearchRank(SearchVector('description', config=SEARCH_CONFIG),
+                          SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch'))
+        queryset = queryset.annotate(rank=rank)
+    else:
+        queryset = queryset.annotate(rank=RawSQL('0', []))
+    return list(
+        queryset.order_by('-rank', f'-{date_field}')
+        .values_list('id', date_field, minor('amount'), category_field, 'description', 'rank')[:limit]
+    )
+
+
+def search(user, text, kind=None, category=None, start=None, end=None, limit=20):
+    """Return ``user``'s Income/Expense rows matching ``text``, best match first.
+
+    ``kind`` limits the search to ``'income'`` or ``'expense'``; ``category``
+    (a type code), ``start`` and ``end`` (inclusive dates) filter the rows.
+    Each row is a dict with ``kind``, ``id``, ``date``, ``amount``,
+    ``category``, ``description`` and ``rank`` (higher is better; ranks are
+    comparable within one database backend only).
+    """
+    if not terms(text):
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+    date_field_type = DateField()
+    results = []
+    for name, (model, date_field, category_field, labels) in SEARCHABLE.items():
+        if kind and kind != name:
+            continue
+        filters = _filters(user, date_field, category_field, category, start, end)
+        fetch = _search_sqlite if _vendor(model) == 'sqlite' else _search_orm
+        for pk, when, amount, code, description, rank in fetch(model, date_field, category_field, filters, text, limit):
+            results.append({
+                'kind': name,
+                'id': pk,
+                'date': date_field_type.to_python(when),
+                'amount': from_minor(amount),
+                'category': labels.get(code, code),
+                'description': description,
+                'rank': round(float(rank), 6),
+            })
+    results.sort(key=lambda row: (row['rank'], row['date'] or date.min), reverse=True)
+    return results[:limit]
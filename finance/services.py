@@ -0,0 +1,377 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from typing import NamedTuple
+
+from django.db import connections, router
+from django.db.models import Case, DateField, ExpressionWrapper, F, Max, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils.functional import cached_property
+
+from .balances import BALANCE_FIELDS
+from .budgets import budget_status
+from .fields import MoneyField, format_minor, from_minor, minor, money, to_minor
+from .models import Income, Expense, SavingsGoal, SavingsContribution, MonthlyCategoryTotal, UserBalance
+from .aio import run_queries
+from .pagination import branch_ranks, project_branch, union_all_sql
+from .rollups import SOURCES as ROLLUP_SOURCES, month_start
+
+ZERO = Decimal('0')
+AMOUNT_FIELD = MoneyField()
+
+# Chart windows in 30-day "months" back from today; None is all-time.
+PIVOT_WINDOWS = (1, 3, 6, 12, None)
+WINDOW_DAYS = 30
+
+
+def window_start(today, months):
+    """First day of the chart window covering the ``months`` x 30 days up to ``today``."""
+    return today - timedelta(days=WINDOW_DAYS * months)
+
+
+class FinanceSummary:
+    """Dashboard figures for one user.
+
+    There are four lazy parts, one query each:
+    - totals: a primary-key lookup of the user's ``UserBalance``;
+    - the monthly series: a grouped query over the monthly rollup;
+    - the recent rows: one UNION ALL of the latest rows;
+    - this month's budgets: one query against the rollup's spend counters.
+
+    A view that only needs totals pays for the single lookup. Pass a
+    ``finance.cache.VersionedCache`` to keep each part until the user's data
+    changes. A dashboard with a warm cache then runs no queries here; the
+    parts cost four only after a write.
+    """
+
+    def __init__(self, user, recent_limit=5, goals_limit=3, cache=None):
+        self.user = user
+        self.recent_limit = recent_limit
+        self.goals_limit = goals_limit
+        self.cache = cache
+
+    def _cached(self, name, compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_set(name, compute)
+
+    async def aload(self):
+        """Fetch totals, monthly series, recent rows and budgets concurrently, for async views.
+
+        Afterwards every property is served from memory, so templates can
+        read them from synchronous code.
+        """
+        (self.__dict__['_balance'], self.__dict__['_series'],
+         self.__dict__['_recent'], self.__dict__['budgets']) = await run_queries(
+            lambda: self._balance,
+            lambda: self._series,
+            lambda: self._recent,
+            lambda: self.budgets,
+        )
+
+    # ---- totals --------------------------------------------------------
+
+    @cached_property
+    def _balance(self):
+        return self._cached('summary:balance', self._fetch_balance)
+
+    def _fetch_balance(self):
+        row = UserBalance.objects.filter(user=self.user).values(*BALANCE_FIELDS).first()
+        return row or dict.fromkeys(BALANCE_FIELDS, ZERO)
+
+    @property
+    def total_income(self):
+        return self._balance['total_income']
+
+    @property
+    def total_expense(self):
+        return self._balance['total_expense']
+
+    @property
+    def total_savings(self):
+        return self._balance['total_saved']
+
+    @property
+    def total_savings_target(self):
+        return self._balance['total_target']
+
+    @property
+    def net_balance(self):
+        return self.total_income - self.total_expense - self.total_savings
+
+    # ---- monthly series ------------------------------------------------
+
+    @cached_property
+    def _series(self):
+        return self._cached('summary:series:minor', self._fetch_series)
+
+    def _fetch_series(self):
+        # Kept in paise: the series only ever feeds chart JSON.
+        rows = (
+            MonthlyCategoryTotal.objects.filter(user=self.user).order_by()
+            .values('kind', 'month')
+            .annotate(amount=Sum(minor('total')))
+            .values_list('kind', 'month', 'amount')
+        )
+        result = {'income': {}, 'expense': {}}
+        for kind, month, amount in rows:
+            result[kind.lower()][month] = amount or 0
+        return result
+
+    def monthly(self, kind):
+        """Return ``(labels, totals)`` for ``'income'`` or ``'expense'``, oldest first.
+
+        Totals are rupee strings such as ``'1234.50'``, formatted from paise.
+        """
+        months = sorted(self._series[kind].items())
+        labels = [month.strftime('%b %Y') for month, _ in months]
+        totals = [format_minor(total) for _, total in months]
+        return labels, totals
+
+    # ---- recent rows ---------------------------------------------------
+
+    def _recent_querysets(self):
+        no_target = Value(None, output_field=AMOUNT_FIELD)
+        incomes = (
+            Income.objects.filter(user=self.user)
+            .annotate(kind=Value('income'), target=no_target)
+            .order_by('-date_received', '-id')
+            .values_list('kind', 'id', 'income_type', 'amount', 'date_received', 'target')
+            [:self.recent_limit]
+        )
+        expenses = (
+            Expense.objects.filter(user=self.user)
+            .annotate(kind=Value('expense'), target=no_target)
+            .order_by('-date_incurred', '-id')
+            .values_list('kind', 'id', 'expense_type', 'amount', 'date_incurred', 'target')
+            [:self.recent_limit]
+        )
+        goals = (
+            SavingsGoal.objects.filter(user=self.user)
+            .annotate(kind=Value('savings'))
+            .order_by('target_date', 'id')
+            .values_list('kind', 'id', 'goal_name', 'current_amount', 'target_date', 'target_amount')
+            [:self.goals_limit]
+        )
+        return incomes, expenses, goals
+
+    @cached_property
+    def _recent(self):
+        return self._cached(f'summary:recent:{self.recent_limit}:{self.goals_limit}', self._fetch_recent)
+
+    def _fetch_recent(self):
+        sql, params = union_all_sql(self._recent_querysets())
+        connection = connections[router.db_for_read(Income)]
+        rows = {'income': [], 'expense': [], 'savings': []}
+        # Raw rows bypass the ORM's converters, so coerce dates and paise here.
+        date_field = DateField()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for kind, pk, label, amount, when, target in cursor.fetchall():
+                amount = from_minor(amount)
+                when = date_field.to_python(when)
+                if kind == 'income':
+                    obj = Income(id=pk, user=self.user, income_type=label,
+                                 amount=amount, date_received=when)
+                elif kind == 'expense':
+                    obj = Expense(id=pk, user=self.user, expense_type=label,
+                                  amount=amount, date_incurred=when)
+                else:
+                    obj = SavingsGoal(id=pk, user=self.user, goal_name=label,
+                                      current_amount=amount, target_date=when,
+                                      target_amount=from_minor(target))
+                rows[kind].append(obj)
+        return rows
+
+    @property
+    def recent_incomes(self):
+        return self._recent['income']
+
+    @property
+    def recent_expenses(self):
+        return self._recent['expense']
+
+    @property
+    def savings_goals(self):
+        return self._recent['savings']
+
+    # ---- budgets -------------------------------------------------------
+
+    @cached_property
+    def budgets(self):
+        """This month's budgets with ``spent`` from the rollup counters."""
+        month = date.today()
+        return self._cached(f'summary:budgets:{month:%Y-%m}', lambda: budget_status(self.user, month))
+
+
+def _next_month(day):
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def category_pivot(user, kind, today=None):
+    """Return ``{window: {category: total}}`` for every entry in ``PIVOT_WINDOWS``.
+
+    The whole window x category matrix is one UNION ALL query, so the cost
+    does not depend on how many categories the user has. The monthly
+    rollup supplies every calendar month that starts inside a window. The
+    rows themselves supply the days of the month a window starts in, at
+    most a month of rows per window. Categories with no rows in a window
+    map to ``ZERO``.
+    """
+    today = today or date.today()
+    model, category_field, date_field = ROLLUP_SOURCES[kind]
+    starts = {months: window_start(today, months) for months in PIVOT_WINDOWS if months}
+    aliases = {months: f'window_{months or "all"}' for months in PIVOT_WINDOWS}
+
+    branches = [
+        MonthlyCategoryTotal.objects.filter(user=user, kind=kind).order_by()
+        .values_list('category')
+        .annotate(**{
+            aliases[months]: Sum('total', filter=Q(month__gte=starts[months]) if months else None)
+            for months in PIVOT_WINDOWS
+        })
+    ]
+    partial = {
+        months: Q(**{f'{date_field}__gte': start, f'{date_field}__lt': _next_month(start)})
+        for months, start in starts.items() if start.day != 1
+    }
+    if partial:
+        # Ungrouped: a few weeks of rows per window read straight off the
+        # (user, date) index and are added up below.
+        branches.append(
+            model.objects.filter(reduce(or_, partial.values()), user=user).order_by()
+            .values_list(category_field)
+            .annotate(**{
+                aliases[months]: Case(When(partial[months], then=F('amount')), default=money(ZERO))
+                if months in partial else money(ZERO)
+                for months in PIVOT_WINDOWS
+            })
+        )
+    rows = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+
+    pivot = {months: {} for months in PIVOT_WINDOWS}
+    for category, *totals in rows:
+        for months, total in zip(PIVOT_WINDOWS, totals):
+            pivot[months][category] = pivot[months].get(category, ZERO) + (total or ZERO)
+    return pivot
+
+
+LEDGER_KINDS = ('savings', 'income', 'expense')
+LEDGER_FIELDS = ('signed_amount', 'label', 'category')
+INCOME_LABELS = dict(Income.INCOME_TYPE_CHOICES)
+EXPENSE_LABELS = dict(Expense.EXPENSE_TYPE_CHOICES)
+
+
+class LedgerRow(NamedTuple):
+    """One row of the transactions page and its CSV download.
+
+    A tuple costs a fraction of the dict it replaces, and the field order is
+    the CSV column order, so the export can write rows as they are.
+    """
+    type: str
+    amount: Decimal
+    description: str
+    category: str
+    date: date
+
+    @classmethod
+    def build(cls, kind, amount, label, category, day):
+        """Resolve stored choice codes through the label tables, not ``get_*_display()``."""
+        if kind == 'income':
+            label = INCOME_LABELS.get(label, label)
+        elif kind == 'expense':
+            category = EXPENSE_LABELS.get(category, category)
+        return cls(kind, amount, label or '', category or 'Uncategorized', day)
+
+
+def ledger_branches(user, kinds=None):
+    """Per-model projections of the unified transaction ledger.
+
+    Every branch exposes ``ledger_date`` plus ``LEDGER_FIELDS`` so they can be
+    combined with ``union(all=True)``; ``kinds`` restricts which models are
+    included. Branches come in ``LEDGER_KINDS`` order, which is also the
+    tie-break order for rows on the same day. Each is ordered newest first
+    along its ``(user, date, id)`` index; goals use ``created_at``, which
+    grows with ``id``, so that order matches ``(ledger_date, id)``.
+    """
+    projections = {
+        'savings': SavingsGoal.objects.filter(user=user).annotate(
+            ledger_date=TruncDate('created_at'),
+            signed_amount=F('current_amount'),
+            label=F('goal_name'),
+            category=Value('Savings'),
+        ).order_by('-created_at', '-id'),
+        'income': Income.objects.filter(user=user).annotate(
+            ledger_date=F('date_received'),
+            signed_amount=F('amount'),
+            label=F('income_type'),
+            category=Value('Income'),
+        ).order_by('-date_received', '-id'),
+        'expense': Expense.objects.filter(user=user).annotate(
+            ledger_date=F('date_incurred'),
+            signed_amount=ExpressionWrapper(-F('amount'), output_field=MoneyField()),
+            label=F('description'),
+            category=F('expense_type'),
+        ).order_by('-date_incurred', '-id'),
+    }
+    return [(kind, projections[kind]) for kind in LEDGER_KINDS if kinds is None or kind in kinds]
+
+
+def ledger(user, kinds=None):
+    """The whole ledger as one ordered UNION ALL query, newest first."""
+    branches = ledger_branches(user, kinds)
+    ranks = branch_ranks(branches)
+    projected = [project_branch(kind, ranks[kind], qs, LEDGER_FIELDS) for kind, qs in branches]
+    return projected[0].union(*projected[1:], all=True).order_by('-ledger_date', '-rank', '-id')
+
+
+def ledger_row(row):
+    """Turn a ledger projection dict into the ``LedgerRow`` the templates render."""
+    return LedgerRow.build(row['kind'], row['signed_amount'], row['label'], row['category'], row['ledger_date'])
+
+
+CHART_KINDS = ('income', 'expense', 'savings')
+CHART_PERIODS = {'1': 1, '3': 3, '6': 6, '12': 12, 'all': None}
+
+
+def chart_series(user, kind, period, cache=None, today=None):
+    """Return ``{'labels': [...], 'totals': [...]}`` for one chart and period.
+
+    Totals are rupee strings formatted from paise, as in ``finance.exports``.
+    Income and expense read the category pivot (cached per data version when
+    ``cache`` is given); savings sums each goal's contributions made in the
+    period.
+    """
+    months = CHART_PERIODS[period]
+    today = today or date.today()
+    if kind == 'savings':
+        # Amounts saved into each goal within the period, in one grouped query.
+        contributions = SavingsContribution.objects.filter(user=user)
+        if months:
+            contributions = contributions.filter(date_contributed__gte=window_start(today, months))
+        rows = list(
+            contributions.order_by('goal_id')
+            .values('goal_id')
+            # Max() keeps the name out of GROUP BY so the (user, goal, date) index serves the grouping.
+            .annotate(name=Max('goal__goal_name'), total=Sum(minor('amount')))
+            .values_list('name', 'total')
+        )
+        return {'labels': [name for name, _ in rows], 'totals': [format_minor(total) for _, total in rows]}
+
+    rollup_kind = MonthlyCategoryTotal.KIND_INCOME if kind == 'income' else MonthlyCategoryTotal.KIND_EXPENSE
+
+    def compute():
+        return category_pivot(user, rollup_kind, today)
+
+    pivot = cache.get_or_set(f'pivot:{kind}:{today}', compute) if cache else compute()
+    if kind == 'income':
+        codes = [code for code, _ in Income.INCOME_TYPE_CHOICES]
+        labels = INCOME_LABELS
+    else:
+        codes = [code for code, _ in Expense.EXPENSE_TYPE_CHOICES if code in pivot[None]]
+        labels = EXPENSE_LABELS
+    return {
+        'labels': [labels[code] for code in codes],
+        'totals': [format_minor(to_minor(pivot[months].get(code, ZERO))) for code in codes],
+    }
@@ -0,0 +1,191 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import balances, prefix_sums, rollups
+from .cache import bump_data_version
+from .fields import money, to_minor
+from .models import Income, Expense, SavingsGoal, SavingsContribution, Budget
+
+
+def deleting_owner(origin):
+    """True when a delete cascades from removing the user itself.
+
+    Derived per-user rows are going away with the user, so handlers must not
+    recreate them (that would violate the foreign key at commit).
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, get_user_model())
+    return isinstance(origin, get_user_model())
+
+
+def applied_in_bulk(origin):
+    """True when ``finance.bulk`` issued the delete and has already adjusted the derived rows."""
+    return isinstance(origin, QuerySet) and getattr(origin, 'derived_applied', False)
+
+
+def deleting_goal(origin):
+    """True when a delete cascades from removing a savings goal (or its owner)."""
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, (SavingsGoal, get_user_model()))
+    return isinstance(origin, (SavingsGoal, get_user_model()))
+
+
+@receiver(pre_save, sender=Income)
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=SavingsGoal)
+@receiver(pre_save, sender=SavingsContribution)
+def remember_previous_row(sender, instance, raw=False, **kwargs):
+    """Capture the stored version of an edited row so post_save can move its totals."""
+    instance._previous_row = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_row = sender.objects.filter(pk=instance.pk).select_for_update().first()
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None:
+        rollups.apply_delta(previous.user_id, *rollups.rollup_key(previous), -previous.amount, -1)
+    rollups.apply_delta(instance.user_id, *rollups.rollup_key(instance), instance.amount, 1)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if deleting_owner(origin) or applied_in_bulk(origin):
+        return
+    rollups.apply_delta(instance.user_id, *rollups.rollup_key(instance), -instance.amount, -1)
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=SavingsGoal)
+def update_balance_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    deltas = balances.contributions(instance)
+    if previous is not None:
+        old = balances.contributions(previous)
+        if update_fields is not None:
+            # Columns left out of the UPDATE keep their stored values.
+            deltas = {
+                field: amount if balances.SOURCES[sender][field] in update_fields else old[field]
+                for field, amount in deltas.items()
+            }
+        if previous.user_id == instance.user_id:
+            deltas = {field: amount - old[field] for field, amount in deltas.items()}
+        else:
+            balances.apply_delta(previous.user_id, {field: -amount for field, amount in old.items()})
+    balances.apply_delta(instance.user_id, deltas)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=SavingsGoal)
+def update_balance_on_delete(sender, instance, origin=None, **kwargs):
+    if deleting_owner(origin) or applied_in_bulk(origin):
+        return
+    balances.apply_delta(instance.user_id, {
+        field: -amount for field, amount in balances.contributions(instance).items()
+    })
+
+
+@receiver(post_save, sender=SavingsGoal)
+def record_direct_contribution(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Log a direct change to ``current_amount`` (opening amount, edits) as a contribution.
+
+    The row is inserted with ``bulk_create`` so the contribution handlers
+    below do not add the amount to the goal a second time.
+    """
+    if raw or (update_fields is not None and 'current_amount' not in update_fields):
+        return
+    previous = getattr(instance, '_previous_row', None)
+    amount = instance.current_amount - (previous.current_amount if previous is not None else 0)
+    if amount:
+        SavingsContribution.objects.bulk_create([
+            SavingsContribution(user_id=instance.user_id, goal=instance, amount=amount)
+        ])
+
+
+def move_contribution(contribution, amount):
+    SavingsGoal.objects.filter(pk=contribution.goal_id).update(current_amount=F('current_amount') + money(amount))
+    balances.apply_delta(contribution.user_id, {'total_saved': amount})
+
+
+@receiver(post_save, sender=SavingsContribution)
+def apply_contribution_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None:
+        move_contribution(previous, -previous.amount)
+    move_contribution(instance, instance.amount)
+
+
+@receiver(post_delete, sender=SavingsContribution)
+def revert_contribution_on_delete(sender, instance, origin=None, **kwargs):
+    if deleting_goal(origin):
+        return
+    move_contribution(instance, -instance.amount)
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=SavingsGoal)
+@receiver(post_save, sender=SavingsContribution)
+@receiver(post_save, sender=Budget)
+def bump_version_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None and previous.user_id != instance.user_id:
+        bump_data_version(previous.user_id)
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=SavingsGoal)
+@receiver(post_delete, sender=SavingsContribution)
+@receiver(post_delete, sender=Budget)
+def bump_version_on_delete(sender, instance, origin=None, **kwargs):
+    if deleting_owner(origin) or applied_in_bulk(origin) or (
+            sender is SavingsContribution and deleting_goal(origin)):
+        return
+    bump_data_version(instance.user_id)
+
+
+# Registered after the version bumps above, so each write has bumped the
+# version exactly once by the time these run.
+def _daily_change(instance, sign):
+    kind = 'income' if isinstance(instance, Income) else 'expense'
+    _, category_field, date_field = prefix_sums.SOURCES[kind]
+    return (instance.user_id, kind, getattr(instance, category_field), getattr(instance, date_field),
+            sign * to_minor(instance.amount))
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expense)
+def patch_daily_totals_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    changes = [_daily_change(instance, 1)]
+    if previous is not None:
+        changes.insert(0, _daily_change(previous, -1))
+    prefix_sums.patch_on_commit(changes)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expense)
+def patch_daily_totals_on_delete(sender, instance, origin=None, **kwargs):
+    if deleting_owner(origin) or applied_in_bulk(origin):
+        return
+    prefix_sums.patch_on_commit([_daily_change(instance, -1)])
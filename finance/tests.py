@@ -1,3 +1,1611 @@
-from django.test import TestCase
+import csv
+import json
+import math
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import Sum
+from django.test import (
+    AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, modify_settings, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from unittest import mock, skipUnless
+
+from . import aio, async_views, balances, bulk, forecasting, metrics, prefix_sums, recurring, rollups, search, views
+from .fields import format_minor, from_minor, minor, to_minor
+from .importers import import_csv
+from .budgets import budget_status
+from .models import (
+    Budget, Income, Expense, RecurringRule, SavingsGoal, SavingsContribution, MonthlyCategoryTotal, UserBalance,
+)
+from .cache import VersionedCache, bump_data_version, data_version
+from .pagination import union_keyset_paginate
+from .services import (
+    FinanceSummary, LedgerRow, category_pivot, chart_series, ledger, ledger_branches, ledger_row, LEDGER_FIELDS,
+)
+
+User = get_user_model()
+
+
+class FinanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.other = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        today = date.today()
+        for i, (income_type, amount) in enumerate([('SALARY', '5000.00'), ('FREELANCE', '750.50'), ('RENTAL', '1200.00')]):
+            Income.objects.create(user=cls.user, income_type=income_type, amount=Decimal(amount),
+                                  date_received=today - timedelta(days=40 * i))
+        for i, (expense_type, amount) in enumerate([('FOOD', '300.25'), ('HOUSING', '2000.00'), ('FOOD', '99.75')]):
+            Expense.objects.create(user=cls.user, expense_type=expense_type, amount=Decimal(amount),
+                                   date_incurred=today - timedelta(days=40 * i), source='BANK')
+        SavingsGoal.objects.create(user=cls.user, goal_name='Car', target_amount=Decimal('10000'),
+                                   current_amount=Decimal('2500'), target_date=today + timedelta(days=365))
+        Income.objects.create(user=cls.other, income_type='SALARY', amount=Decimal('99999'), date_received=today)
+
+    def setUp(self):
+        # Test transactions roll back data versions, so cached entries from an
+        # earlier test could otherwise match.
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+class FinanceSummaryTests(FinanceTestCase):
+    def test_totals_are_scoped_to_user(self):
+        summary = FinanceSummary(self.user)
+        self.assertEqual(summary.total_income, Decimal('6950.50'))
+        self.assertEqual(summary.total_expense, Decimal('2400.00'))
+        self.assertEqual(summary.total_savings, Decimal('2500'))
+        self.assertEqual(summary.total_savings_target, Decimal('10000'))
+        self.assertEqual(summary.net_balance, Decimal('2050.50'))
+
+    def test_totals_are_one_lookup_and_series_one_query(self):
+        summary = FinanceSummary(self.user)
+        with self.assertNumQueries(1):
+            summary.total_income
+            summary.total_savings
+            summary.net_balance
+        with self.assertNumQueries(1):
+            labels, totals = summary.monthly('expense')
+        self.assertEqual(sum(Decimal(total) for total in totals), Decimal('2400.00'))
+        self.assertEqual(len(labels), len(totals))
+
+    def test_recent_rows_in_one_query(self):
+        summary = FinanceSummary(self.user, recent_limit=2)
+        with self.assertNumQueries(1):
+            incomes = summary.recent_incomes
+            expenses = summary.recent_expenses
+            goals = summary.savings_goals
+        self.assertEqual([i.income_type for i in incomes], ['SALARY', 'FREELANCE'])
+        self.assertEqual(expenses[0].get_expense_type_display(), 'Food')
+        self.assertEqual(goals[0].progress_percentage, 25)
+
+    def test_dashboard_query_count(self):
+        # session + user + data version + balance + monthly series + recent rows + budgets
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('finance:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_income'], Decimal('6950.50'))
+        # Until the next write every figure comes from the cache: session + user + data version.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('finance:dashboard'))
+        self.assertEqual(response.context['total_income'], Decimal('6950.50'))
+
+
+class MonthlyRollupTests(FinanceTestCase):
+    def buckets(self, kind=MonthlyCategoryTotal.KIND_EXPENSE):
+        return {
+            (b.category, b.month): (b.total, b.count)
+            for b in MonthlyCategoryTotal.objects.filter(user=self.user, kind=kind)
+        }
+
+    def test_create_update_delete_keep_rollup_in_step(self):
+        day = date(2024, 3, 15)
+        expense = Expense.objects.create(user=self.user, expense_type='SHOPPING', amount=Decimal('40'),
+                                         date_incurred=day, source='CASH')
+        self.assertEqual(self.buckets()[('SHOPPING', date(2024, 3, 1))], (Decimal('40'), 1))
+
+        expense.expense_type = 'EDUCATION'
+        expense.date_incurred = date(2024, 4, 2)
+        expense.amount = Decimal('55')
+        expense.save()
+        buckets = self.buckets()
+        self.assertNotIn(('SHOPPING', date(2024, 3, 1)), buckets)
+        self.assertEqual(buckets[('EDUCATION', date(2024, 4, 1))], (Decimal('55'), 1))
+
+        expense.delete()
+        self.assertNotIn(('EDUCATION', date(2024, 4, 1)), self.buckets())
+
+    def test_rebuild_matches_incremental_state(self):
+        before = self.buckets(MonthlyCategoryTotal.KIND_INCOME), self.buckets()
+        MonthlyCategoryTotal.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual((self.buckets(MonthlyCategoryTotal.KIND_INCOME), self.buckets()), before)
+
+    def test_months_back(self):
+        self.assertEqual(rollups.months_back(date(2024, 1, 20), 1), date(2024, 1, 1))
+        self.assertEqual(rollups.months_back(date(2024, 1, 20), 3), date(2023, 11, 1))
+        self.assertEqual(rollups.months_back(date(2024, 1, 20), 12), date(2023, 2, 1))
+
+
+class UserBalanceTests(FinanceTestCase):
+    def balance(self, user=None):
+        return UserBalance.objects.get(user=user or self.user)
+
+    def test_writes_adjust_the_balance(self):
+        self.assertEqual(self.balance().net_balance, Decimal('2050.50'))
+        income = Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('50'),
+                                       date_received=date.today())
+        self.assertEqual(self.balance().total_income, Decimal('7000.50'))
+
+        income.amount = Decimal('20')
+        income.save()
+        self.assertEqual(self.balance().total_income, Decimal('6970.50'))
+
+        income.user = self.other
+        income.save()
+        self.assertEqual(self.balance().total_income, Decimal('6950.50'))
+        self.assertEqual(self.balance(self.other).total_income, Decimal('100019'))
+
+        goal = SavingsGoal.objects.get(user=self.user)
+        goal.current_amount += 500
+        goal.save()
+        self.assertEqual((self.balance().total_saved, self.balance().total_target), (Decimal('3000'), Decimal('10000')))
+        goal.delete()
+        Expense.objects.filter(user=self.user, expense_type='HOUSING').delete()
+        balance = self.balance()
+        self.assertEqual((balance.total_saved, balance.total_target, balance.total_expense),
+                         (Decimal('0'), Decimal('0'), Decimal('400.00')))
+
+    def test_user_delete_cascades(self):
+        self.other.delete()
+        self.assertFalse(UserBalance.objects.filter(user_id=self.other.pk).exists())
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        UserBalance.objects.filter(user=self.user).update(total_expense=Decimal('1'))
+        UserBalance.objects.filter(user=self.other).delete()
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', check=True, stdout=out)
+        self.assertIn(f'user {self.user.pk}: total_expense 1.00 -> 2400.00', out.getvalue())
+        self.assertEqual(self.balance().total_expense, Decimal('1'))
+
+        call_command('reconcile_balances', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.balance().total_expense, Decimal('2400.00'))
+        self.assertEqual(self.balance(self.other).total_income, Decimal('99999'))
+        out = StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn('0 drifted', out.getvalue())
+
+
+class MoneyFieldTests(FinanceTestCase):
+    def test_amounts_are_stored_as_paise(self):
+        Income.objects.bulk_create(
+            Income(user=self.other, income_type='OTHER', amount=Decimal(value), date_received=date.today())
+            for value in ('0.10', '0.20', '-0.05')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount FROM finance_income WHERE user_id = %s ORDER BY id', [self.other.pk])
+            self.assertEqual([row[0] for row in cursor.fetchall()], [9999900, 10, 20, -5])
+        incomes = Income.objects.filter(user=self.other, amount__lt=1).order_by('id')
+        self.assertEqual([str(income.amount) for income in incomes], ['0.10', '0.20', '-0.05'])
+        self.assertEqual(incomes.aggregate(total=Sum('amount'))['total'], Decimal('0.25'))
+
+    def test_format_minor(self):
+        self.assertEqual([format_minor(value) for value in (0, 5, -5, 100, 123450, -123456)],
+                         ['0.00', '0.05', '-0.05', '1.00', '1234.50', '-1234.56'])
+        self.assertEqual([from_minor(value) for value in (123450, -5, None)], [Decimal('1234.50'), Decimal('-0.05'), None])
+        self.assertEqual(to_minor(Decimal('1234.5')), 123450)
+        self.assertEqual(to_minor('0.1'), 10)
+
+    def test_forms_and_validation_keep_decimal_rules(self):
+        field = Income._meta.get_field('amount').formfield()
+        self.assertEqual((field.max_digits, field.decimal_places), (12, 2))
+        self.assertEqual(field.clean('12.30'), Decimal('12.30'))
+        income = Income(user=self.user, income_type='OTHER', date_received=date.today())
+        for amount in ('1.005', '12345678901.00'):
+            income.amount = Decimal(amount)
+            with self.subTest(amount=amount), self.assertRaises(ValidationError):
+                income.full_clean()
+
+
+class SavingsContributionTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goal = SavingsGoal.objects.get(user=self.user)
+
+    def saved(self):
+        self.goal.refresh_from_db()
+        return (self.goal.current_amount, self.goal.contributions.aggregate(total=Sum('amount'))['total'],
+                UserBalance.objects.get(user=self.user).total_saved)
+
+    def test_opening_amount_is_a_contribution(self):
+        self.assertEqual(list(self.goal.contributions.values_list('amount', flat=True)), [Decimal('2500')])
+        self.assertEqual(self.saved(), (Decimal('2500'), Decimal('2500'), Decimal('2500')))
+
+    def test_contributions_maintain_current_amount_and_balance(self):
+        self.goal.contribute(Decimal('300'))
+        self.assertEqual(self.goal.current_amount, Decimal('2800'))
+        withdrawal = self.goal.contribute(Decimal('-100'))
+        self.assertEqual(self.saved(), (Decimal('2700'), Decimal('2700'), Decimal('2700')))
+
+        withdrawal.delete()
+        self.assertEqual(self.saved(), (Decimal('2800'), Decimal('2800'), Decimal('2800')))
+
+        self.goal.current_amount = Decimal('1000')
+        self.goal.save()
+        self.assertEqual(self.saved(), (Decimal('1000'), Decimal('1000'), Decimal('1000')))
+
+        self.goal.delete()
+        self.assertFalse(SavingsContribution.objects.exists())
+        self.assertEqual(UserBalance.objects.get(user=self.user).total_saved, 0)
+
+    def test_adding_to_an_existing_goal_records_a_deposit(self):
+        response = self.client.post(reverse('finance:savings'), {'existing_goal': self.goal.pk, 'amount_to_add': '150'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(self.goal.contributions.values_list('amount', flat=True)),
+                         [Decimal('150'), Decimal('2500')])
+        self.assertEqual(self.saved()[0], Decimal('2650'))
+
+    def test_savings_page_fetches_goals_once(self):
+        SavingsGoal.objects.create(user=self.user, goal_name='Trip', target_amount=Decimal('900'),
+                                   current_amount=Decimal('900'), target_date=date.today() + timedelta(days=30))
+        # session + user, then the goals themselves
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('finance:savings'))
+        self.assertEqual(response.context['total_target'], Decimal('10900'))
+        self.assertEqual(response.context['total_saved'], Decimal('3400'))
+        self.assertEqual(response.context['remaining_amount'], Decimal('7500'))
+        self.assertEqual([goal.goal_name for goal in response.context['incomplete_goals']], ['Car'])
+        self.assertContains(response, 'Car - ₹2500.00/₹10000.00')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('finance:edit_savings', args=[self.goal.pk]))
+        self.assertEqual(response.context['goal_to_edit'], self.goal)
+        self.assertEqual(self.client.get(reverse('finance:edit_savings', args=[999])).status_code, 404)
+
+        self.client.post(reverse('finance:edit_savings', args=[self.goal.pk]), {
+            'goal_name': 'Car', 'target_amount': '10000', 'amount_to_add': '3000',
+            'target_date': (date.today() + timedelta(days=90)).isoformat(),
+        })
+        self.assertEqual(self.saved(), (Decimal('3000'), Decimal('3000'), Decimal('3900')))
+
+    def test_period_chart_sums_contributions_in_window(self):
+        self.goal.contribute(Decimal('400'))
+        SavingsContribution.objects.filter(amount=Decimal('2500')).update(
+            date_contributed=date.today() - timedelta(days=200))
+        other = SavingsGoal.objects.create(user=self.user, goal_name='Trip', target_amount=Decimal('900'),
+                                           target_date=date.today() + timedelta(days=30))
+        other.contribute(Decimal('90'))
+        with self.assertNumQueries(1):
+            series = chart_series(self.user, 'savings', '3')
+        self.assertEqual(series, {'labels': ['Car', 'Trip'], 'totals': ['400.00', '90.00']})
+        self.assertEqual(chart_series(self.user, 'savings', 'all')['totals'], ['2900.00', '90.00'])
+
+
+class BudgetTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        self.food = Budget.objects.create(user=self.user, category='FOOD', amount=Decimal('500'))
+        Budget.objects.create(user=self.user, category='TRANSPORT', amount=Decimal('100'), warn_at=50)
+
+    def status(self):
+        return {budget.category: (budget.spent, budget.state) for budget in budget_status(self.user, self.today)}
+
+    def test_spend_follows_expense_writes(self):
+        # Only this month's 300.25 of food counts; the fixture's other rows are 40 and 80 days old.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.status(), {'FOOD': (Decimal('300.25'), 'ok'), 'TRANSPORT': (0, 'ok')})
+
+        expense = Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('120'),
+                                         date_incurred=self.today, source='CASH')
+        self.assertEqual(self.status()['FOOD'], (Decimal('420.25'), 'warning'))
+        expense.amount = Decimal('250')
+        expense.save()
+        self.assertEqual(self.status()['FOOD'], (Decimal('550.25'), 'over'))
+        expense.expense_type = 'TRANSPORT'
+        expense.save()
+        self.assertEqual(self.status(), {'FOOD': (Decimal('300.25'), 'ok'),
+                                         'TRANSPORT': (Decimal('250'), 'over')})
+        expense.delete()
+        self.assertEqual(self.status()['TRANSPORT'], (0, 'ok'))
+        # Other users' spend never counts.
+        self.assertEqual(budget_status(self.other, self.today), [])
+
+    def test_plain_budget_reads_its_spend(self):
+        food = Budget.objects.get(pk=self.food.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual((food.spent, food.remaining, food.state), (Decimal('300.25'), Decimal('199.75'), 'ok'))
+        transport = Budget.objects.get(user=self.user, category='TRANSPORT')
+        self.assertEqual((transport.spent, transport.used_percentage), (0, 0))
+        # An annotated budget never queries for it.
+        with self.assertNumQueries(1):
+            self.assertEqual(budget_status(self.user, self.today)[0].spent, Decimal('300.25'))
+
+    def test_expense_view_warns_with_one_budget_lookup(self):
+        data = {'expense_type': 'TRANSPORT', 'amount': '60', 'date_incurred': self.today.isoformat(),
+                'source': 'CASH'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('finance:expense'), data, follow=True)
+        self.assertEqual(sum('finance_budget' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertEqual([str(message) for message in response.context['messages']],
+                         [f"Transport budget for {self.today:%b %Y} is 60% used (₹60.00 of ₹100.00)."])
+
+        response = self.client.post(reverse('finance:expense'), {**data, 'amount': '10', 'expense_type': 'FOOD'},
+                                    follow=True)
+        self.assertEqual(list(response.context['messages']), [])
+
+    def test_dashboard_panel_and_budget_page(self):
+        response = self.client.get(reverse('finance:dashboard'))
+        self.assertEqual([budget.category for budget in response.context['budgets']], ['FOOD', 'TRANSPORT'])
+        self.assertContains(response, 'Budgets This Month')
+
+        response = self.client.post(reverse('finance:budgets'),
+                                    {'category': 'FOOD', 'amount': '250', 'warn_at': '90'}, follow=True)
+        self.assertEqual(response.context['budgets'][0].state, 'over')
+        self.food.refresh_from_db()
+        self.assertEqual((self.food.amount, self.food.warn_at), (Decimal('250'), 90))
+        self.assertEqual(self.client.get(reverse('finance:dashboard')).context['budgets'][0].amount, Decimal('250'))
+
+        self.client.post(reverse('finance:delete_budget', args=[self.food.pk]))
+        self.assertFalse(Budget.objects.filter(pk=self.food.pk).exists())
+
+
+class RecurringRuleTests(FinanceTestCase):
+    def rule(self, **fields):
+        fields = {'user': self.user, 'kind': RecurringRule.KIND_INCOME, 'category': 'SALARY',
+                  'amount': Decimal('1000'), 'start_date': date(2026, 1, 31), **fields}
+        return RecurringRule.objects.create(next_run=fields['start_date'], **fields)
+
+    def test_monthly_occurrences_keep_their_day(self):
+        rule = self.rule()
+        self.assertEqual([recurring.occurrence(rule, n) for n in range(4)],
+                         [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)])
+        self.assertEqual(recurring.occurrence_index(rule, date(2026, 3, 1)), 2)
+        weekly = self.rule(frequency=RecurringRule.WEEKLY)
+        self.assertEqual(recurring.due_dates(weekly, date(2026, 2, 14)),
+                         ([date(2026, 1, 31), date(2026, 2, 7), date(2026, 2, 14)], date(2026, 2, 21)))
+
+    def test_catch_up_is_idempotent(self):
+        rule = self.rule()
+        balance = UserBalance.objects.get(user=self.user).total_income
+        with CaptureQueriesContext(connection) as queries:
+            result = recurring.materialize(date(2026, 4, 30))
+        self.assertEqual((result.rules, result.created, result.existing), (1, 4, 0))
+        due = [query['sql'] for query in queries.captured_queries
+               if query['sql'].startswith('SELECT') and 'FROM "finance_recurringrule"' in query['sql']]
+        self.assertEqual(len(due), 2)  # the batch, then the empty check that ends the run
+        self.assertEqual(plan_problems(due[0]), [])
+
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_run, date(2026, 5, 31))
+        self.assertEqual(list(rule.income_set.values_list('date_received', flat=True).order_by('date_received')),
+                         [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)])
+        self.assertEqual(UserBalance.objects.get(user=self.user).total_income, balance + 4000)
+        self.assertEqual(MonthlyCategoryTotal.objects.get(user=self.user, kind='INCOME', month=date(2026, 2, 1)).total,
+                         Decimal('1000'))
+
+        # An overlapping run finds nothing due; a rule wound back finds its rows already there.
+        self.assertEqual(recurring.materialize(date(2026, 4, 30)).created, 0)
+        RecurringRule.objects.filter(pk=rule.pk).update(next_run=rule.start_date)
+        result = recurring.materialize(date(2026, 4, 30))
+        self.assertEqual((result.created, result.existing), (0, 4))
+        self.assertEqual(rule.income_set.count(), 4)
+
+    def test_end_date_and_expense_fields(self):
+        rule = self.rule(kind=RecurringRule.KIND_EXPENSE, category='HOUSING', source='BANK',
+                         frequency=RecurringRule.MONTHLY, end_date=date(2026, 3, 15), description='Rent')
+        out = StringIO()
+        call_command('materialize_recurring', '--until', '2026-06-30', stdout=out)
+        self.assertIn('1 rules: 2 rows created', out.getvalue())
+        rule.refresh_from_db()
+        self.assertFalse(rule.active)
+        self.assertEqual(set(rule.expense_set.values_list('expense_type', 'source', 'description')),
+                         {('HOUSING', 'BANK', 'Rent')})
+
+    def test_repeat_on_the_income_form_starts_a_rule(self):
+        today = date.today()
+        self.client.post(reverse('finance:income'), {
+            'income_type': 'SALARY', 'amount': '3000', 'date_received': today.isoformat(), 'repeat': 'MONTHLY',
+        })
+        rule = RecurringRule.objects.get(user=self.user)
+        self.assertEqual((rule.kind, rule.amount, rule.start_date), ('INCOME', Decimal('3000'), today))
+        self.assertEqual(rule.next_run, recurring.occurrence(rule, 1))
+        self.assertEqual(rule.income_set.get().date_received, today)
+        self.assertEqual(recurring.materialize(today).created, 0)
+
+    def test_split_range(self):
+        self.assertEqual(recurring.split_range(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(recurring.split_range(7, 7, 4), [(7, 7)])
+
+
+class SearchTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        for expense_type, description, days in [('FOOD', 'Weekly groceries at the market', 3),
+                                                ('FOOD', 'Grocery delivery', 20),
+                                                ('UTILITIES', 'Electricity bill', 5)]:
+            Expense.objects.create(user=self.user, expense_type=expense_type, amount=Decimal('50'), source='CASH',
+                                   date_incurred=self.today - timedelta(days=days), description=description)
+        Income.objects.create(user=self.user, income_type='FREELANCE', amount=Decimal('900'),
+                              date_received=self.today, description='Grocery store website')
+        Expense.objects.create(user=self.other, expense_type='FOOD', amount=Decimal('5'), source='CASH',
+                               date_incurred=self.today, description='groceries')
+
+    def descriptions(self, text, **filters):
+        return [row['description'] for row in search.search(self.user, text, **filters)]
+
+    def test_ranked_matches_and_filters(self):
+        self.assertEqual(sorted(self.descriptions('grocer')),
+                         ['Grocery delivery', 'Grocery store website', 'Weekly groceries at the market'])
+        self.assertEqual(self.descriptions('grocery market'), ['Weekly groceries at the market'])
+        self.assertEqual(sorted(self.descriptions('grocer', kind='expense')),
+                         ['Grocery delivery', 'Weekly groceries at the market'])
+        self.assertEqual(self.descriptions('grocer', start=self.today - timedelta(days=10), kind='expense'),
+                         ['Weekly groceries at the market'])
+        self.assertEqual(self.descriptions('bill', category='FOOD'), [])
+        self.assertEqual(self.descriptions('"bill*)(:'), ['Electricity bill'])
+        self.assertEqual(self.descriptions('  '), [])
+
+    def test_index_follows_every_kind_of_write(self):
+        Expense.objects.filter(description='Electricity bill').update(description='Water bill')
+        self.assertEqual(self.descriptions('water'), ['Water bill'])
+        self.assertEqual(self.descriptions('electricity'), [])
+        Expense.objects.bulk_create([Expense(user=self.user, expense_type='OTHER', amount=Decimal('1'), source='CASH',
+                                             date_incurred=self.today, description='Gym membership')])
+        self.assertEqual(self.descriptions('gym'), ['Gym membership'])
+        Expense.objects.filter(description='Gym membership').delete()
+        self.assertEqual(self.descriptions('gym'), [])
+
+    def test_search_uses_the_full_text_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            search.search(self.user, 'grocer', kind='expense', category='FOOD', start=self.today - timedelta(days=30))
+        (sql,) = [query['sql'] for query in queries.captured_queries]
+        # Ranking sorts the matches; what must not happen is a pass over the whole table.
+        self.assertEqual([problem for problem in plan_problems(sql)
+                          if 'Sort' not in problem and 'TEMP B-TREE' not in problem], [])
+
+    def test_endpoint_and_admin(self):
+        data = self.client.get(reverse('finance:search'), {'q': 'grocer', 'kind': 'income'}).json()
+        self.assertEqual([(row['kind'], row['category'], row['amount']) for row in data['results']],
+                         [('income', 'Freelance', '900.00')])
+        self.assertEqual(self.client.get(reverse('finance:search'), {'q': 'x', 'from': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('finance:search'), {'q': 'x', 'kind': 'savings'}).status_code, 400)
+
+        admin_user = User.objects.create_superuser(username='root', email='root@example.com', password='pw')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:finance_expense_changelist'), {'q': 'groceries'})
+        self.assertEqual(sorted(expense.description for expense in response.context['cl'].result_list),
+                         ['Grocery delivery', 'Weekly groceries at the market', 'groceries'])
+
+
+class PrefixSumTests(FinanceTestCase):
+    def exact_total(self, model, date_field, start, end, **filters):
+        return model.objects.filter(user=self.user, **{f'{date_field}__range': (start, end)}, **filters).aggregate(
+            total=Sum('amount'))['total'] or Decimal('0')
+
+    def test_range_totals_match_the_rows(self):
+        with self.assertNumQueries(1):
+            index = prefix_sums.build(self.user)
+        today = date.today()
+        for start, end in [(today - timedelta(days=45), today), (today - timedelta(days=80), today - timedelta(days=80)),
+                           (date(2000, 1, 1), today + timedelta(days=999)), (today + timedelta(days=1), today + timedelta(days=9))]:
+            with self.subTest(start=start, end=end):
+                totals = prefix_sums.report(index, start, end, 'kind')['totals']
+                self.assertEqual(Decimal(totals['income']), self.exact_total(Income, 'date_received', start, end))
+                self.assertEqual(Decimal(totals['expense']), self.exact_total(Expense, 'date_incurred', start, end))
+        food = prefix_sums.report(index, date(2000, 1, 1), today, 'category')['totals']['expense']['Food']
+        self.assertEqual(food, '400.00')
+
+    def test_endpoint_groups_and_comparisons(self):
+        today = date.today()
+        url = reverse('finance:totals')
+        data = self.client.get(url, {'from': (today - timedelta(days=100)).isoformat(), 'to': today.isoformat(),
+                                     'group': 'month', 'compare': 'year'}).json()
+        self.assertEqual(len(data['totals']['labels']), len(data['totals']['income']))
+        self.assertEqual(sum(Decimal(value) for value in data['totals']['expense']), Decimal('2400.00'))
+        self.assertEqual(data['comparison']['from'], prefix_sums.shift_year(today - timedelta(days=100), -1).isoformat())
+        self.assertEqual(set(data['comparison']['totals']['income']), {'0.00'})
+
+        data = self.client.get(url, {'from': today.isoformat(), 'to': today.isoformat(), 'compare': 'previous'}).json()
+        self.assertEqual(data['totals'], {'income': '5000.00', 'expense': '300.25', 'net': '4699.75'})
+        self.assertEqual(data['comparison']['to'], (today - timedelta(days=1)).isoformat())
+        for params in ({'from': 'soon'}, {'from': '2024-02-01', 'to': '2024-01-01'}, {'group': 'week'},
+                       {'compare': 'decade'}, {'from': '9999-12-01', 'to': '9999-12-31'},
+                       {'from': '0001-01-01', 'to': '0001-01-05', 'compare': 'previous'},
+                       {'from': '0001-06-01', 'to': '0001-06-05', 'compare': 'year'},
+                       {'from': '1900-01-01', 'to': '2024-01-01', 'group': 'month'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_month_cap_and_calendar_edges(self):
+        url = reverse('finance:totals')
+        with override_settings(FINANCE_TOTALS_MAX_MONTHS=3):
+            self.assertEqual(self.client.get(url, {'from': '2024-01-31', 'to': '2024-03-01', 'group': 'month'})
+                             .status_code, 200)
+            self.assertEqual(self.client.get(url, {'from': '2024-01-31', 'to': '2024-04-01', 'group': 'month'})
+                             .status_code, 400)
+        # Long spans are fine for the other groups, and the earliest dates without a comparison.
+        self.assertEqual(self.client.get(url, {'from': '0001-01-01', 'to': '9999-12-30'}).json()['totals'],
+                         {'income': '6950.50', 'expense': '2400.00', 'net': '4550.50'})
+        self.assertEqual(self.client.get(url, {'from': '0001-01-02', 'to': '0001-01-02', 'compare': 'previous'})
+                         .status_code, 200)
+
+    def test_writes_patch_the_cached_index(self):
+        url = reverse('finance:totals')
+        params = {'from': '2000-01-01', 'to': (date.today() + timedelta(days=400)).isoformat()}
+        self.assertEqual(self.client.get(url, params).json()['totals']['income'], '6950.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            income = Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('0.50'),
+                                           date_received=date.today() + timedelta(days=300))
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('10'), source='CASH',
+                                   date_incurred=date(2001, 1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            income.amount = Decimal('1.50')
+            income.income_type = 'SALARY'
+            income.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.filter(user=self.user, expense_type='HOUSING').get().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            totals = self.client.get(url, params).json()['totals']
+        # Served from the patched index: no grouped rebuild query.
+        self.assertFalse([query for query in queries.captured_queries if 'UNION' in query['sql']])
+        self.assertEqual(totals, {'income': '6952.00', 'expense': '410.00', 'net': '6542.00'})
+        # A patched index may keep a day whose rows are gone, at no cost to its totals.
+        future = date.today() + timedelta(days=400)
+        for group in prefix_sums.GROUPS:
+            with self.subTest(group=group):
+                self.assertEqual(
+                    prefix_sums.report(prefix_sums.build(self.user), date(2000, 1, 1), future, group),
+                    prefix_sums.report(prefix_sums.daily_totals(self.user, VersionedCache(self.user)),
+                                       date(2000, 1, 1), future, group))
+
+        # Bulk writes only bump the version; the next read rebuilds.
+        Income.objects.filter(pk=income.pk).update(amount=Decimal('3'))
+        bump_data_version(self.user.pk)
+        self.assertEqual(self.client.get(url, params).json()['totals']['income'], '6953.50')
+
+    def test_index_size_follows_days_with_rows(self):
+        Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('1'), date_received=date(1, 1, 1))
+        Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('2'), source='CASH',
+                               date_incurred=date(9999, 12, 30))
+        index = prefix_sums.build(self.user)
+        days = Income.objects.filter(user=self.user).dates('date_received', 'day').count() + \
+            Expense.objects.filter(user=self.user).dates('date_incurred', 'day').count()
+        self.assertLessEqual(index.prefix.shape[1], days + 1)
+        totals = prefix_sums.report(index, date(1, 1, 1), date(9999, 12, 30))['totals']
+        self.assertEqual(totals, {'income': '6951.50', 'expense': '2402.00', 'net': '4549.50'})
+        self.assertEqual(prefix_sums.report(index, date(2, 1, 1), date(9999, 12, 29))['totals']['expense'],
+                         '2400.00')
+
+    def test_writes_check_the_version_without_loading_the_index(self):
+        url = reverse('finance:totals')
+        self.client.get(url, {'from': '2000-01-01', 'to': date.today().isoformat()})
+        backend = prefix_sums._backend()
+        with mock.patch.object(backend, 'get', wraps=backend.get) as get:
+            with self.captureOnCommitCallbacks() as callbacks:
+                Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('1'), source='CASH',
+                                       date_incurred=date.today())
+            self.assertEqual([call.args[0] for call in get.call_args_list], [prefix_sums._version_key(self.user.pk)])
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.client.get(url, {'from': date.today().isoformat(), 'to': date.today().isoformat()})
+                         .json()['totals']['expense'], '301.25')
+
+    def test_build_raced_by_a_write_is_not_stored(self):
+        cache = VersionedCache(self.user)
+        cache.version  # Read before the write, as a view does.
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('1'), source='CASH',
+                                   date_incurred=date.today())
+        index = prefix_sums.daily_totals(self.user, cache)
+        self.assertIsNone(prefix_sums._backend().get(prefix_sums._key(self.user.pk)))
+        self.assertEqual(prefix_sums.report(index, date.today(), date.today())['totals']['expense'], '301.25')
+
+
+class CategoryPivotTests(FinanceTestCase):
+    def test_windows_and_categories(self):
+        pivot = category_pivot(self.user, MonthlyCategoryTotal.KIND_EXPENSE)
+        self.assertEqual(pivot[None], {'FOOD': Decimal('400.00'), 'HOUSING': Decimal('2000.00')})
+        self.assertEqual(pivot[1]['FOOD'], Decimal('300.25'))
+        self.assertEqual(pivot[12]['HOUSING'], Decimal('2000.00'))
+
+    def test_windows_are_rolling_30_day_periods(self):
+        today = date(2024, 5, 20)
+        for days_ago, amount in ((30, '1'), (31, '10'), (49, '100'), (50, '1000'), (60, '10000')):
+            Expense.objects.create(user=self.user, expense_type='SHOPPING', amount=Decimal(amount),
+                                   date_incurred=today - timedelta(days=days_ago), source='CASH')
+        pivot = category_pivot(self.user, MonthlyCategoryTotal.KIND_EXPENSE, today)
+        # "1 month" is 2024-04-20 onwards: the end of April from the rows, May from the rollup.
+        self.assertEqual(pivot[1]['SHOPPING'], Decimal('1'))
+        self.assertEqual(pivot[3]['SHOPPING'], Decimal('11111'))
+        self.assertEqual(pivot[None]['SHOPPING'], Decimal('11111'))
+        self.assertEqual(self.client.get(reverse('finance:chart_data', args=['expense']), {'period': '1'})
+                         .json()['totals'], ['300.25', '0.00', '0.00'])
+
+        # A window starting on the 1st is served by the rollup alone.
+        with self.assertNumQueries(1):
+            pivot = category_pivot(self.user, MonthlyCategoryTotal.KIND_EXPENSE, date(2024, 3, 31))
+        self.assertEqual(pivot[1]['SHOPPING'], Decimal('11111'))
+
+    def test_query_count_is_independent_of_categories(self):
+        with self.assertNumQueries(1):
+            category_pivot(self.user, MonthlyCategoryTotal.KIND_EXPENSE)
+        for code, _ in Expense.EXPENSE_TYPE_CHOICES:
+            Expense.objects.create(user=self.user, expense_type=code, amount=Decimal('1'),
+                                   date_incurred=date.today(), source='CASH')
+        with self.assertNumQueries(1):
+            pivot = category_pivot(self.user, MonthlyCategoryTotal.KIND_EXPENSE)
+        self.assertEqual(len(pivot[1]), len(Expense.EXPENSE_TYPE_CHOICES))
+
+    def test_chart_endpoints_use_constant_queries(self):
+        for kind in ('expense', 'income'):
+            with self.subTest(kind=kind):
+                cache.clear()
+                # session + user + data version + pivot
+                with self.assertNumQueries(4):
+                    response = self.client.get(reverse('finance:chart_data', args=[kind]), {'period': '12'})
+                self.assertEqual(response.status_code, 200)
+
+
+class VersionedCacheTests(FinanceTestCase):
+    def test_writes_bump_the_version(self):
+        version, _ = data_version(self.user)
+        goal = SavingsGoal.objects.get(user=self.user)
+        goal.current_amount += 1
+        goal.save()
+        Expense.objects.filter(user=self.user).first().delete()
+        self.assertEqual(data_version(self.user)[0], version + 2)
+        self.assertEqual(data_version(self.other)[0], 1)
+
+    def test_dashboard_served_from_cache_until_next_write(self):
+        self.client.get(reverse('finance:dashboard'))
+        # session + user + data version
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('finance:dashboard'))
+        self.assertEqual(response.context['total_income'], Decimal('6950.50'))
+
+        Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('49.50'),
+                              date_received=date.today())
+        response = self.client.get(reverse('finance:dashboard'))
+        self.assertEqual(response.context['total_income'], Decimal('7000.00'))
+
+    def test_keys_are_per_user_and_version(self):
+        mine, theirs = VersionedCache(self.user), VersionedCache(self.other)
+        self.assertNotEqual(mine.key('summary'), theirs.key('summary'))
+        mine.get_or_set('answer', lambda: 42)
+        self.assertEqual(mine.get_or_set('answer', lambda: 0), 42)
+        self.assertEqual(theirs.get_or_set('answer', lambda: 0), 0)
+
+
+class KeysetPaginationTests(FinanceTestCase):
+    def walk(self, url, context_key, page_size=2):
+        seen, cursor, pages = [], None, []
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['after'] = cursor
+            page = self.client.get(url, params).context[context_key]
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next:
+                return seen, pages
+            cursor = page.next_cursor
+
+    def test_income_pages_cover_every_row_once(self):
+        for i in range(5):
+            Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('1'),
+                                  date_received=date(2024, 1, 1))
+        seen, pages = self.walk(reverse('finance:income'), 'incomes')
+        ids = [income.pk for income in seen]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), set(Income.objects.filter(user=self.user).values_list('pk', flat=True)))
+
+        # Walking back from the last page returns the previous page's rows.
+        back = self.client.get(reverse('finance:income'),
+                               {'page_size': 2, 'before': pages[-1].prev_cursor}).context['incomes']
+        self.assertEqual([i.pk for i in back], [i.pk for i in pages[-2]])
+
+    def test_transactions_page_merges_sources_and_keeps_full_totals(self):
+        seen, pages = self.walk(reverse('finance:transactions'), 'page', page_size=3)
+        self.assertEqual(len(seen), 3 + 3 + 1)
+        dates = [row['ledger_date'] for row in seen]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        back = self.client.get(reverse('finance:transactions'),
+                               {'page_size': 3, 'before': pages[-1].prev_cursor}).context['page']
+        self.assertEqual(list(back), list(pages[-2]))
+        response = self.client.get(reverse('finance:transactions'), {'page_size': 1})
+        self.assertEqual(len(response.context['transactions']), 1)
+        self.assertEqual(response.context['income_total'], Decimal('6950.50'))
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('finance:expense'), {'after': 'garbage'})
+        self.assertEqual(len(response.context['expenses']), 3)
+
+
+class AdminChangeListTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser(username='root', email='root@example.com', password='pw')
+        self.client.force_login(self.admin_user)
+
+    @override_settings(FINANCE_ADMIN_COUNT_CAP=3)
+    def test_changelists_use_indexes_and_capped_counts(self):
+        SavingsContribution.objects.create(user=self.user, goal=SavingsGoal.objects.first(), amount=Decimal('5'))
+        SavingsContribution.objects.create(user=self.user, goal=SavingsGoal.objects.first(), amount=Decimal('6'))
+        for model in (Income, Expense, SavingsGoal, SavingsContribution):
+            model_admin = admin.site._registry[model]
+            url = reverse(f'admin:finance_{model._meta.model_name}_changelist')
+            # Tiny pages, so the test tables span several of them.
+            with self.subTest(model=model.__name__), CaptureQueriesContext(connection) as queries, \
+                    mock.patch.object(model_admin, 'list_per_page', 1), \
+                    mock.patch.object(model_admin, 'list_max_show_all', 2):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                checked = [query['sql'] for query in queries.captured_queries
+                           if query['sql'].startswith('SELECT') and 'finance_' in query['sql']]
+                counts = [sql for sql in checked if sql.startswith('SELECT COUNT(*)')]
+                # One count, over a LIMITed subquery, and no second full count.
+                self.assertEqual(len(counts), 1)
+                self.assertIn('LIMIT 3', counts[0])
+                for sql in checked:
+                    if sql not in counts:
+                        # Walking the date index in order stops at the page's LIMIT.
+                        self.assertEqual([problem for problem in plan_problems(sql) if 'USING INDEX' not in problem],
+                                         [], sql)
+        model_admin = admin.site._registry[Income]
+        with mock.patch.object(model_admin, 'list_per_page', 1), mock.patch.object(model_admin, 'list_max_show_all', 1):
+            response = self.client.get(reverse('admin:finance_income_changelist'))
+        # Four rows, but nothing past the cap is counted.
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_date_hierarchy_matches_distinct_dates(self):
+        queryset = self.admin_queryset(Expense)
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(list(queryset.dates('date_incurred', kind)),
+                                 list(Expense.objects.dates('date_incurred', kind)))
+                self.assertEqual(list(queryset.dates('date_incurred', kind, order='DESC')),
+                                 list(Expense.objects.dates('date_incurred', kind, order='DESC')))
+        first = Expense.objects.order_by('date_incurred').first().date_incurred
+        response = self.client.get(reverse('admin:finance_expense_changelist'),
+                                   {'date_incurred__year': first.year, 'date_incurred__month': first.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(expense.date_incurred.month == first.month for expense in response.context['cl'].result_list))
+
+    @staticmethod
+    def admin_queryset(model):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(username='root')
+        return admin.site._registry[model].get_queryset(request)
+
+    def test_export_streams_filtered_changelist(self):
+        response = self.client.get(reverse('admin:finance_expense_export'), {'expense_type__exact': 'FOOD'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user__username,expense_type,amount,date_incurred,source,description')
+        self.assertEqual(sorted(line.split(',')[3] for line in lines[1:]), ['300.25', '99.75'])
+
+        staff = User.objects.create_user(username='carol', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('admin:finance_income_export')).status_code, 403)
+
+
+def plan_problems(sql):
+    """Return the plan steps of ``sql`` that scan a whole finance table or sort rows.
+
+    Uses ``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN (FORMAT JSON)`` on
+    PostgreSQL (with sequential scans discouraged, since test tables are tiny);
+    other backends are not checked. The one sort allowed is the merge of the
+    LIMITed branches built by ``union_all_sql``, at most a page per branch.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return sqlite_plan_problems([row[3] for row in cursor.fetchall()])
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            return postgres_plan_problems(cursor.fetchone()[0][0]['Plan'])
+    return []
+
+
+def sqlite_plan_problems(details):
+    problems, source = [], ''
+    for detail in details:
+        words = detail.split()
+        if words[0] in ('SCAN', 'SEARCH'):
+            source = words[1]
+            # A full-text MATCH scans the FTS index itself, not the table.
+            if words[0] == 'SCAN' and source.startswith('finance_') and 'VIRTUAL TABLE INDEX' not in detail:
+                problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE') and not (
+                detail.endswith('FOR ORDER BY') and source.startswith('branch_')):
+            problems.append(f'{detail} ({source})')
+    return problems
+
+
+def postgres_plan_problems(node):
+    problems = []
+    if node['Node Type'] == 'Seq Scan' and node['Relation Name'].startswith('finance_'):
+        problems.append(f"Seq Scan on {node['Relation Name']}")
+    for child in node.get('Plans', []):
+        if node['Node Type'] in ('Sort', 'Incremental Sort') and not child.get('Alias', '').startswith('branch_'):
+            problems.append(f"{node['Node Type']} over {child.get('Relation Name') or child['Node Type']}")
+        problems += postgres_plan_problems(child)
+    return problems
+
+
+class QueryPlanTests(FinanceTestCase):
+    def test_view_queries_use_indexes(self):
+        cursor = f'{date.today().isoformat()}_income_1'
+        urls = [reverse(name) for name in (
+            'finance:dashboard', 'finance:income', 'finance:expense', 'finance:savings', 'finance:transactions',
+            'finance:download_expenses', 'finance:download_income', 'finance:download_savings',
+            'finance:download_transactions', 'finance:budgets',
+        )]
+        urls += [reverse('finance:chart_data', args=[kind]) + '?period=3' for kind in ('income', 'expense', 'savings')]
+        urls.append(reverse('finance:forecast'))
+        urls.append(reverse('finance:totals') + '?group=month&compare=year')
+        urls += [
+            reverse('finance:income') + f'?after={date.today().isoformat()}_1',
+            reverse('finance:transactions') + f'?after={cursor}',
+            reverse('finance:transactions') + f'?before={cursor}&type=income',
+        ]
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                checked = [query['sql'] for query in queries.captured_queries
+                           if query['sql'].startswith('SELECT') and 'finance_' in query['sql']]
+                self.assertTrue(checked)
+                for sql in checked:
+                    self.assertEqual(plan_problems(sql), [], sql)
+
+
+    def test_category_filters_use_the_category_index(self):
+        today = date.today()
+        for model, index in ((Income, 'finance_income_user_type_idx'), (Expense, 'finance_expense_user_type_idx')):
+            _, category_field, date_field = bulk.fields(model)
+            rows = (bulk.select(self.user, model, category='FOOD' if model is Expense else 'SALARY',
+                                start=today - timedelta(days=90), end=today)
+                    .order_by(f'-{date_field}', '-id')[:50])
+            with CaptureQueriesContext(connection) as queries:
+                list(rows)
+            sql = queries.captured_queries[0]['sql']
+            with self.subTest(model=model.__name__):
+                self.assertEqual(plan_problems(sql), [], sql)
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        self.assertIn(index, ' '.join(row[3] for row in cursor.fetchall()))
+
+    def test_plan_check_flags_sorts(self):
+        self.assertEqual(sqlite_plan_problems(['SEARCH finance_expense USING INDEX x (user_id=?)',
+                                               'USE TEMP B-TREE FOR ORDER BY']),
+                         ['USE TEMP B-TREE FOR ORDER BY (finance_expense)'])
+        self.assertEqual(sqlite_plan_problems(['SCAN branch_0', 'USE TEMP B-TREE FOR ORDER BY']), [])
+        self.assertEqual(len(sqlite_plan_problems(['SCAN (subquery-1)', 'USE TEMP B-TREE FOR GROUP BY'])), 1)
+
+
+class LedgerTests(FinanceTestCase):
+    def test_ledger_is_one_ordered_query(self):
+        with self.assertNumQueries(1):
+            rows = list(ledger(self.user))
+        self.assertEqual(len(rows), 7)
+        keys = [(r['ledger_date'], r['rank'], r['id']) for r in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(sum(r['signed_amount'] for r in rows if r['kind'] == 'expense'), Decimal('-2400.00'))
+
+    def test_type_filter_is_applied_in_sql(self):
+        response = self.client.get(reverse('finance:transactions'), {'type': 'expense'})
+        self.assertEqual({t.type for t in response.context['transactions']}, {'expense'})
+        self.assertEqual(len(response.context['transactions']), 3)
+
+    def test_rows_are_ledger_rows_with_display_labels(self):
+        rows = self.client.get(reverse('finance:transactions')).context['transactions']
+        self.assertTrue(all(isinstance(row, LedgerRow) for row in rows))
+        self.assertEqual({(row.type, row.description if row.type == 'income' else row.category) for row in rows},
+                         {('savings', 'Savings'), ('income', 'Salary'), ('income', 'Freelance'), ('income', 'Rental'),
+                          ('expense', 'Food'), ('expense', 'Housing')})
+
+        response = self.client.get(reverse('finance:download_transactions'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1:], [','.join(map(str, row)) for row in rows])
+
+    def test_download_follows_ledger_order(self):
+        response = self.client.get(reverse('finance:download_transactions'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Type,Amount,Description,Category,Date')
+        exported = [line.split(',')[0] for line in lines[1:]]
+        self.assertEqual(exported, [row['kind'] for row in ledger(self.user)])
+
+
+def measure(func):
+    """Return ``(result, seconds, peak_bytes)`` for one call of ``func``."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func()
+        return result, time.perf_counter() - started, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class ChartEndpointTests(FinanceTestCase):
+    def get(self, kind, period='all', **headers):
+        return self.client.get(reverse('finance:chart_data', args=[kind]), {'period': period}, headers=headers)
+
+    def test_series_payload(self):
+        data = self.get('expense').json()
+        self.assertEqual(data['labels'], ['Food', 'Housing'])
+        # Money goes out as exact strings, never as binary floats.
+        self.assertEqual(data['totals'], ['400.00', '2000.00'])
+        self.assertEqual(self.get('income', '1').json()['totals'][0], '5000.00')
+        self.assertEqual(self.get('savings').json(), {'kind': 'savings', 'period': 'all',
+                                                      'labels': ['Car'], 'totals': ['2500.00']})
+
+    def test_unchanged_data_revalidates_with_304(self):
+        first = self.get('income')
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+        # session + user + data version
+        with self.assertNumQueries(3):
+            again = self.get('income', **{'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+        Income.objects.create(user=self.user, income_type='SALARY', amount=Decimal('1'), date_received=date.today())
+        changed = self.get('income', **{'If-None-Match': first['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_unknown_kind_or_period(self):
+        self.assertEqual(self.get('income', '7').status_code, 400)
+        self.assertEqual(self.get('budget').status_code, 400)
+
+    def test_html_pages_no_longer_embed_series(self):
+        for name in ('finance:income', 'finance:expense', 'finance:savings'):
+            response = self.client.get(reverse(name))
+            self.assertNotIn('totals_1m_json', response.context)
+            self.assertContains(response, reverse('finance:chart_data', args=[name.split(':')[1]]))
+
+
+class ForecastTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        SavingsGoal.objects.create(user=self.user, goal_name='Trip', target_amount=Decimal('900'),
+                                   current_amount=Decimal('900'), target_date=self.today + timedelta(days=30))
+        SavingsGoal.objects.create(user=self.user, goal_name='Bike', target_amount=Decimal('1200'),
+                                   target_date=self.today - timedelta(days=10))
+
+    def test_goal_projections(self):
+        # rollup history, goals, contributions, balance
+        with self.assertNumQueries(4):
+            data = forecasting.forecast(self.user, today=self.today)
+        goals = data['goals']
+        self.assertEqual(goals['names'], ['Car', 'Trip', 'Bike'])
+        self.assertEqual(goals['status'], ['behind', 'reached', 'stalled'])
+        self.assertEqual(goals['progress'], [25.0, 100.0, 0.0])
+        # The opening 2500 spread over the 12-month window.
+        self.assertEqual(goals['monthly_rate'], [208.33, 900 / 12, 0.0])
+        months_left = 365 / forecasting.DAYS_PER_MONTH
+        self.assertEqual(goals['required_monthly'], [round(7500 / months_left, 2), 0.0, 1200.0])
+        days = math.ceil(7500 / (2500 / 12) * forecasting.DAYS_PER_MONTH)
+        self.assertEqual(goals['projected_completion'],
+                         [(self.today + timedelta(days=days)).isoformat(), self.today.isoformat(), None])
+
+    def test_balance_curve(self):
+        data = forecasting.forecast(self.user, today=self.today)
+        rate = data['run_rate']
+        self.assertEqual((rate['income'], rate['expense']), (round(6950.5 / 12, 2), 200.0))
+        self.assertEqual(rate['savings'], round(3400 / 12, 2))
+        curve = data['balance_curve']
+        self.assertEqual(len(curve['labels']), 13)
+        net = float(FinanceSummary(self.user).net_balance)
+        self.assertEqual(curve['run_rate'][0], net)
+        # A year of income minus expenses minus deposits at the window's averages.
+        self.assertAlmostEqual(curve['run_rate'][12] - net, 6950.5 - 2400 - 3400, places=1)
+        # The overdue Bike is funded in the first month; Car every month until its target date.
+        car = data['goals']['required_monthly'][0]
+        cash_flow = 6950.5 / 12 - 200
+        self.assertAlmostEqual(curve['with_goals'][1], net + cash_flow - car - 1200, places=1)
+        self.assertAlmostEqual(curve['with_goals'][2] - curve['with_goals'][1], cash_flow - car, places=1)
+
+    def test_future_dated_rows_are_outside_the_window(self):
+        Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('500'),
+                              date_received=self.today + timedelta(days=70))
+        data = forecasting.forecast(self.user, today=self.today)
+        self.assertEqual(data['run_rate']['income'], round(6950.5 / 12, 2))
+        self.assertEqual(self.client.get(reverse('finance:forecast')).status_code, 200)
+
+    def test_hundreds_of_goals_cost_the_same_queries(self):
+        SavingsGoal.objects.bulk_create(
+            SavingsGoal(user=self.user, goal_name=f'Goal {i}', target_amount=Decimal(1000 + i),
+                        current_amount=Decimal(i), target_date=self.today + timedelta(days=i))
+            for i in range(500)
+        )
+        with self.assertNumQueries(4):
+            data = forecasting.forecast(self.user, today=self.today)
+        self.assertEqual(len(data['goals']['status']), 503)
+
+    def test_endpoint_is_cached_per_data_version(self):
+        url = reverse('finance:forecast')
+        first = self.client.get(url)
+        self.assertEqual(first.json()['goals']['names'], ['Car', 'Trip', 'Bike'])
+        # session + user + data version; the forecast itself comes from the cache
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).json(), first.json())
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 304)
+
+        SavingsGoal.objects.get(goal_name='Bike').contribute(Decimal('100'))
+        changed = self.client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(changed.json()['goals']['status'][2], 'behind')
+
+
+class AsyncViewTests(FinanceTestCase):
+    def request(self, path, **headers):
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        return request
+
+    def test_dashboard_matches_sync_view(self):
+        def figures(html):
+            return re.findall(r'₹[\d,.]+', html)
+
+        sync_html = self.client.get(reverse('finance:dashboard')).content.decode()
+        response = async_to_sync(async_views.dashboard)(self.request('/finance/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('₹6,950.5', figures(sync_html))
+        self.assertEqual(figures(response.content.decode()), figures(sync_html))
+
+    @override_settings(FINANCE_ASYNC_PARALLEL_QUERIES=True)
+    def test_parallel_queries_close_their_connections(self):
+        def failing():
+            raise ValueError('boom')
+
+        with mock.patch.object(aio.connections, 'close_all') as close_all:
+            self.assertEqual(async_to_sync(aio.run_queries)(lambda: 1, lambda: 2), [1, 2])
+            self.assertEqual(close_all.call_count, 2)
+            with self.assertRaises(ValueError):
+                async_to_sync(aio.run_queries)(failing)
+            self.assertEqual(close_all.call_count, 3)
+
+    def test_summary_aload_fills_both_halves(self):
+        summary = FinanceSummary(self.user)
+        with self.assertNumQueries(4):
+            async_to_sync(summary.aload)()
+        with self.assertNumQueries(0):
+            self.assertEqual(summary.total_income, Decimal('6950.50'))
+            self.assertEqual([goal.goal_name for goal in summary.savings_goals], ['Car'])
+            self.assertEqual(summary.budgets, [])
+
+    async def test_chart_endpoint_and_revalidation(self):
+        first = await async_views.chart_data(self.request('/', period='all'), 'expense')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(first.content)['totals'], ['400.00', '2000.00'])
+        again = await async_views.chart_data(self.request('/', **{'If-None-Match': first['ETag']}), 'expense')
+        self.assertEqual(again.status_code, 304)
+        bad = await async_views.chart_data(self.request('/'), 'budget')
+        self.assertEqual(bad.status_code, 400)
+
+
+@modify_settings(MIDDLEWARE={'append': 'finance.metrics.MetricsMiddleware'})
+class MetricsTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+
+    def scrape(self, path='/metrics'):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_latency_queries_and_templates_per_view(self):
+        self.client.get(reverse('finance:dashboard'))
+        self.client.get(reverse('finance:dashboard'))
+        text = self.scrape()
+        self.assertIn('# TYPE finance_request_duration_seconds histogram', text)
+        self.assertIn('finance_request_duration_seconds_count{view="finance:dashboard"} 2', text)
+        self.assertIn('finance_request_queries_bucket{view="finance:dashboard",le="+Inf"} 2', text)
+        template_time = re.search(r'finance_template_render_seconds_total\{view="finance:dashboard"\} (\S+)', text)
+        self.assertGreater(float(template_time.group(1)), 0)
+
+    def test_streamed_export_is_recorded_after_the_body(self):
+        response = self.client.get(reverse('finance:download_transactions'))
+        self.assertNotIn('finance:download_transactions', metrics.registry.render())
+        b''.join(response.streaming_content)
+        text = self.scrape()
+        self.assertRegex(text, r'finance_request_queries_sum\{view="finance:download_transactions"\} [1-9]')
+
+    def test_metrics_are_staff_only(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('unresolved', self.scrape())
+
+    @override_settings(FINANCE_METRICS_PATH='/internal/metrics')
+    def test_metrics_path_setting(self):
+        self.assertIn('# TYPE', self.scrape('/internal/metrics'))
+
+    def test_query_budget_warning(self):
+        with override_settings(FINANCE_QUERY_BUDGET=1), self.assertLogs('finance.metrics', 'WARNING') as logs:
+            self.client.get(reverse('finance:expense'))
+        self.assertIn('finance:expense ran', logs.output[0])
+        with self.assertNoLogs('finance.metrics', 'WARNING'):
+            self.client.get(reverse('finance:expense'))
+
+
+class CsvImportTests(FinanceTestCase):
+    EXPENSES = (
+        'Category,Amount,Date,Source,Description\n'
+        'Food,12.50,2024-02-03,Cash,Lunch\n'
+        'TRANSPORT,30,2024-02-04,Bank Account,\n'
+        'Food,-5,2024-02-05,Cash,Negative\n'
+        'Gadgets,5,2024-02-05,Cash,Unknown category\n'
+        'Food,12.50,2024-02-03,Cash,Lunch\n'
+    )
+
+    def test_import_validates_dedupes_and_updates_rollup(self):
+        result = import_csv(self.user, 'expense', StringIO(self.EXPENSES), batch_size=2)
+        # The two identical lunches are two purchases; only stored rows count as duplicates.
+        self.assertEqual((result.rows, result.created, result.duplicates), (5, 3, 0))
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        self.assertIn('amount', result.errors[0][1])
+        rollup = MonthlyCategoryTotal.objects.get(user=self.user, kind='EXPENSE', category='TRANSPORT',
+                                                  month=date(2024, 2, 1))
+        self.assertEqual((rollup.total, rollup.count), (Decimal('30.00'), 1))
+
+        again = import_csv(self.user, 'expense', StringIO(self.EXPENSES))
+        self.assertEqual((again.created, again.duplicates), (0, 3))
+        third = import_csv(self.user, 'expense', StringIO(self.EXPENSES + 'Food,12.50,2024-02-03,Cash,Lunch\n'))
+        self.assertEqual((third.created, third.duplicates), (1, 3))
+        self.assertEqual(Expense.objects.filter(user=self.user, description='Lunch').count(), 3)
+
+    def test_stored_rows_are_read_for_the_file_dates_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            import_csv(self.user, 'expense', StringIO(self.EXPENSES), dry_run=True)
+        (lookup,) = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertIn('"date_incurred" IN', lookup)
+        self.assertNotIn('"id"', lookup.split(' FROM ')[0])
+
+    def test_export_round_trips_as_duplicates(self):
+        response = self.client.get(reverse('finance:download_income'))
+        exported = b''.join(response.streaming_content).decode()
+        result = import_csv(self.user, 'income', StringIO(exported))
+        self.assertEqual((result.created, result.duplicates, result.errors), (0, 3, []))
+
+    def test_command_reports_errors_and_rate(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'expenses.csv')
+        with open(path, 'w') as handle:
+            handle.write(self.EXPENSES)
+        out, err = StringIO(), StringIO()
+        call_command('import_transactions', path, user='alice', kind='expense', stdout=out, stderr=err)
+        self.assertIn('3 created', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('line 4:', err.getvalue())
+
+    def test_upload_endpoint(self):
+        response = self.client.get(reverse('finance:import_transactions'), follow=True)
+        self.assertEqual([str(message) for message in response.context['messages']], [])
+
+        upload = SimpleUploadedFile('income.csv', b'Type,Amount,Date,Description\nSalary,100,2024-01-31,Jan\n')
+        response = self.client.post(reverse('finance:import_transactions'), {'kind': 'income', 'file': upload})
+        self.assertRedirects(response, reverse('finance:income'), fetch_redirect_response=False)
+        self.assertTrue(Income.objects.filter(user=self.user, date_received=date(2024, 1, 31)).exists())
+
+    def test_unreadable_files_are_reported(self):
+        latin1 = 'Type,Amount,Date,Description\nSalary,100,2024-03-31,Caf\xe9\n'.encode('latin-1')
+        count = Income.objects.count()
+        response = self.client.post(reverse('finance:import_transactions'),
+                                    {'kind': 'income', 'file': SimpleUploadedFile('bank.csv', latin1)}, follow=True)
+        self.assertRedirects(response, reverse('finance:income'))
+        self.assertEqual([str(message) for message in response.context['messages']],
+                         ["The file is not UTF-8 text. Save it as CSV (UTF-8) and import it again."])
+        self.assertEqual(Income.objects.count(), count)
+
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'bank.csv')
+        with open(path, 'wb') as handle:
+            handle.write(latin1)
+        with self.assertRaisesMessage(CommandError, 'not UTF-8'):
+            call_command('import_transactions', path, user='alice', kind='income', stdout=StringIO())
+        with open(path, 'w') as handle:
+            handle.write('Type,Amount,Date,Description\nSalary,100,2024-03-31,' + 'x' * (csv.field_size_limit() + 1))
+        with self.assertRaisesMessage(CommandError, 'not a readable CSV'):
+            call_command('import_transactions', path, user='alice', kind='income', stdout=StringIO())
+        self.assertEqual(Income.objects.count(), count)
+
+
+class BulkActionTests(FinanceTestCase):
+    def derived_state(self):
+        return (
+            sorted(MonthlyCategoryTotal.objects.values_list('user_id', 'kind', 'category', 'month', 'total', 'count')),
+            sorted(UserBalance.objects.values_list('user_id', 'total_income', 'total_expense')),
+        )
+
+    def assertDerivedStateConsistent(self):
+        incremental = self.derived_state()
+        rollups.rebuild()
+        self.assertEqual(incremental[0], self.derived_state()[0])
+        self.assertEqual(balances.reconcile_batch([self.user.pk, self.other.pk], repair=False), [])
+
+    def test_delete_selected_rows_is_scoped_to_user(self):
+        food = list(Expense.objects.filter(user=self.user, expense_type='FOOD').values_list('pk', flat=True))
+        theirs = Income.objects.get(user=self.other).pk
+        version = data_version(self.user)[0]
+        response = self.client.post(reverse('finance:bulk_expense'), {'action': 'delete', 'ids': food})
+        self.assertRedirects(response, reverse('finance:expense'), fetch_redirect_response=False)
+        self.assertEqual(list(Expense.objects.filter(user=self.user).values_list('expense_type', flat=True)),
+                         ['HOUSING'])
+        self.assertEqual(UserBalance.objects.get(user=self.user).total_expense, Decimal('2000.00'))
+        self.assertEqual(data_version(self.user)[0], version + 1)
+        self.assertDerivedStateConsistent()
+
+        self.client.post(reverse('finance:bulk_income'), {'action': 'delete', 'ids': [theirs]})
+        self.assertTrue(Income.objects.filter(pk=theirs).exists())
+
+    def test_delete_all_matching_runs_in_batches(self):
+        Expense.objects.bulk_create(
+            Expense(user=self.user, expense_type='FOOD', amount=Decimal('1.25'), source='CASH',
+                    date_incurred=date(2024, 1, day), description='Imported by mistake')
+            for day in range(1, 8)
+        )
+        Expense.objects.bulk_create([Expense(user=self.other, expense_type='FOOD', amount=Decimal('5'),
+                                             source='CASH', date_incurred=date(2024, 1, 3))])
+        rollups.rebuild()
+        balances.reconcile_batch([self.user.pk, self.other.pk])
+        rows = bulk.select(self.user, Expense, category='FOOD', start=date(2024, 1, 1), end=date(2024, 1, 31))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(bulk.delete(rows, size=3), 7)
+        deletes = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE FROM "finance_expense"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertTrue(Expense.objects.filter(user=self.other, date_incurred=date(2024, 1, 3)).exists())
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+        self.assertDerivedStateConsistent()
+
+    def test_failure_rolls_back_every_batch(self):
+        Expense.objects.bulk_create(
+            Expense(user=self.user, expense_type='FOOD', amount=Decimal('1.25'), source='CASH',
+                    date_incurred=date(2024, 1, day)) for day in range(1, 8)
+        )
+        rollups.rebuild()
+        balances.reconcile_batch([self.user.pk])
+        before = self.derived_state(), Expense.objects.count(), data_version(self.user)[0]
+        rows = bulk.select(self.user, Expense, category='FOOD')
+        # The first batch succeeds; the second fails part-way.
+        with mock.patch.object(bulk, 'bump_data_version', side_effect=[None, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                bulk.delete(rows, size=3)
+        self.assertEqual((self.derived_state(), Expense.objects.count(), data_version(self.user)[0]), before)
+
+        with mock.patch.object(bulk, 'bump_data_version', side_effect=[None, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                bulk.recategorize(rows, 'OTHER', size=3)
+        self.assertFalse(Expense.objects.filter(expense_type='OTHER').exists())
+        self.assertEqual(self.derived_state(), before[0])
+
+    def test_delete_matching_description(self):
+        Income.objects.create(user=self.user, income_type='OTHER', amount=Decimal('10'),
+                              date_received=date.today(), description='Duplicate bank import')
+        response = self.client.post(reverse('finance:bulk_income'), {
+            'action': 'delete', 'all_matching': 'on', 'q': 'duplicate import',
+        })
+        self.assertRedirects(response, reverse('finance:income'), fetch_redirect_response=False)
+        self.assertFalse(Income.objects.filter(description__contains='Duplicate').exists())
+        self.assertEqual(Income.objects.filter(user=self.user).count(), 3)
+        self.assertDerivedStateConsistent()
+
+    def test_recategorize_moves_rollups_and_keeps_balance(self):
+        ids = list(Expense.objects.filter(user=self.user).values_list('pk', flat=True))
+        balance = UserBalance.objects.get(user=self.user).total_expense
+        response = self.client.post(reverse('finance:bulk_expense'), {
+            'action': 'recategorize', 'category': 'HOUSING', 'ids': ids,
+        })
+        self.assertRedirects(response, reverse('finance:expense'), fetch_redirect_response=False)
+        self.assertEqual(set(Expense.objects.filter(user=self.user).values_list('expense_type', flat=True)),
+                         {'HOUSING'})
+        self.assertFalse(MonthlyCategoryTotal.objects.filter(user=self.user, category='FOOD').exists())
+        self.assertEqual(UserBalance.objects.get(user=self.user).total_expense, balance)
+        self.assertDerivedStateConsistent()
+        # Already in the target category: nothing to move.
+        self.assertEqual(bulk.recategorize(bulk.select(self.user, Expense, ids=ids), 'HOUSING'), 0)
+
+    def test_invalid_request_changes_nothing(self):
+        ids = list(Expense.objects.filter(user=self.user).values_list('pk', flat=True))
+        before = self.derived_state()
+        self.client.post(reverse('finance:bulk_expense'), {'action': 'recategorize', 'ids': ids})
+        self.client.post(reverse('finance:bulk_expense'), {'action': 'delete'})
+        self.client.post(reverse('finance:bulk_expense'), {'action': 'delete', 'ids': ['x']})
+        self.assertEqual(self.client.get(reverse('finance:bulk_expense')).status_code, 405)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.derived_state(), before)
+
+    def test_pages_render_bulk_controls(self):
+        response = self.client.get(reverse('finance:expense'))
+        self.assertContains(response, f'action="{reverse("finance:bulk_expense")}"')
+        self.assertContains(response, 'name="ids"', count=3)
+
+    def test_delete_savings_requires_post(self):
+        goal = SavingsGoal.objects.get(user=self.user)
+        response = self.client.get(reverse('finance:delete_savings', args=[goal.pk]))
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(SavingsGoal.objects.filter(pk=goal.pk).exists())
+        self.client.post(reverse('finance:delete_savings', args=[goal.pk]))
+        self.assertFalse(SavingsGoal.objects.filter(pk=goal.pk).exists())
+
+
+class StreamingExportTests(FinanceTestCase):
+    EXPORTS = ['download_expenses', 'download_income', 'download_savings', 'download_transactions']
+
+    def consume(self, name):
+        response = self.client.get(reverse(f'finance:{name}'))
+        self.assertTrue(response.streaming)
+        lines = 0
+        for chunk in response.streaming_content:
+            lines += chunk.count(b'\n')
+        return lines
+
+    def add_rows(self, count):
+        Income.objects.bulk_create(
+            Income(user=self.user, income_type='OTHER', amount=Decimal('1.00'), date_received=date(2023, 1, 1))
+            for _ in range(count)
+        )
+        Expense.objects.bulk_create(
+            Expense(user=self.user, expense_type='FOOD', amount=Decimal('1.00'), source='CASH',
+                    date_incurred=date(2023, 1, 1), description='x' * 40)
+            for _ in range(count)
+        )
+
+    def test_exports_keep_existing_layout(self):
+        response = self.client.get(reverse('finance:download_expenses'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Category,Amount,Date,Source,Description')
+        self.assertIn('Food,300.25,', lines[1])
+        self.assertIn(',Bank Account,', lines[1])
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.csv"')
+
+    @override_settings(FINANCE_EXPORT_CHUNK_SIZE=100)
+    def test_peak_memory_does_not_grow_with_rows(self):
+        self.add_rows(300)
+        small = {name: measure(lambda: self.consume(name))[2] for name in self.EXPORTS}
+        self.add_rows(2700)
+        for name in self.EXPORTS:
+            with self.subTest(export=name):
+                lines, _, peak = measure(lambda: self.consume(name))
+                self.assertGreater(lines, 1)
+                # 10x the rows may not cost more than a small constant on top.
+                self.assertLess(peak, small[name] * 1.5 + 256 * 1024)
+
+
+class BenchmarkCommandTests(TestCase):
+    def seed(self, **options):
+        call_command('seed_finance', rows=20, goals=3, end=date(2024, 6, 30), stdout=StringIO(), **options)
+
+    def test_seed_is_deterministic(self):
+        self.seed(users=2)
+        first = list(Expense.objects.order_by('user__username', 'id')
+                     .values_list('user__username', 'expense_type', 'amount', 'date_incurred'))
+        self.assertEqual(len(first), 40)
+        self.assertEqual(MonthlyCategoryTotal.objects.filter(user__username='bench0', kind='EXPENSE')
+                         .aggregate(n=Sum('count'))['n'], 20)
+        with self.assertRaises(CommandError):
+            self.seed(users=2)
+        self.seed(users=2, replace=True)
+        again = list(Expense.objects.order_by('user__username', 'id')
+                     .values_list('user__username', 'expense_type', 'amount', 'date_incurred'))
+        self.assertEqual(again, first)
+
+    def test_bench_reports_and_compares_to_baseline(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            call_command('bench_finance', repeat=2, warmup=0, views=['finance:dashboard', 'finance:download_income'],
+                         baseline=Path(baseline), write_baseline=True, stdout=StringIO(), stderr=StringIO())
+            with open(baseline) as handle:
+                recorded = json.load(handle)
+            self.assertEqual(recorded['rows'], {'income': 20, 'expense': 20, 'savings': 3})
+            self.assertEqual(set(recorded['views']['finance:dashboard']), {'p50_ms', 'p95_ms', 'queries', 'peak_kib'})
+
+            recorded['views']['finance:dashboard']['queries'] -= 1
+            with open(baseline, 'w') as handle:
+                json.dump(recorded, handle)
+            err = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('bench_finance', repeat=2, warmup=0, views=['finance:dashboard'],
+                             baseline=Path(baseline), margin=100, stdout=StringIO(), stderr=err)
+            self.assertIn('finance:dashboard queries', err.getvalue())
+
+
+@skipUnless(os.environ.get('FINANCE_BENCHMARKS'), "set FINANCE_BENCHMARKS=1 to run benchmarks")
+class LedgerBenchmark(TestCase):
+    ROWS = int(os.environ.get('FINANCE_BENCHMARK_ROWS', 100_000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bench', email='bench@example.com', password='pw')
+        start = date(2015, 1, 1)
+        Income.objects.bulk_create(
+            (Income(user=cls.user, income_type='SALARY', amount=Decimal('100.00'),
+                    date_received=start + timedelta(days=i % 3650)) for i in range(cls.ROWS // 2)),
+            batch_size=5000,
+        )
+        Expense.objects.bulk_create(
+            (Expense(user=cls.user, expense_type='FOOD', amount=Decimal('10.00'), source='CASH',
+                     date_incurred=start + timedelta(days=i % 3650)) for i in range(cls.ROWS // 2)),
+            batch_size=5000,
+        )
+
+    def test_ledger_page_vs_python_merge(self):
+        def python_merge():
+            rows = [{'date': i.date_received, 'amount': i.amount} for i in Income.objects.filter(user=self.user)]
+            rows += [{'date': e.date_incurred, 'amount': -e.amount} for e in Expense.objects.filter(user=self.user)]
+            rows.sort(key=lambda r: r['date'], reverse=True)
+            return rows[:50]
+
+        def ledger_page():
+            request = RequestFactory().get('/', {'page_size': 50})
+            return list(union_keyset_paginate(ledger_branches(self.user), LEDGER_FIELDS, request))
+
+        _, merge_s, merge_peak = measure(python_merge)
+        _, page_s, page_peak = measure(ledger_page)
+        print(f"\n{self.ROWS} rows: python merge {merge_s * 1000:.0f} ms / {merge_peak / 2**20:.1f} MiB, "
+              f"ledger page {page_s * 1000:.0f} ms / {page_peak / 2**20:.1f} MiB")
+        self.assertLess(page_peak, merge_peak)
+
+    def test_ledger_row_memory(self):
+        def dict_rows():
+            # The shape the transactions view used to build for every row.
+            return [{'type': row['kind'], 'amount': row['signed_amount'], 'description': row['label'],
+                     'category': row['category'], 'date': row['ledger_date'],
+                     'display_date': row['ledger_date'].strftime('%b %d, %Y')} for row in ledger(self.user).iterator()]
+
+        def tuple_rows():
+            return [ledger_row(row) for row in ledger(self.user).iterator()]
+
+        dicts, dict_s, dict_peak = measure(dict_rows)
+        rows, rows_s, rows_peak = measure(tuple_rows)
+        print(f"\n{len(rows)} rows: dicts {dict_s * 1000:.0f} ms / {dict_peak / 2**20:.1f} MiB, "
+              f"LedgerRow {rows_s * 1000:.0f} ms / {rows_peak / 2**20:.1f} MiB")
+        self.assertEqual(len(dicts), len(rows))
+        self.assertLess(rows_peak, dict_peak)
+
+
+@skipUnless(os.environ.get('FINANCE_BENCHMARKS'), "set FINANCE_BENCHMARKS=1 to run benchmarks")
+class MoneyBenchmark(TestCase):
+    ROWS = int(os.environ.get('FINANCE_BENCHMARK_ROWS', 100_000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bench', email='bench@example.com', password='pw')
+        Expense.objects.bulk_create(
+            (Expense(user=cls.user, expense_type='FOOD', amount=Decimal(i % 10_000) / 100 + 1, source='CASH',
+                     date_incurred=date(2015, 1, 1) + timedelta(days=i % 3650)) for i in range(cls.ROWS)),
+            batch_size=5000,
+        )
+
+    def test_aggregate_and_export_throughput(self):
+        expenses = Expense.objects.filter(user=self.user).order_by()
+
+        def decimal_rows():
+            # The old path: a Decimal per row, then float() for the CSV.
+            return [float(amount) for amount in expenses.values_list('amount', flat=True).iterator()]
+
+        def minor_rows():
+            return [format_minor(amount) for amount in expenses.values_list(minor('amount'), flat=True).iterator()]
+
+        def decimal_sum():
+            return sum(expenses.values_list('amount', flat=True))
+
+        def database_sum():
+            return expenses.aggregate(total=Sum('amount'))['total']
+
+        def best_of_three(func):
+            # Plain wall time: tracemalloc in measure() would dwarf per-row costs.
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                result = func()
+                timings.append(time.perf_counter() - started)
+            return result, min(timings)
+
+        results = {name: best_of_three(func) for name, func in (
+            ('export, Decimal + float', decimal_rows), ('export, paise + format_minor', minor_rows),
+            ('sum in Python', decimal_sum), ('sum in the database', database_sum),
+        )}
+        print(f"\n{self.ROWS} rows: " + ', '.join(
+            f"{name} {seconds * 1000:.0f} ms" for name, (_, seconds) in results.items()))
+        self.assertEqual(results['sum in Python'][0], results['sum in the database'][0])
+        self.assertEqual(len(results['export, paise + format_minor'][0]), self.ROWS)
+        self.assertLess(results['sum in the database'][1], results['sum in Python'][1])
+
+
+@skipUnless(os.environ.get('FINANCE_BENCHMARKS'), "set FINANCE_BENCHMARKS=1 to run benchmarks")
+@override_settings(FINANCE_ASYNC_PARALLEL_QUERIES=True)
+class AsyncDashboardBenchmark(TransactionTestCase):
+    """The sync and async dashboard views against a database slowed by ``LATENCY`` per query."""
+
+    LATENCY = float(os.environ.get('FINANCE_BENCHMARK_LATENCY', 0.05))
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bench', email='bench@example.com', password='pw')
+        Income.objects.create(user=self.user, income_type='SALARY', amount=Decimal('100'), date_received=date.today())
+        Expense.objects.create(user=self.user, expense_type='FOOD', amount=Decimal('10'), source='CASH',
+                               date_incurred=date.today())
+
+        def slow(execute, sql, params, many, context):
+            time.sleep(self.LATENCY)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow)
+
+        connection_created.connect(install)
+        self.addCleanup(connection_created.disconnect, install)
+        connection.execute_wrappers.append(slow)
+        self.addCleanup(connection.execute_wrappers.remove, slow)
+
+    def test_async_view_against_sync_view(self):
+        def sync_view():
+            request = RequestFactory().get('/finance/')
+            request.user = self.user
+            return views.dashboard(request)
+
+        def async_view():
+            request = AsyncRequestFactory().get('/finance/')
+            request.user = self.user
+
+            async def auser():
+                return self.user
+            request.auser = auser
+            return async_to_sync(async_views.dashboard)(request)
+
+        def best_of_three(func):
+            timings = []
+            for _ in range(3):
+                # Every run misses the cache and pays for all its queries.
+                cache.clear()
+                started = time.perf_counter()
+                response = func()
+                timings.append(time.perf_counter() - started)
+            return response, min(timings)
+
+        sync_response, sync_s = best_of_three(sync_view)
+        async_response, async_s = best_of_three(async_view)
+        print(f"\n{self.LATENCY * 1000:.0f} ms/query: sync view {sync_s * 1000:.0f} ms, "
+              f"async view {async_s * 1000:.0f} ms")
+        self.assertEqual(async_response.content, sync_response.content)
+        # Four of the five queries overlap, saving up to three latencies;
+        # demand one so thread start-up costs cannot make this flaky.
+        self.assertLess(async_s + self.LATENCY, sync_s)
@@ -1,22 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'finance'
 
+# FINANCE_ASYNC_VIEWS swaps in the async dashboard and chart endpoint, which
+# only pay off when served over ASGI.
+live = async_views if getattr(settings, 'FINANCE_ASYNC_VIEWS', False) else views
+
 urlpatterns = [
     # Dashboard
-    path('', views.dashboard, name='dashboard'),
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('', live.dashboard, name='dashboard'),
+    path('dashboard/', live.dashboard, name='dashboard'),
 
     # Income
     path('income/', views.income, name='income'),
     path('income/<int:id>/', views.income, name='edit_income'),
     path('income/delete/<int:id>/', views.delete_income, name='delete_income'),
+    path('income/bulk/', views.bulk_income, name='bulk_income'),
 
     # Expense
     path('expense/', views.expense, name='expense'),
     path('expense/<int:edit_id>/', views.expense, name='edit_expense'),
     path('expense/delete/<int:id>/', views.delete_expense, name='delete_expense'),
+    path('expense/bulk/', views.bulk_expense, name='bulk_expense'),
+
+    # Budgets
+    path('budgets/', views.budgets, name='budgets'),
+    path('budgets/delete/<int:id>/', views.delete_budget, name='delete_budget'),
 
     # Savings
     path('savings/', views.savings, name='savings'),
@@ -29,6 +40,19 @@ urlpatterns = [
     # Transactions
     path('transactions/', views.transactions, name='transactions'),
 
+    # Chart data
+    path('api/charts/<str:kind>/', live.chart_data, name='chart_data'),
+    path('api/forecast/', views.forecast_data, name='forecast'),
+
+    # Full-text search over descriptions
+    path('api/search/', views.search_transactions, name='search'),
+
+    # Totals over any date range, from the per-user prefix sums
+    path('api/totals/', views.range_totals, name='totals'),
+
+    # Imports
+    path('import/', views.import_transactions, name='import_transactions'),
+
     # Downloads
     path('expenses/download/', views.download_expenses, name='download_expenses'),
     path('income/download/', views.download_income, name='download_income'),
@@ -3,18 +3,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
-from django.db.models import Sum, F
-from django.db.models.functions import TruncMonth
-from django.utils import timezone
-from datetime import date, datetime, timedelta
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from datetime import date
+from decimal import Decimal
+import io
 import json
-import csv
 import logging
-from django.core.serializers.json import DjangoJSONEncoder
 
-from .models import Income, Expense, SavingsGoal
-from .forms import IncomeForm, ExpenseForm, AddOrUpdateSavingsForm
+from .models import Income, Expense, SavingsGoal, Budget
+from .forms import IncomeForm, ExpenseForm, AddOrUpdateSavingsForm, ImportForm, BudgetForm, BulkActionForm
+from .services import (
+    FinanceSummary, chart_series, ledger_branches, ledger_row,
+    CHART_KINDS, CHART_PERIODS, LEDGER_FIELDS, LEDGER_KINDS,
+)
+from .cache import VersionedCache
+from .forecasting import forecast
+from . import (
+    budgets as finance_budgets, bulk, exports, prefix_sums, recurring,
+    search as finance_search,
+)
+from .importers import READ_ERRORS, import_csv, read_error_message
+from .pagination import keyset_paginate, union_keyset_paginate
 
 logger = logging.getLogger(__name__)
 
@@ -22,35 +33,19 @@ logger = logging.getLogger(__name__)
 @login_required
 def dashboard(request):
     try:
-        total_income = Income.objects.filter(user=request.user).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = Expense.objects.filter(user=request.user).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_savings = SavingsGoal.objects.filter(user=request.user).aggregate(Sum('current_amount'))['current_amount__sum'] or 0
-
-        recent_incomes = Income.objects.filter(user=request.user).order_by('-date_received')[:5]
-        recent_expenses = Expense.objects.filter(user=request.user).order_by('-date_incurred')[:5]
-        savings_goals = SavingsGoal.objects.filter(user=request.user).order_by('target_date')[:3]
-
-        income_qs = Income.objects.filter(user=request.user).annotate(
-            month=TruncMonth('date_received')
-        ).values('month').annotate(total=Sum('amount')).order_by('month')
-
-        expense_qs = Expense.objects.filter(user=request.user).annotate(
-            month=TruncMonth('date_incurred')
-        ).values('month').annotate(total=Sum('amount')).order_by('month')
-
-        income_months = [entry['month'].strftime('%b %Y') for entry in income_qs]
-        income_totals = [float(entry['total'] or 0) for entry in income_qs]
-        expense_months = [entry['month'].strftime('%b %Y') for entry in expense_qs]
-        expense_totals = [float(entry['total'] or 0) for entry in expense_qs]
+        summary = FinanceSummary(request.user, cache=VersionedCache(request.user))
+        income_months, income_totals = summary.monthly('income')
+        expense_months, expense_totals = summary.monthly('expense')
 
         context = {
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'total_savings': total_savings,
-            'net_balance': total_income - total_expense - total_savings,
-            'recent_incomes': recent_incomes,
-            'recent_expenses': recent_expenses,
-            'savings_goals': savings_goals,
+            'total_income': summary.total_income,
+            'total_expense': summary.total_expense,
+            'total_savings': summary.total_savings,
+            'net_balance': summary.net_balance,
+            'recent_incomes': summary.recent_incomes,
+            'recent_expenses': summary.recent_expenses,
+            'savings_goals': summary.savings_goals,
+            'budgets': summary.budgets,
             'income_months': json.dumps(income_months),
             'income_totals': json.dumps(income_totals),
             'expense_months': json.dumps(expense_months),
@@ -73,40 +68,24 @@ def income(request, id=None):
             new_income = form.save(commit=False)
             new_income.user = request.user
             new_income.save()
+            if form.cleaned_data['repeat'] and income_instance is None:
+                recurring.start_rule(new_income, form.cleaned_data['repeat'])
             messages.success(request, "Income saved successfully")
             return redirect('finance:income')
     else:
         form = IncomeForm(instance=income_instance)
 
-    incomes = Income.objects.filter(user=request.user).order_by('-date_received')
-    total = incomes.aggregate(total=Sum('amount'))['total'] or 0
-
-    income_types_data = [label for code, label in Income.INCOME_TYPE_CHOICES]
-    type_codes = [code for code, _ in Income.INCOME_TYPE_CHOICES]
-
-    now = datetime.now()
-    income_totals_by_period = {}
-    for months in [1, 3, 6, 12]:
-        since = now - timedelta(days=30*months)
-        filtered = incomes.filter(date_received__gte=since)
-        totals = [0] * len(income_types_data)
-        grouped = filtered.values('income_type').annotate(total=Sum('amount'))
-        for item in grouped:
-            try:
-                index = type_codes.index(item['income_type'])
-                totals[index] = float(item['total'])
-            except ValueError:
-                continue
-        income_totals_by_period[f"income_totals_{months}m_json"] = json.dumps(totals)
+    incomes = keyset_paginate(Income.objects.filter(user=request.user), 'date_received', request)
+    user_cache = VersionedCache(request.user)
+    total = FinanceSummary(request.user, cache=user_cache).total_income
 
     return render(request, 'finance/income.html', {
         'form': form,
         'incomes': incomes,
         'total_income': total,
+        'bulk_form': BulkActionForm(model=Income),
         'editing': id is not None,
         'edit_id': id,
-        'income_types_json': json.dumps(income_types_data),
-        **income_totals_by_period,
     })
 
 
@@ -130,32 +109,26 @@ def expense(request, edit_id=None):
             expense = form.save(commit=False)
             expense.user = request.user
             expense.save()
+            if form.cleaned_data['repeat'] and not editing:
+                recurring.start_rule(expense, form.cleaned_data['repeat'])
+            # One lookup of the category's spend counter, already updated by the save.
+            for budget in finance_budgets.alerts(expense):
+                messages.warning(request, finance_budgets.describe(budget, expense.date_incurred))
             return redirect('finance:expense')
     else:
         form = ExpenseForm(instance=edit_expense)
 
-    expenses = Expense.objects.filter(user=request.user).order_by('-date_incurred')
-    total_expense = expenses.aggregate(total=Sum('amount'))['total'] or 0
-
-    expense_types = list(Expense.objects.filter(user=request.user).values_list('expense_type', flat=True).distinct())
-    expense_type_display = [dict(Expense.EXPENSE_TYPE_CHOICES).get(t, str(t)) for t in expense_types]
-
-    def get_totals_by_type(months):
-        since = timezone.now() - timedelta(days=30*months)
-        qs = expenses.filter(date_incurred__gte=since)
-        return [float(qs.filter(expense_type=t).aggregate(sum=Sum('amount'))['sum'] or 0) for t in expense_types]
+    expenses = keyset_paginate(Expense.objects.filter(user=request.user), 'date_incurred', request)
+    user_cache = VersionedCache(request.user)
+    total_expense = FinanceSummary(request.user, cache=user_cache).total_expense
 
     context = {
         'expenses': expenses,
         'total_expense': total_expense,
+        'bulk_form': BulkActionForm(model=Expense),
         'form': form,
         'editing': editing,
         'edit_id': edit_id,
-        'expense_types_json': json.dumps(expense_type_display),
-        'expense_totals_1m_json': json.dumps(get_totals_by_type(1)),
-        'expense_totals_3m_json': json.dumps(get_totals_by_type(3)),
-        'expense_totals_6m_json': json.dumps(get_totals_by_type(6)),
-        'expense_totals_12m_json': json.dumps(get_totals_by_type(12)),
     }
     return render(request, 'finance/expense.html', context)
 
@@ -168,24 +141,90 @@ def delete_expense(request, id):
         messages.success(request, "Expense deleted successfully")
     return redirect('finance:expense')
 
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.contrib import messages
-from django.db.models import Sum, F
-from django.utils import timezone
-from django.core.serializers.json import DjangoJSONEncoder
-import json
-from .models import SavingsGoal
-from .forms import AddOrUpdateSavingsForm
+
+def _bulk_action(request, model, page):
+    form = BulkActionForm(request.POST, model=model)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, errors[0])
+        return redirect(page)
+
+    data = form.cleaned_data
+    if data['all_matching']:
+        rows = bulk.select(request.user, model, category=data['filter_category'],
+                           start=data['start'], end=data['end'], text=data['q'])
+    else:
+        rows = bulk.select(request.user, model, ids=data['ids'])
+    if data['action'] == BulkActionForm.ACTION_DELETE:
+        count = bulk.delete(rows)
+        messages.success(request, f"Deleted {count} rows.")
+    else:
+        count = bulk.recategorize(rows, data['category'])
+        label = dict(form.fields['category'].choices)[data['category']]
+        messages.success(request, f"Moved {count} rows to {label}.")
+    return redirect(page)
+
+
+@login_required
+@require_POST
+def bulk_income(request):
+    return _bulk_action(request, Income, 'finance:income')
+
+
+@login_required
+@require_POST
+def bulk_expense(request):
+    return _bulk_action(request, Expense, 'finance:expense')
+
+
+@login_required
+def budgets(request):
+    if request.method == 'POST':
+        form = BudgetForm(request.POST)
+        if form.is_valid():
+            Budget.objects.update_or_create(
+                user=request.user, category=form.cleaned_data['category'],
+                defaults={'amount': form.cleaned_data['amount'], 'warn_at': form.cleaned_data['warn_at']},
+            )
+            messages.success(request, "Budget saved successfully")
+            return redirect('finance:budgets')
+    else:
+        form = BudgetForm()
+
+    month = date.today()
+    return render(request, 'finance/budgets.html', {
+        'form': form,
+        'budgets': finance_budgets.budget_status(request.user, month),
+        'month': month,
+    })
+
+
+@login_required
+def delete_budget(request, id):
+    budget = get_object_or_404(Budget, id=id, user=request.user)
+    if request.method == 'POST':
+        budget.delete()
+        messages.success(request, "Budget deleted successfully")
+    return redirect('finance:budgets')
+
+
+SAVINGS_PAGE_FIELDS = ('user', 'goal_name', 'target_amount', 'current_amount', 'target_date', 'created_at')
+
 
 @login_required
 def savings(request, edit_id=None):
     user = request.user
     editing = edit_id is not None
-    goal_to_edit = get_object_or_404(SavingsGoal, id=edit_id, user=user) if editing else None
 
-    goals = SavingsGoal.objects.filter(user=user)
-    incomplete_goals = goals.annotate(remaining=F('target_amount') - F('current_amount')).filter(remaining__gt=0)
+    # One fetch of the goal columns the page shows; the table, totals, the
+    # goal being edited and the dropdown are all derived from this list.
+    goals = list(SavingsGoal.objects.filter(user=user).only(*SAVINGS_PAGE_FIELDS))
+    goal_to_edit = None
+    if editing:
+        goal_to_edit = next((goal for goal in goals if goal.pk == edit_id), None)
+        if goal_to_edit is None:
+            raise Http404("No savings goal matches the given query.")
+    incomplete_goals = [goal for goal in goals if goal.target_amount > goal.current_amount]
 
     if request.method == 'POST':
         form = AddOrUpdateSavingsForm(request.POST, user=user)
@@ -212,12 +251,10 @@ def savings(request, edit_id=None):
                 if existing_goal:
                     needed = existing_goal.target_amount - existing_goal.current_amount
                     if amount_to_add >= needed:
-                        existing_goal.current_amount += needed
-                        existing_goal.save()
+                        existing_goal.contribute(needed)
                         messages.success(request, f"Only ₹{needed} was needed; goal completed!")
                     else:
-                        existing_goal.current_amount += amount_to_add
-                        existing_goal.save()
+                        existing_goal.contribute(amount_to_add)
                         messages.success(request, "Amount added to existing goal.")
                 else:
                     # create new goal, replace old if exists (your requirement)
@@ -232,7 +269,8 @@ def savings(request, edit_id=None):
                     )
                     new_goal.save()
                     if amount_to_add > form.cleaned_data['target_amount']:
-                        messages.success(request, f"New goal created. Only ₹{form.cleaned_data['target_amount']} needed; extra ignored.")
+                        messages.success(request, f"New goal created. Only ₹{form.cleaned_data['target_amount']} "
+                                                  "needed; extra ignored.")
                     else:
                         messages.success(request, "New savings goal created successfully.")
             return redirect('finance:savings')
@@ -245,18 +283,12 @@ def savings(request, edit_id=None):
                 'target_date': goal_to_edit.target_date,
                 'amount_to_add': goal_to_edit.current_amount,
             }
-        form = AddOrUpdateSavingsForm(user=user, initial=initial)
+        form = AddOrUpdateSavingsForm(user=user, goals=goals, initial=initial)
 
-    total_target = goals.aggregate(total=Sum('target_amount'))['total'] or 0
-    total_saved = goals.aggregate(total=Sum('current_amount'))['total'] or 0
+    total_target = sum((goal.target_amount for goal in goals), Decimal('0'))
+    total_saved = sum((goal.current_amount for goal in goals), Decimal('0'))
     remaining_amount = max(total_target - total_saved, 0)
 
-    def totals(months=None):
-        qs = goals
-        if months:
-            qs = qs.filter(created_at__gte=timezone.now() - timezone.timedelta(days=30*months))
-        return list(qs.values_list('current_amount', flat=True))
-
     context = {
         'form': form,
         'editing': editing,
@@ -266,16 +298,12 @@ def savings(request, edit_id=None):
         'total_target': total_target,
         'total_saved': total_saved,
         'remaining_amount': remaining_amount,
-        'savings_totals_all_json': json.dumps(totals(None), cls=DjangoJSONEncoder),
-        'savings_totals_1m_json': json.dumps(totals(1), cls=DjangoJSONEncoder),
-        'savings_totals_3m_json': json.dumps(totals(3), cls=DjangoJSONEncoder),
-        'savings_totals_6m_json': json.dumps(totals(6), cls=DjangoJSONEncoder),
-        'savings_totals_12m_json': json.dumps(totals(12), cls=DjangoJSONEncoder),
-        'goal_names_json': json.dumps(list(goals.values_list('goal_name', flat=True)), cls=DjangoJSONEncoder),
     }
     return render(request, 'finance/savings.html', context)
 
+
 @login_required
+@require_POST
 def delete_savings(request, goal_id):
     goal = get_object_or_404(SavingsGoal, id=goal_id, user=request.user)
     goal.delete()
@@ -286,66 +314,21 @@ def delete_savings(request, goal_id):
 @login_required
 def transactions(request):
     try:
-        # Get all user-specific data
-        incomes = Income.objects.filter(user=request.user).select_related('user')
-        savings = SavingsGoal.objects.filter(user=request.user).select_related('user')
-        expenses = Expense.objects.filter(user=request.user).select_related('user')
-
-        # Prepare transaction data with consistent timezone handling
-        transactions_list = []
-        
-        def normalize_datetime(dt):
-            """Convert date or datetime to timezone-aware datetime"""
-            if dt is None:
-                return timezone.now()
-            if isinstance(dt, date) and not isinstance(dt, datetime):
-                # Convert date to datetime at midnight
-                dt = datetime.combine(dt, datetime.min.time())
-            if not timezone.is_aware(dt):
-                dt = timezone.make_aware(dt)
-            return dt
-
-        for income in incomes:
-            transactions_list.append({
-                'type': 'income',
-                'amount': income.amount,
-                'description': income.get_income_type_display(),
-                'category': 'Income',
-                'date': normalize_datetime(income.date_received or income.created_at),
-                'display_date': income.date_received or income.created_at,
-            })
-            
-        for saving in savings:
-            transactions_list.append({
-                'type': 'savings',
-                'amount': saving.current_amount,
-                'description': saving.goal_name,
-                'category': 'Savings',
-                'date': normalize_datetime(saving.created_at),
-                'display_date': saving.created_at,
-            })
-            
-        for expense in expenses:
-            transactions_list.append({
-                'type': 'expense',
-                'amount': -expense.amount,
-                'description': expense.description,
-                'category': getattr(expense, 'expense_type', 'Uncategorized'),
-                'date': normalize_datetime(expense.date_incurred or expense.created_at),
-                'display_date': expense.date_incurred or expense.created_at,
-            })
-
-        # Sort transactions by date (newest first)
-        transactions_list.sort(key=lambda x: x['date'], reverse=True)
-        
-        # Calculate totals
-        income_total = sum(t['amount'] for t in transactions_list if t['type'] == 'income')
-        expense_total = abs(sum(t['amount'] for t in transactions_list if t['type'] == 'expense'))
-        savings_total = sum(t['amount'] for t in transactions_list if t['type'] == 'savings')
-        net_balance = income_total - expense_total - savings_total
+        summary = FinanceSummary(request.user, cache=VersionedCache(request.user))
+        kinds = [request.GET['type']] if request.GET.get('type') in LEDGER_KINDS else None
+        page = union_keyset_paginate(ledger_branches(request.user, kinds), LEDGER_FIELDS, request)
+        transactions_list = [ledger_row(row) for row in page]
+
+        # Totals cover the whole history, not just this page
+        income_total = summary.total_income
+        expense_total = summary.total_expense
+        savings_total = summary.total_savings
+        net_balance = summary.net_balance
 
         context = {
             'transactions': transactions_list,
+            'page': page,
+            'selected_type': kinds[0] if kinds else '',
             'income_total': income_total,
             'expense_total': expense_total,
             'savings_total': savings_total,
@@ -360,124 +343,161 @@ def transactions(request):
             'error_message': "Could not load transactions. Please try again later.",
             'error_details': str(e)
         }, status=500)
-    
+
+
+def _chart_cache(request):
+    # Shared by the ETag/Last-Modified callbacks and the view so the data
+    # version is read once per request.
+    if not hasattr(request, 'finance_cache'):
+        request.finance_cache = VersionedCache(request.user)
+    return request.finance_cache
+
+
+def _chart_etag(request, kind):
+    period = request.GET.get('period', 'all')
+    return f'"{request.user.pk}-{_chart_cache(request).version}-{kind}-{period}-{date.today()}"'
+
+
+def _chart_last_modified(request, kind=None):
+    return _chart_cache(request).updated_at
+
 
 @login_required
-def download_expenses(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="expenses.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Category', 'Amount', 'Date', 'Source', 'Description'])
-    expenses = Expense.objects.filter(user=request.user)
-    for exp in expenses:
-        writer.writerow([
-            exp.get_expense_type_display(),
-            float(exp.amount),
-            exp.date_incurred.strftime('%Y-%m-%d'),
-            exp.get_source_display(),
-            exp.description or ''
-        ])
-    return response
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_data(request, kind):
+    period = request.GET.get('period', 'all')
+    if kind not in CHART_KINDS or period not in CHART_PERIODS:
+        return JsonResponse({'error': "Unknown chart or period."}, status=400)
+    series = chart_series(request.user, kind, period, cache=_chart_cache(request))
+    return JsonResponse({'kind': kind, 'period': period, **series})
+
+
+def _forecast_etag(request):
+    return f'"{request.user.pk}-{_chart_cache(request).version}-forecast-{date.today()}"'
 
 
 @login_required
-def download_income(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="income.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Type', 'Amount', 'Date', 'Description'])
-    incomes = Income.objects.filter(user=request.user).order_by('-date_received')
-    for i in incomes:
-        writer.writerow([i.get_income_type_display(), i.amount, i.date_received, i.description])
-    return response
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_forecast_etag, last_modified_func=_chart_last_modified)
+def forecast_data(request):
+    return JsonResponse(forecast(request.user, cache=_chart_cache(request)))
+
+
+SEARCH_KINDS = ('income', 'expense')
 
 
 @login_required
-def download_savings(request):
-    from django.http import HttpResponse
-    import csv
+@require_GET
+def search_transactions(request):
+    text = request.GET.get('q', '')
+    kind = request.GET.get('kind') or None
+    category = request.GET.get('category') or None
+    try:
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else None
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else None
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': "Dates must be YYYY-MM-DD and limit a number."}, status=400)
+    if kind is not None and kind not in SEARCH_KINDS:
+        return JsonResponse({'error': "Unknown kind."}, status=400)
+    results = finance_search.search(request.user, text, kind=kind, category=category,
+                                    start=start, end=end, limit=limit)
+    return JsonResponse({'query': text, 'results': results})
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="savings.csv"'
 
-    writer = csv.writer(response)
-    writer.writerow(['Goal Name', 'Target Amount', 'Saved Amount', 'Start Date', 'Target Date'])
+def _totals_etag(request):
+    # Default dates follow today, and the query string picks the report.
+    return f'"{request.user.pk}-{_chart_cache(request).version}-totals-{date.today()}-{request.GET.urlencode()}"'
 
-    savings = SavingsGoal.objects.filter(user=request.user)
-    for saving in savings:
-        writer.writerow([
-            saving.goal_name,
-            float(saving.target_amount),
-            float(saving.current_amount),
-            saving.created_at.strftime('%Y-%m-%d'),
-            saving.target_date.strftime('%Y-%m-%d')
-        ])
 
-    return response
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_totals_etag, last_modified_func=_chart_last_modified)
+def range_totals(request):
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else today.replace(day=1)
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else today
+    except ValueError:
+        return JsonResponse({'error': "Dates must be YYYY-MM-DD."}, status=400)
+    group = request.GET.get('group', 'kind')
+    compare = request.GET.get('compare') or None
+    if group not in prefix_sums.GROUPS or (compare is not None and compare not in prefix_sums.COMPARISONS):
+        return JsonResponse({'error': "Unknown group or comparison."}, status=400)
+    try:
+        prefix_sums.check_range(start, end, group, compare)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    index = prefix_sums.daily_totals(request.user, _chart_cache(request))
+    return JsonResponse(prefix_sums.report(index, start, end, group, compare))
+
+
+@login_required
+def import_transactions(request):
+    if request.method != 'POST':
+        return redirect('finance:dashboard')
+    form = ImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, "Choose a CSV file to import.")
+        return redirect('finance:dashboard')
+
+    kind = form.cleaned_data['kind']
+    target = 'finance:income' if kind == 'income' else 'finance:expense'
+    lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+    try:
+        result = import_csv(request.user, kind, lines)
+    except READ_ERRORS as error:
+        form.add_error('file', read_error_message(error))
+        for message in form.errors['file']:
+            messages.error(request, message)
+        return redirect(target)
+    if result.created:
+        messages.success(request, f"Imported {result.created} rows ({result.duplicates} already stored, skipped).")
+    elif not result.errors:
+        messages.info(request, f"Nothing new to import ({result.duplicates} rows already stored).")
+    for line_no, message in result.errors[:10]:
+        messages.error(request, f"Line {line_no}: {message}")
+    if len(result.errors) > 10:
+        messages.error(request, f"...and {len(result.errors) - 10} more rows with errors.")
+    return redirect(target)
+
+
+@login_required
+def download_expenses(request):
+    return exports.stream_csv(
+        'expenses.csv',
+        ['Category', 'Amount', 'Date', 'Source', 'Description'],
+        exports.expense_rows(request.user),
+    )
+
+
+@login_required
+def download_income(request):
+    return exports.stream_csv(
+        'income.csv',
+        ['Type', 'Amount', 'Date', 'Description'],
+        exports.income_rows(request.user),
+    )
+
+
+@login_required
+def download_savings(request):
+    return exports.stream_csv(
+        'savings.csv',
+        ['Goal Name', 'Target Amount', 'Saved Amount', 'Start Date', 'Target Date'],
+        exports.savings_rows(request.user),
+    )
 
-from django.contrib.auth.decorators import login_required
 
 @login_required
 def download_transactions(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Type', 'Amount', 'Description', 'Category', 'Date'])
-
-    incomes = Income.objects.filter(user=request.user)
-    savings = SavingsGoal.objects.filter(user=request.user)
-    expenses = Expense.objects.filter(user=request.user)
-
-    transactions_list = []
-
-    def normalize_datetime(dt):
-        if dt is None:
-            return timezone.now()
-        if isinstance(dt, date) and not isinstance(dt, datetime):
-            dt = datetime.combine(dt, datetime.min.time())
-        if not timezone.is_aware(dt):
-            dt = timezone.make_aware(dt)
-        return dt
-
-    for income in incomes:
-        transactions_list.append({
-            'type': 'income',
-            'amount': income.amount,
-            'description': income.get_income_type_display(),
-            'category': 'Income',
-            'date': normalize_datetime(income.date_received or income.created_at)
-        })
-
-    for saving in savings:
-        transactions_list.append({
-            'type': 'savings',
-            'amount': saving.current_amount,
-            'description': saving.goal_name,
-            'category': 'Savings',
-            'date': normalize_datetime(saving.created_at)
-        })
-
-    for expense in expenses:
-        transactions_list.append({
-            'type': 'expense',
-            'amount': -expense.amount,
-            'description': expense.description,
-            'category': expense.expense_type or 'Uncategorized',
-            'date': normalize_datetime(expense.date_incurred or expense.created_at)
-        })
-
-    # Sort by date descending
-    transactions_list.sort(key=lambda x: x['date'], reverse=True)
-
-    for tx in transactions_list:
-        writer.writerow([
-            tx['type'],
-            float(tx['amount']),
-            tx['description'],
-            tx['category'],
-            tx['date'].strftime('%Y-%m-%d')
-        ])
-
-    return response
-# Ensure the download_* views are protected by login_required
\ No newline at end of file
+    return exports.stream_csv(
+        'transactions.csv',
+        ['Type', 'Amount', 'Description', 'Category', 'Date'],
+        exports.transaction_rows(request.user),
+    )
+# Ensure the download_* views are protected by login_required